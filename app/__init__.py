@@ -32,6 +32,14 @@ def create_app(config_class: type = Config) -> Flask:
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
 
+    # Alertas de inasistencia: se evalúan por lotes fuera de la petición
+    from .services.absence_alerts import ABSENCE_ALERTS
+    ABSENCE_ALERTS.init_app(app)
+
+    # Métricas SQL por petición (Server-Timing y /api/admin/debug/sql)
+    from .services.sql_metrics import SQL_METRICS
+    SQL_METRICS.init_app(app)
+
     # Endpoint de salud para ver si la aplicación esta corriendo
     @app.get("/health")
     def health():
@@ -1,4 +1,6 @@
 """Reconocimiento Facial - Servicio de IA"""
+from .face_index import FaceIndex
 from .face_recognition_service import FaceRecognitionService
+from .model_registry import ModelRegistry
 
-__all__ = ['FaceRecognitionService']
+__all__ = ['FaceIndex', 'FaceRecognitionService', 'ModelRegistry']
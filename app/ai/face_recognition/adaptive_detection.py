@@ -0,0 +1,173 @@
+"""
+Detección Adaptativa por Regiones de Interés
+
+Envuelve un FaceDetector para que el costo de detección dependa de la
+actividad en el aula y no de la resolución del sensor:
+
+- Nivel de pirámide: cada región se detecta en la mayor reducción
+  (1, 1/2, 1/4, ...) en la que el rostro esperado sigue midiendo al menos
+  MIN_DETECT_PX. El tamaño esperado es el de los rostros seguidos en esa
+  región, o `face_size` (el mínimo configurado) para zonas sin tracks.
+- Regiones de interés: entre barridos completos solo se analizan los
+  alrededores de los tracks existentes y la zona de la puerta del aula
+  (por donde entran los alumnos nuevos).
+- Barrido completo periódico (full_scan_interval) para no perder rostros
+  que aparezcan fuera de esas zonas.
+
+Ejemplo:
+    >>> detector = AdaptiveDetector(create_detector("haar"), tracker, door=(0.0, 0.0, 0.25, 1.0))
+    >>> ubicaciones = detector.detect(frame_bgr)
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detectors import Box, FaceDetector
+from .face_tracker import FaceTracker, iou_matrix
+
+# Alto mínimo (px) que debe tener un rostro en el nivel de pirámide elegido
+MIN_DETECT_PX = 40
+# Reducción máxima de la pirámide
+MIN_LEVEL = 0.125
+# Tamaño mínimo esperado de un rostro nuevo en la resolución original (px)
+FACE_SIZE = 80
+# Segundos entre barridos completos del frame
+FULL_SCAN_INTERVAL = 1.0
+# Margen alrededor de cada track, relativo a su tamaño
+ROI_MARGIN = 0.6
+# IoU a partir del cual dos detecciones de regiones solapadas son el mismo rostro
+DUPLICATE_IOU = 0.5
+
+Rect = Tuple[int, int, int, int]  # (x1, y1, x2, y2)
+
+
+def pyramid_level(face_px: float, max_scale: float = 1.0) -> float:
+    """Mayor reducción (potencia de 2) en la que un rostro de face_px sigue siendo detectable."""
+    level = 1.0
+    while level / 2 >= MIN_LEVEL and face_px * level / 2 >= MIN_DETECT_PX:
+        level /= 2
+    return min(level, max_scale)
+
+
+def _merge_regions(regions: List[Tuple[Rect, float]]) -> List[Tuple[Rect, float]]:
+    """Une regiones solapadas; cada una conserva el menor tamaño de rostro esperado."""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                (a, fa), (b, fb) = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rect = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged[i] = (rect, min(fa, fb))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+class AdaptiveDetector:
+    """Detector con nivel de pirámide adaptativo, ROIs y barridos completos periódicos."""
+
+    def __init__(
+        self,
+        base: FaceDetector,
+        tracker: Optional[FaceTracker] = None,
+        door: Optional[Sequence[float]] = None,
+        face_size: float = FACE_SIZE,
+        full_scan_interval: float = FULL_SCAN_INTERVAL,
+        roi_margin: float = ROI_MARGIN
+    ):
+        """
+        Args:
+            base: Detector real; su `scale` actúa como resolución máxima
+            tracker: Tracker de la cámara (sus tracks definen las ROIs)
+            door: Zona de la puerta como fracciones (x1, y1, x2, y2) del frame
+            face_size: Alto mínimo esperado de un rostro nuevo (px originales)
+            full_scan_interval: Segundos entre barridos completos
+            roi_margin: Margen alrededor de cada track relativo a su tamaño
+        """
+        self.base = base
+        self.tracker = tracker
+        self.door = tuple(door) if door else None
+        self.face_size = face_size
+        self.full_scan_interval = full_scan_interval
+        self.roi_margin = roi_margin
+        self.full_scans = 0
+        self.roi_scans = 0
+        self._pixels = 0.0
+        self._frames = 0
+        self._last_full: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self.base.name
+
+    @property
+    def scale(self) -> float:
+        return self.base.scale
+
+    def detect(self, frame: np.ndarray, rgb: bool = False, now: Optional[float] = None) -> List[Box]:
+        """Detecta rostros en el frame según la actividad (ver docstring del módulo)."""
+        now = time.monotonic() if now is None else now
+        height, width = frame.shape[:2]
+        tracks = list(self.tracker.tracks.values()) if self.tracker is not None else []
+        self._frames += 1
+
+        if self._last_full is None or now - self._last_full >= self.full_scan_interval:
+            self._last_full = now
+            self.full_scans += 1
+            self._pixels += 1.0
+            return self.base.detect(frame, rgb, scale=pyramid_level(self.face_size, self.base.scale))
+        if not tracks and self.door is None:
+            # Sin tracks ni puerta no hay nada que vigilar hasta el próximo barrido
+            return []
+
+        self.roi_scans += 1
+        boxes: List[Box] = []
+        area = 0
+        for (x1, y1, x2, y2), face_px in self._regions(tracks, width, height):
+            crop = frame[y1:y2, x1:x2]
+            area += (x2 - x1) * (y2 - y1)
+            for top, right, bottom, left in self.base.detect(crop, rgb, scale=pyramid_level(face_px, self.base.scale)):
+                boxes.append((top + y1, right + x1, bottom + y1, left + x1))
+        self._pixels += area / float(width * height)
+        return self._dedupe(boxes)
+
+    def _regions(self, tracks, width: int, height: int) -> List[Tuple[Rect, float]]:
+        regions = []
+        for track in tracks:
+            top, right, bottom, left = track.box
+            size = max(bottom - top, right - left)
+            margin = int(size * self.roi_margin)
+            rect = (max(0, left - margin), max(0, top - margin), min(width, right + margin), min(height, bottom + margin))
+            regions.append((rect, float(min(bottom - top, right - left))))
+        if self.door is not None:
+            dx1, dy1, dx2, dy2 = self.door
+            rect = (int(dx1 * width), int(dy1 * height), int(dx2 * width), int(dy2 * height))
+            regions.append((rect, float(self.face_size)))
+        return [(r, f) for r, f in _merge_regions(regions) if r[2] > r[0] and r[3] > r[1]]
+
+    @staticmethod
+    def _dedupe(boxes: List[Box]) -> List[Box]:
+        if len(boxes) < 2:
+            return boxes
+        ious = iou_matrix(boxes, boxes)
+        keep = []
+        for i in range(len(boxes)):
+            if all(ious[i, j] < DUPLICATE_IOU for j in keep):
+                keep.append(i)
+        return [boxes[i] for i in keep]
+
+    def stats(self) -> Dict[str, float]:
+        """Barridos completos/ROI y fracción media del frame analizada."""
+        return {
+            "full_scans": self.full_scans,
+            "roi_scans": self.roi_scans,
+            "scanned_fraction": round(self._pixels / self._frames, 3) if self._frames else 0.0,
+        }
@@ -0,0 +1,173 @@
+"""
+Índice Aproximado (IVF) para Galerías Grandes
+
+Índice de archivo invertido en numpy puro: los encodings se agrupan con
+k-means en `nlist` listas y cada consulta solo compara contra las filas
+de las `nprobe` listas cuyos centroides están más cerca, en lugar de
+recorrer toda la galería. Las distancias finales son exactas sobre esos
+candidatos (mismos encodings y normas del FaceIndex).
+
+Se construye fuera de línea junto al modelo (model_store lo escribe en
+la misma generación) y FaceIndex.search lo usa automáticamente si está
+cargado. Con galerías pequeñas no conviene: por debajo de ANN_MIN_ROWS
+el modelo se guarda sin IVF y la búsqueda sigue siendo exacta.
+
+Archivos en la generación:
+    ivf.json            -> {nlist, nprobe, count}
+    ivf_centroids.npy   -> float32 (nlist, 128)
+    ivf_order.npy       -> int32 (N,) filas ordenadas por lista
+    ivf_offsets.npy     -> int64 (nlist + 1,) inicio de cada lista en order
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+IVF_META_FILE = "ivf.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ORDER_FILE = "ivf_order.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+# Tamaño de galería a partir del cual se construye el IVF automáticamente
+# (por debajo de ~10k filas la búsqueda exacta matricial es igual o más rápida)
+ANN_MIN_ROWS = int(os.getenv("FACE_ANN_MIN_ROWS", "20000"))
+# Listas visitadas por consulta (más = mejor recall, más lento)
+DEFAULT_NPROBE = int(os.getenv("FACE_ANN_NPROBE", "8"))
+# Puntos usados para entrenar k-means
+TRAIN_SAMPLE = 50000
+KMEANS_ITERATIONS = 12
+
+
+def _squared_distances(a: np.ndarray, b: np.ndarray, b_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    a_norms = np.einsum("ij,ij->i", a, a)
+    if b_norms is None:
+        b_norms = np.einsum("ij,ij->i", b, b)
+    squared = a_norms[:, None] + b_norms[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(squared, 0.0, out=squared)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Lista (centroide más cercano) de cada vector, por bloques para acotar memoria."""
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], chunk):
+        block = np.asarray(vectors[start:start + chunk], dtype=np.float32)
+        out[start:start + chunk] = np.argmin(_squared_distances(block, centroids, c_norms), axis=1)
+    return out
+
+
+class IVFIndex:
+    """Listas invertidas sobre las filas de un FaceIndex."""
+
+    def __init__(self, centroids, order, offsets, nprobe: int = DEFAULT_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = np.asarray(order, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = max(1, min(int(nprobe), self.nlist))
+        self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    def __len__(self) -> int:
+        return int(self.order.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        encodings,
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        iterations: int = KMEANS_ITERATIONS,
+        seed: int = 0
+    ) -> "IVFIndex":
+        """
+        Entrena k-means sobre los encodings y arma las listas invertidas.
+
+        Args:
+            encodings: Matriz (N, 128) (puede estar mapeada en memoria)
+            nlist: Cantidad de listas; por defecto ~4·sqrt(N)
+        """
+        n = int(encodings.shape[0])
+        if n == 0:
+            raise ValueError("No se puede construir un IVF sin encodings")
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample_idx = rng.choice(n, size=min(n, max(TRAIN_SAMPLE, nlist)), replace=False)
+        sample = np.asarray(encodings[np.sort(sample_idx)], dtype=np.float32)
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = _assign(sample, centroids)
+            counts = np.bincount(assignment, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Listas vacías: se reubican en puntos al azar de la muestra
+            if not filled.all():
+                centroids[~filled] = sample[rng.choice(sample.shape[0], size=int((~filled).sum()))]
+        assignment = _assign(encodings, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        return cls(centroids, order, offsets, nprobe)
+
+    def search(self, index, face_encodings, k: int = 1, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Búsqueda aproximada con la misma firma de resultado que FaceIndex.search.
+
+        Si las listas visitadas tienen menos de k filas, esa consulta se
+        resuelve de forma exacta.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, index.DIMENSIONS)
+        k = max(0, min(int(k), len(index)))
+        m = queries.shape[0]
+        out_idx = np.empty((m, k), dtype=np.int64)
+        out_dist = np.empty((m, k), dtype=np.float32)
+        if m == 0 or k == 0:
+            return out_idx, out_dist
+        nprobe = max(1, min(int(nprobe or self.nprobe), self.nlist))
+        centroid_d = _squared_distances(queries, self.centroids, self._centroid_norms)
+        if nprobe < self.nlist:
+            probes = np.argpartition(centroid_d, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), centroid_d.shape)
+        for i in range(m):
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes[i]])
+            if rows.shape[0] < k:
+                idx, dist = index.exact_search(queries[i:i + 1], k)
+                out_idx[i], out_dist[i] = idx[0], dist[0]
+                continue
+            q = queries[i]
+            squared = float(q @ q) + index.norms[rows] - 2.0 * (index.encodings[rows] @ q)
+            dist = np.sqrt(np.maximum(squared, 0.0))
+            top = np.argpartition(dist, k - 1)[:k] if k < rows.shape[0] else np.arange(rows.shape[0])
+            top = top[np.argsort(dist[top], kind="stable")]
+            out_idx[i], out_dist[i] = rows[top], dist[top]
+        return out_idx, out_dist
+
+    def save(self, directory: str) -> None:
+        """Escribe el IVF en el directorio de una generación."""
+        np.save(os.path.join(directory, IVF_CENTROIDS_FILE), self.centroids, allow_pickle=False)
+        np.save(os.path.join(directory, IVF_ORDER_FILE), self.order, allow_pickle=False)
+        np.save(os.path.join(directory, IVF_OFFSETS_FILE), self.offsets, allow_pickle=False)
+        with open(os.path.join(directory, IVF_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"nlist": self.nlist, "nprobe": self.nprobe, "count": len(self)}, f)
+
+    @classmethod
+    def load(cls, directory: str, count: int, mmap: bool = True) -> Optional["IVFIndex"]:
+        """Carga el IVF de una generación; None si no existe o no corresponde a `count` filas."""
+        try:
+            with open(os.path.join(directory, IVF_META_FILE), "r", encoding="utf-8") as f:
+                meta: Dict[str, Any] = json.load(f)
+            mode = "r" if mmap else None
+            centroids = np.load(os.path.join(directory, IVF_CENTROIDS_FILE), allow_pickle=False)
+            order = np.load(os.path.join(directory, IVF_ORDER_FILE), mmap_mode=mode, allow_pickle=False)
+            offsets = np.load(os.path.join(directory, IVF_OFFSETS_FILE), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        if meta.get("count") != count or order.shape[0] != count:
+            return None
+        return cls(centroids, order, offsets, meta.get("nprobe", DEFAULT_NPROBE))
@@ -0,0 +1,243 @@
+"""
+Detectores de Rostros Intercambiables
+
+Una sola interfaz (FaceDetector.detect) para los backends de CPU:
+
+- haar: Haar cascade de OpenCV (rápido, el usado históricamente en streaming)
+- hog:  HOG de dlib vía face_recognition (el usado al construir el modelo)
+- dnn:  Red de OpenCV cargada desde un archivo local:
+          * YuNet (.onnx) con cv2.FaceDetectorYN
+          * res10 SSD (.caffemodel + deploy.prototxt) con cv2.dnn
+
+Cada detector trabaja sobre una versión reducida del frame (`scale`) y
+devuelve las ubicaciones ya escaladas a la resolución original, en el
+formato de face_recognition: (top, right, bottom, left).
+
+Ejemplo:
+    >>> detector = create_detector("dnn", scale=0.5, model_path="face_detection_yunet_2023mar.onnx")
+    >>> ubicaciones = detector.detect(frame_bgr)
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple, Type
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+# Modelo DNN por defecto (YuNet .onnx o res10 .caffemodel)
+DNN_MODEL_PATH = os.getenv("FACE_DNN_MODEL", "")
+DNN_CONFIDENCE = 0.6
+
+
+def scale_from_env(default: float = 1.0, name: str = "FACE_DETECTOR_SCALE") -> float:
+    """
+    Factor de reducción leído de una variable de entorno.
+
+    Si la variable falta devuelve `default`; si no es un número en (0, 1]
+    avisa y también devuelve `default` en lugar de fallar al importar.
+    """
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = 0.0
+    if not 0 < value <= 1:
+        print(f"{name}={raw!r} inválido (debe estar en (0, 1]); se usa {default}")
+        return default
+    return value
+
+
+class FaceDetector:
+    """
+    Interfaz común de los detectores.
+
+    Las subclases implementan _detect(image) sobre la imagen ya reducida y
+    convertida al espacio de color que declaran en `color`.
+    """
+
+    name = "base"
+    # Espacio de color que espera _detect: "bgr", "rgb" o "gray"
+    color = "bgr"
+
+    def __init__(self, scale: float = 1.0):
+        if not 0 < scale <= 1:
+            raise ValueError("scale debe estar en (0, 1]")
+        self.scale = float(scale)
+        self._current_scale = self.scale
+
+    def detect(self, frame: np.ndarray, rgb: bool = False, scale: Optional[float] = None) -> List[Box]:
+        """
+        Detecta rostros en un frame.
+
+        Args:
+            frame: Imagen BGR (OpenCV) o RGB si rgb=True
+            rgb: Indica que el frame viene en RGB (face_recognition)
+            scale: Reemplaza el factor de reducción solo para esta llamada
+
+        Returns:
+            Lista de (top, right, bottom, left) en coordenadas del frame original
+        """
+        scale = self.scale if scale is None else float(scale)
+        small = frame
+        if scale != 1.0:
+            small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        image = self._convert(small, rgb)
+        height, width = frame.shape[:2]
+        self._current_scale = scale
+        boxes = []
+        for top, right, bottom, left in self._detect(image):
+            box = (
+                max(0, int(round(top / scale))),
+                min(width, int(round(right / scale))),
+                min(height, int(round(bottom / scale))),
+                max(0, int(round(left / scale))),
+            )
+            if box[0] < box[2] and box[3] < box[1]:
+                boxes.append(box)
+        return boxes
+
+    def _convert(self, image: np.ndarray, rgb: bool) -> np.ndarray:
+        if image.ndim == 2:
+            return image if self.color == "gray" else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        if self.color == "gray":
+            return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+        if (self.color == "rgb") != rgb:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB if not rgb else cv2.COLOR_RGB2BGR)
+        return image
+
+    def _detect(self, image: np.ndarray) -> List[Box]:
+        raise NotImplementedError
+
+
+class HaarDetector(FaceDetector):
+    """Haar cascade frontal con los filtros de forma y margen del streaming."""
+
+    name = "haar"
+    color = "gray"
+
+    # Tamaño mínimo del rostro en la resolución original (px)
+    MIN_FACE = 80
+
+    def __init__(self, scale: float = 1.0, min_neighbors: int = 7):
+        super().__init__(scale)
+        self.min_neighbors = min_neighbors
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+    def _detect(self, image: np.ndarray) -> List[Box]:
+        min_face = max(20, int(self.MIN_FACE * self._current_scale))
+        faces = self.cascade.detectMultiScale(
+            image,
+            scaleFactor=1.15,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_face, min_face),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        boxes = []
+        for (x, y, w, h) in faces:
+            aspect_ratio = w / float(h)
+            if aspect_ratio < 0.7 or aspect_ratio > 1.4:
+                continue
+            if w < min_face or h < min_face:
+                continue
+            margen = int(w * 0.1)
+            boxes.append((
+                max(0, y - margen),
+                min(image.shape[1], x + w + margen),
+                min(image.shape[0], y + h + margen),
+                max(0, x - margen),
+            ))
+        return boxes
+
+
+class HogDetector(FaceDetector):
+    """HOG + SVM lineal de dlib (face_recognition.face_locations)."""
+
+    name = "hog"
+    color = "rgb"
+
+    def __init__(self, scale: float = 1.0, upsample: int = 1):
+        super().__init__(scale)
+        self.upsample = upsample
+
+    def _detect(self, image: np.ndarray) -> List[Box]:
+        import face_recognition
+
+        return face_recognition.face_locations(image, number_of_times_to_upsample=self.upsample, model="hog")
+
+
+class DnnDetector(FaceDetector):
+    """Detector DNN de OpenCV: YuNet (.onnx) o res10 SSD (.caffemodel)."""
+
+    name = "dnn"
+    color = "bgr"
+
+    def __init__(
+        self,
+        scale: float = 1.0,
+        model_path: Optional[str] = None,
+        config_path: Optional[str] = None,
+        confidence: float = DNN_CONFIDENCE
+    ):
+        super().__init__(scale)
+        self.model_path = model_path or DNN_MODEL_PATH
+        if not self.model_path or not os.path.isfile(self.model_path):
+            raise FileNotFoundError(f"Modelo DNN de rostros no encontrado: '{self.model_path}' (ver FACE_DNN_MODEL)")
+        self.confidence = confidence
+        if self.model_path.lower().endswith(".onnx"):
+            self.kind = "yunet"
+            self.net = cv2.FaceDetectorYN.create(self.model_path, "", (320, 320), confidence, 0.3, 5000)
+        else:
+            self.kind = "res10"
+            config_path = config_path or os.path.join(os.path.dirname(self.model_path), "deploy.prototxt")
+            self.net = cv2.dnn.readNetFromCaffe(config_path, self.model_path)
+
+    def _detect(self, image: np.ndarray) -> List[Box]:
+        height, width = image.shape[:2]
+        if self.kind == "yunet":
+            self.net.setInputSize((width, height))
+            _, faces = self.net.detect(image)
+            rows = [] if faces is None else [f[:4] for f in faces]
+        else:
+            blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+            self.net.setInput(blob)
+            out = self.net.forward()[0, 0]
+            out = out[out[:, 2] >= self.confidence]
+            rows = []
+            for x1, y1, x2, y2 in out[:, 3:7] * np.array([width, height, width, height]):
+                rows.append((x1, y1, x2 - x1, y2 - y1))
+        boxes = []
+        for x, y, w, h in rows:
+            if w <= 0 or h <= 0:
+                continue
+            boxes.append((int(max(0, y)), int(min(width, x + w)), int(min(height, y + h)), int(max(0, x))))
+        return boxes
+
+
+BACKENDS: Dict[str, Type[FaceDetector]] = {
+    HaarDetector.name: HaarDetector,
+    HogDetector.name: HogDetector,
+    DnnDetector.name: DnnDetector,
+}
+
+
+def create_detector(backend: str = "haar", scale: float = 1.0, **options) -> FaceDetector:
+    """
+    Crea un detector por nombre de backend.
+
+    Args:
+        backend: "haar", "hog" o "dnn"
+        scale: Factor de reducción del frame antes de detectar (0, 1]
+        **options: Parámetros propios del backend (p. ej. model_path para dnn)
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    try:
+        cls = BACKENDS[(backend or "haar").strip().lower()]
+    except KeyError:
+        raise ValueError(f"Detector desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    return cls(scale=scale, **options)
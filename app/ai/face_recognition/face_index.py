@@ -0,0 +1,211 @@
+"""
+Índice de Rostros Conocidos
+
+Mantiene todos los encodings conocidos en una única matriz contigua
+float32 de forma (N, 128) junto con sus normas precalculadas, de modo
+que todos los rostros de un frame se comparan contra toda la galería
+con una sola operación matricial en lugar de un recorrido por rostro.
+
+Distancia usada (igual que face_recognition.face_distance):
+    ||a - b|| = sqrt(||a||² + ||b||² - 2·a·b)
+
+Cada etiqueta (persona) lleva además el ID del estudiante, tomado del
+nombre de su carpeta: "12" o "israel_12" -> 12.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Carpeta "<id>" o "<nombre>_<id>"
+_STUDENT_ID_PATTERN = re.compile(r"^(?:.*_)?(\d+)$")
+
+
+def parse_student_id(name: str) -> Optional[int]:
+    """
+    ID de estudiante codificado en el nombre de una carpeta de fotos.
+
+    Ejemplo:
+        >>> parse_student_id("israel_3"), parse_student_id("17"), parse_student_id("Ana Gil")
+        (3, 17, None)
+    """
+    match = _STUDENT_ID_PATTERN.match(str(name).strip())
+    return int(match.group(1)) if match else None
+
+
+class FaceIndex:
+    """
+    Índice de vecinos más cercanos (búsqueda exacta) sobre encodings faciales.
+
+    Atributos:
+    - encodings: Matriz float32 (N, 128) contigua
+    - norms: Normas al cuadrado de cada fila (N,)
+    - labels: Índice de etiqueta por fila (N,) int32
+    - label_names: Nombre de cada etiqueta (persona)
+    - label_student_ids: ID de estudiante por etiqueta (int64, -1 si no se conoce)
+    - ann: Índice aproximado opcional (IVFIndex); si está, search lo usa
+    """
+
+    DIMENSIONS = 128
+    UNKNOWN = "Desconocido"
+
+    def __init__(self, encodings, labels, label_names: Sequence[str], norms=None, ann=None, label_student_ids=None):
+        """
+        Args:
+            encodings: Matriz o lista de vectores de 128 dimensiones
+            labels: Índice de etiqueta (en label_names) de cada fila
+            label_names: Nombres de las personas
+            norms: Normas al cuadrado ya calculadas (p. ej. leídas del modelo)
+            ann: IVFIndex construido sobre estas mismas filas
+            label_student_ids: ID de estudiante por etiqueta (None o -1 si no se
+                conoce); por defecto se obtiene de label_names con parse_student_id
+        """
+        matrix = np.asarray(encodings, dtype=np.float32)
+        if matrix.size == 0:
+            matrix = np.empty((0, self.DIMENSIONS), dtype=np.float32)
+        self.encodings = np.ascontiguousarray(matrix.reshape(-1, self.DIMENSIONS))
+        if norms is None:
+            norms = np.einsum("ij,ij->i", self.encodings, self.encodings)
+        self.norms = np.asarray(norms, dtype=np.float32).reshape(-1)
+        self.labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        self.label_names = list(label_names)
+        if self.labels.shape[0] != self.encodings.shape[0]:
+            raise ValueError("labels y encodings deben tener la misma cantidad de filas")
+        if ann is not None and len(ann) != self.encodings.shape[0]:
+            raise ValueError("el índice aproximado no corresponde a estos encodings")
+        self.ann = ann
+        if label_student_ids is None:
+            label_student_ids = [parse_student_id(name) for name in self.label_names]
+        self.label_student_ids = np.array([-1 if i is None else i for i in label_student_ids], dtype=np.int64)
+        if self.label_student_ids.shape[0] != len(self.label_names):
+            raise ValueError("label_student_ids y label_names deben tener la misma longitud")
+        self._label_by_name: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_names(cls, encodings, names: Sequence[str]) -> "FaceIndex":
+        """Construye el índice a partir de un nombre por encoding (formato legado)."""
+        label_names, labels = np.unique(np.asarray(list(names), dtype=object).astype(str), return_inverse=True)
+        return cls(encodings, labels, [str(n) for n in label_names])
+
+    @classmethod
+    def empty(cls) -> "FaceIndex":
+        return cls([], [], [])
+
+    def __len__(self) -> int:
+        return int(self.encodings.shape[0])
+
+    def subset(self, rows, label_student_ids=None) -> "FaceIndex":
+        """
+        Sub-índice con las filas indicadas (copia en memoria).
+
+        Conserva label_names y los índices de etiqueta, de modo que una
+        etiqueta significa lo mismo en el sub-índice y en el global. El
+        índice aproximado no se traslada: los sub-índices son pequeños y
+        se buscan de forma exacta. label_student_ids reemplaza los IDs
+        por etiqueta (p. ej. completados por nombre).
+
+        Ejemplo:
+            >>> filas = np.flatnonzero(np.isin(index.labels, etiquetas_del_curso))
+            >>> curso = index.subset(filas)
+        """
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        return FaceIndex(
+            self.encodings[rows], self.labels[rows], self.label_names,
+            norms=self.norms[rows],
+            label_student_ids=self.label_student_ids if label_student_ids is None else label_student_ids
+        )
+
+    def student_ids_for(self, names: Iterable[str]) -> List[Optional[int]]:
+        """ID de estudiante de cada nombre devuelto por match (None si no se conoce)."""
+        if self._label_by_name is None:
+            self._label_by_name = {name: i for i, name in enumerate(self.label_names)}
+        ids = []
+        for name in names:
+            label = self._label_by_name.get(name)
+            student_id = int(self.label_student_ids[label]) if label is not None else -1
+            ids.append(student_id if student_id >= 0 else None)
+        return ids
+
+    @property
+    def names(self) -> List[str]:
+        """Nombre por fila (compatibilidad con la lista KNOWN_NAMES)."""
+        return [self.label_names[i] for i in self.labels]
+
+    def distances(self, face_encodings) -> np.ndarray:
+        """
+        Distancias euclidianas entre cada rostro consultado y toda la galería.
+
+        Args:
+            face_encodings: Matriz (M, 128) o lista de encodings del frame
+
+        Returns:
+            Matriz float32 (M, N) de distancias
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.DIMENSIONS)
+        if len(self) == 0 or queries.shape[0] == 0:
+            return np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        squared = query_norms[:, None] + self.norms[None, :] - 2.0 * (queries @ self.encodings.T)
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def search(self, face_encodings, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca los k encodings más cercanos para cada rostro.
+
+        Usa el índice aproximado si hay uno cargado; si no, búsqueda exacta.
+
+        Returns:
+            Tupla (indices, distancias), ambas de forma (M, k) ordenadas
+            de menor a mayor distancia. k se recorta al tamaño de la galería.
+        """
+        if self.ann is not None:
+            return self.ann.search(self, face_encodings, k)
+        return self.exact_search(face_encodings, k)
+
+    def exact_search(self, face_encodings, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Búsqueda exacta contra toda la galería (ver search)."""
+        dists = self.distances(face_encodings)
+        k = max(0, min(int(k), len(self)))
+        if dists.shape[0] == 0 or k == 0:
+            empty = np.empty((dists.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        if k < dists.shape[1]:
+            idx = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(dists.shape[1]), dists.shape).copy()
+        part = np.take_along_axis(dists, idx, axis=1)
+        order = np.argsort(part, axis=1, kind="stable")
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+    def match(
+        self,
+        face_encodings,
+        tolerance: float = 0.6,
+        k: int = 1
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Devuelve las k mejores coincidencias (nombre, distancia) por rostro.
+
+        Las coincidencias por encima de la tolerancia se reportan con el
+        nombre "Desconocido" para que el llamador conserve la distancia.
+
+        Ejemplo:
+            >>> index = FaceIndex.from_names(encodings, nombres)
+            >>> for matches in index.match(encodings_del_frame, tolerance=0.5):
+            ...     nombre, distancia = matches[0]
+        """
+        indices, dists = self.search(face_encodings, k=k)
+        results = []
+        for row_idx, row_dist in zip(indices, dists):
+            matches = []
+            for i, d in zip(row_idx, row_dist):
+                name = self.label_names[self.labels[i]] if d <= tolerance else self.UNKNOWN
+                matches.append((name, float(d)))
+            results.append(matches)
+        return results
+
+    def best_names(self, face_encodings, tolerance: float = 0.6) -> List[str]:
+        """Nombre de la mejor coincidencia por rostro ("Desconocido" si no hay)."""
+        return [m[0][0] if m else self.UNKNOWN for m in self.match(face_encodings, tolerance, k=1)]
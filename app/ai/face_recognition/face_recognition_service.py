@@ -15,9 +15,13 @@ Flujo:
 
 import face_recognition
 import numpy as np
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Union
 import cv2
 
+from .detectors import create_detector, scale_from_env
+from .face_index import FaceIndex
+from .model_builder import encode_images
+
 
 class FaceRecognitionService:
     """
@@ -37,6 +41,15 @@ class FaceRecognitionService:
         """Inicializa el servicio de reconocimiento facial."""
         self.known_face_encodings = []
         self.known_face_names = []
+        self._index = None
+        self.last_train_timings: Dict[str, float] = {}
+    
+    @property
+    def index(self) -> FaceIndex:
+        """Índice matricial de los encodings entrenados (train lo invalida)."""
+        if self._index is None:
+            self._index = FaceIndex.from_names(self.known_face_encodings, self.known_face_names)
+        return self._index
     
     @staticmethod
     def encode_face(image_path: str) -> Optional[np.ndarray]:
@@ -73,8 +86,8 @@ class FaceRecognitionService:
     @staticmethod
     def recognize_face(
         test_image_path: str,
-        known_encodings: List[np.ndarray],
-        known_names: List[str],
+        known_encodings: Union[FaceIndex, List[np.ndarray]],
+        known_names: Optional[List[str]] = None,
         tolerance: float = TOLERANCE
     ) -> Tuple[Optional[str], float]:
         """
@@ -88,8 +101,8 @@ class FaceRecognitionService:
         
         Args:
             test_image_path: Ruta a la imagen a reconocer
-            known_encodings: Lista de encodings de rostros conocidos
-            known_names: Lista de nombres/IDs correspondientes
+            known_encodings: FaceIndex, o lista de encodings de rostros conocidos
+            known_names: Lista de nombres/IDs correspondientes (si se pasa una lista)
             tolerance: Umbral de similitud (0-1, default 0.6)
         
         Returns:
@@ -116,20 +129,21 @@ class FaceRecognitionService:
             
             test_encoding = test_encodings[0]
             
-            # Comparar contra todos los encodings conocidos
-            # Devuelve distancias euclidianas normalizadas (0-1)
-            face_distances = face_recognition.face_distance(
-                known_encodings,
-                test_encoding
-            )
+            if not isinstance(known_encodings, FaceIndex):
+                known_encodings = FaceIndex.from_names(known_encodings, known_names or [])
+            if len(known_encodings) == 0:
+                return "Unknown", 0.0
             
-            # Encontrar la mejor coincidencia
-            best_match_index = np.argmin(face_distances)
-            best_distance = face_distances[best_match_index]
+            # Comparar contra todos los encodings conocidos en una sola
+            # operación matricial (distancias euclidianas)
+            indices, distances = known_encodings.search([test_encoding], k=1)
+            best_match_index = int(indices[0][0])
+            best_distance = float(distances[0][0])
             
             # Verificar si está dentro de la tolerancia
             if best_distance <= tolerance:
-                name = known_names[best_match_index]
+                labels = known_encodings.labels
+                name = known_encodings.label_names[labels[best_match_index]]
                 # Convertir distancia a confianza (1 - distancia)
                 confidence = 1 - best_distance
                 return name, confidence
@@ -140,7 +154,12 @@ class FaceRecognitionService:
             print(f"Error reconociendo rostro en {test_image_path}: {str(e)}")
             return "Unknown", 0.0
     
-    def train(self, training_data: List[Dict[str, Any]]) -> bool:
+    def train(
+        self,
+        training_data: List[Dict[str, Any]],
+        workers: Optional[int] = None,
+        chunksize: Optional[int] = None
+    ) -> bool:
         """
         Entrena el modelo cargando encodings de fotos conocidas.
         
@@ -151,8 +170,15 @@ class FaceRecognitionService:
             ...
         ]
         
+        Las imágenes se decodifican y codifican en un pool de procesos
+        (ver model_builder.encode_images); el orden de los encodings es el
+        mismo que el de training_data. Los tiempos por etapa quedan en
+        self.last_train_timings.
+        
         Args:
             training_data: Lista de dicts con name e image_path
+            workers: Procesos a usar (None = FACE_BUILD_WORKERS / núcleos, 1 = secuencial)
+            chunksize: Imágenes por tarea enviada a cada proceso
         
         Returns:
             True si el entrenamiento fue exitoso
@@ -166,28 +192,31 @@ class FaceRecognitionService:
             ...     print("Modelo entrenado correctamente")
         """
         try:
-            for entry in training_data:
-                name = entry['name']
-                image_path = entry['image_path']
-                
-                encoding = self.encode_face(image_path)
+            paths = [entry['image_path'] for entry in training_data]
+            encodings, self.last_train_timings = encode_images(paths, workers=workers, chunksize=chunksize)
+            
+            for entry, encoding in zip(training_data, encodings):
                 if encoding is not None:
                     self.known_face_encodings.append(encoding)
-                    self.known_face_names.append(name)
+                    self.known_face_names.append(entry['name'])
             
             return len(self.known_face_encodings) > 0
             
         except Exception as e:
             print(f"Error entrenando modelo: {str(e)}")
             return False
+        finally:
+            # Los encodings cambiaron (aunque sea la misma cantidad): el índice se reconstruye al usarlo
+            self._index = None
     
     @staticmethod
     def process_video_frame(frame: np.ndarray) -> Tuple[List[np.ndarray], List[Tuple[int, int, int, int]]]:
         """
         Procesa un frame de video para detectar rostros.
         
-        Nota: Esta función redimensiona la imagen por rendimiento.
-        Los coordinados se deben escalar de vuelta al tamaño original.
+        Nota: El detector trabaja sobre el frame reducido por
+        FACE_DETECTOR_SCALE (0.25 si no está definida) y devuelve las
+        ubicaciones ya escaladas al tamaño original.
         
         Args:
             frame: Array numpy con un frame de video (BGR)
@@ -206,20 +235,14 @@ class FaceRecognitionService:
             ...     cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
         """
         try:
-            # Redimensionar para procesamiento más rápido (reduce por factor de 4)
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
             # Convertir BGR (OpenCV) a RGB (face_recognition)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            # Detectar rostros y crear encodings
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
-            # Escalar coordinadas de vuelta al tamaño original
-            face_locations = [
-                (top*4, right*4, bottom*4, left*4)
-                for (top, right, bottom, left) in face_locations
-            ]
+            # Detectar rostros (el detector reduce el frame) y crear encodings
+            if not hasattr(FaceRecognitionService, "_frame_detector"):
+                FaceRecognitionService._frame_detector = create_detector("hog", scale=scale_from_env(0.25))
+            face_locations = FaceRecognitionService._frame_detector.detect(rgb_frame, rgb=True)
+            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
             
             return face_encodings, face_locations
             
@@ -0,0 +1,161 @@
+"""
+Seguimiento de Rostros entre Frames
+
+Asocia las detecciones de frames consecutivos por solapamiento (IoU) para
+no volver a calcular el encoding de 128 dimensiones de un rostro que ya
+fue identificado con confianza. En una cámara de aula fija, donde los
+alumnos permanecen sentados, la mayoría de los rostros reutilizan su
+identidad y solo se re-codifican:
+
+- periódicamente (REENCODE_INTERVAL),
+- cuando el recuadro se desplaza respecto a donde se codificó (deriva),
+- o mientras la identidad no es confiable (desconocido o distancia alta).
+
+Las ubicaciones usan el formato de face_recognition: (top, right, bottom, left).
+"""
+
+import itertools
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+# IoU mínimo para asociar una detección con un track existente
+MATCH_IOU = 0.3
+# Distancia máxima para considerar confiable una identificación
+CONFIDENT_DISTANCE = 0.45
+# Segundos entre re-codificaciones de un track confiable
+REENCODE_INTERVAL = 3.0
+# Segundos entre reintentos de un track no confiable
+RETRY_INTERVAL = 0.5
+# Por debajo de este IoU respecto al recuadro codificado se re-codifica
+DRIFT_IOU = 0.5
+# Frames procesados sin detección antes de descartar un track
+MAX_MISSED = 5
+
+
+def iou_matrix(boxes_a: Sequence[Box], boxes_b: Sequence[Box]) -> np.ndarray:
+    """IoU entre cada par de recuadros (top, right, bottom, left); forma (A, B)."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    """Un rostro seguido entre frames."""
+
+    __slots__ = ("id", "box", "name", "distance", "encoded_box", "encoded_at", "missed")
+
+    def __init__(self, track_id: int, box: Box):
+        self.id = track_id
+        self.box = box
+        self.name: Optional[str] = None
+        self.distance: Optional[float] = None
+        self.encoded_box: Optional[Box] = None
+        self.encoded_at: Optional[float] = None
+        self.missed = 0
+
+    @property
+    def confident(self) -> bool:
+        return self.distance is not None and self.distance <= CONFIDENT_DISTANCE
+
+
+class FaceTracker:
+    """
+    Tracker IoU por cámara (no es thread-safe: un tracker por hilo de inferencia).
+
+    Ejemplo:
+        >>> tracker = FaceTracker()
+        >>> for track in tracker.update(ubicaciones):
+        ...     if tracker.needs_encoding(track):
+        ...         nombre, distancia = ...  # encoding + búsqueda en el índice
+        ...         tracker.assign(track, nombre, distancia)
+    """
+
+    def __init__(
+        self,
+        match_iou: float = MATCH_IOU,
+        reencode_interval: float = REENCODE_INTERVAL,
+        retry_interval: float = RETRY_INTERVAL,
+        drift_iou: float = DRIFT_IOU,
+        max_missed: int = MAX_MISSED
+    ):
+        self.match_iou = match_iou
+        self.reencode_interval = reencode_interval
+        self.retry_interval = retry_interval
+        self.drift_iou = drift_iou
+        self.max_missed = max_missed
+        self.tracks: Dict[int, Track] = {}
+        self.encoded = 0
+        self.reused = 0
+        self._ids = itertools.count(1)
+
+    def update(self, boxes: Sequence[Box]) -> List[Track]:
+        """
+        Asocia las detecciones del frame con los tracks existentes.
+
+        Returns:
+            Un track por detección, en el mismo orden que `boxes`
+        """
+        tracks = list(self.tracks.values())
+        assigned: List[Optional[Track]] = [None] * len(boxes)
+        if tracks and boxes:
+            ious = iou_matrix([t.box for t in tracks], boxes)
+            # Asociación codiciosa: primero los pares con mayor solapamiento
+            for flat in np.argsort(-ious, axis=None):
+                ti, bi = divmod(int(flat), len(boxes))
+                if ious[ti, bi] < self.match_iou:
+                    break
+                if tracks[ti] is None or assigned[bi] is not None:
+                    continue
+                assigned[bi] = tracks[ti]
+                tracks[ti] = None
+        for track in tracks:
+            if track is None:
+                continue
+            track.missed += 1
+            if track.missed > self.max_missed:
+                del self.tracks[track.id]
+        for i, box in enumerate(boxes):
+            box = tuple(int(v) for v in box)
+            if assigned[i] is None:
+                track = Track(next(self._ids), box)
+                self.tracks[track.id] = track
+                assigned[i] = track
+            assigned[i].box = box
+            assigned[i].missed = 0
+        return assigned
+
+    def needs_encoding(self, track: Track, now: Optional[float] = None) -> bool:
+        """Indica si el track debe re-codificarse en este frame."""
+        if track.encoded_at is None:
+            return True
+        now = time.monotonic() if now is None else now
+        interval = self.reencode_interval if track.confident else self.retry_interval
+        if now - track.encoded_at >= interval:
+            return True
+        if track.confident and iou_matrix([track.box], [track.encoded_box])[0, 0] < self.drift_iou:
+            return True
+        self.reused += 1
+        return False
+
+    def assign(self, track: Track, name: str, distance: Optional[float], now: Optional[float] = None) -> None:
+        """Registra el resultado de codificar el track."""
+        track.name = name
+        track.distance = distance
+        track.encoded_box = track.box
+        track.encoded_at = time.monotonic() if now is None else now
+        self.encoded += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracks": len(self.tracks), "encoded": self.encoded, "reused": self.reused}
@@ -0,0 +1,413 @@
+"""
+Construcción Incremental del Modelo de Rostros
+
+Mantiene un manifiesto por foto (ruta -> tamaño, mtime, hash de contenido
+-> encoding) junto al modelo, de modo que al agregar fotos de un
+estudiante solo se decodifican y codifican los archivos nuevos o
+modificados. Los archivos eliminados se descartan y el modelo se
+reescribe de forma atómica con model_store.
+
+El manifiesto conserva un encoding por foto; el modelo publicado guarda
+solo unas pocas plantillas por persona (ver templates.py).
+
+Estructura en disco (dentro del directorio del modelo):
+    cache/
+        manifest.json           -> {ruta_relativa: {size, mtime_ns, sha256, person, row}}
+        encodings-<token>.npy   -> float32 (M, 128) encodings por foto
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import model_store
+from .face_index import FaceIndex
+from .templates import HOLDOUT_QUERIES, MAX_TEMPLATES, aggregate_gallery, evaluate_holdout
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+CACHE_DIR = "cache"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def list_gallery(fotos_dir: str) -> List[Tuple[str, str]]:
+    """
+    Lista las fotos de la galería en orden determinista.
+
+    Acepta subcarpetas por persona (fotos_conocidas/<persona>/*.jpg) y
+    fotos sueltas cuyo nombre de archivo es la persona.
+
+    Returns:
+        Lista de tuplas (ruta_relativa, persona)
+    """
+    fotos = []
+    if not os.path.isdir(fotos_dir):
+        return fotos
+    for item in sorted(os.listdir(fotos_dir)):
+        ruta_item = os.path.join(fotos_dir, item)
+        if os.path.isdir(ruta_item):
+            for archivo in sorted(os.listdir(ruta_item)):
+                _, ext = os.path.splitext(archivo)
+                if ext.lower() in IMAGE_EXTENSIONS and os.path.isfile(os.path.join(ruta_item, archivo)):
+                    fotos.append((f"{item}/{archivo}", item))
+        else:
+            nombre, ext = os.path.splitext(item)
+            if ext.lower() in IMAGE_EXTENSIONS:
+                fotos.append((item, nombre))
+    return fotos
+
+
+def content_hash(path: str) -> str:
+    """Hash SHA-256 del contenido del archivo."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_BUILD_DETECTOR = None
+
+
+def _build_detector():
+    """Detector de la construcción del modelo (FACE_BUILD_DETECTOR, HOG por defecto), uno por proceso."""
+    global _BUILD_DETECTOR
+    if _BUILD_DETECTOR is None:
+        from .detectors import create_detector
+
+        _BUILD_DETECTOR = create_detector(os.getenv("FACE_BUILD_DETECTOR", "hog"))
+    return _BUILD_DETECTOR
+
+
+def encode_image_timed(path: str) -> Tuple[Optional[np.ndarray], Tuple[float, float, float]]:
+    """
+    Igual que encode_image pero mide cada etapa.
+
+    Returns:
+        Tupla (encoding o None, (segundos_decode, segundos_detect, segundos_encode))
+    """
+    import face_recognition
+
+    t_decode = t_detect = t_encode = 0.0
+    try:
+        t0 = time.perf_counter()
+        imagen = face_recognition.load_image_file(path)
+        t1 = time.perf_counter()
+        t_decode = t1 - t0
+        ubicaciones = _build_detector().detect(imagen, rgb=True)
+        t2 = time.perf_counter()
+        t_detect = t2 - t1
+        if not ubicaciones:
+            return None, (t_decode, t_detect, t_encode)
+        encoding = face_recognition.face_encodings(imagen, known_face_locations=ubicaciones)[0]
+        t_encode = time.perf_counter() - t2
+        return encoding, (t_decode, t_detect, t_encode)
+    except Exception:
+        return None, (t_decode, t_detect, t_encode)
+
+
+def encode_image(path: str) -> Optional[np.ndarray]:
+    """Detecta (HOG por defecto) y codifica el primer rostro de una imagen; None si no hay rostro."""
+    return encode_image_timed(path)[0]
+
+
+def default_workers() -> int:
+    """Procesos del pool de codificación (FACE_BUILD_WORKERS, por defecto todos los núcleos)."""
+    try:
+        return max(1, int(os.getenv("FACE_BUILD_WORKERS", "0")) or (os.cpu_count() or 1))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def default_chunksize(count: int, workers: int) -> int:
+    """Imágenes por tarea del pool (FACE_BUILD_CHUNKSIZE o ~4 tareas por proceso)."""
+    try:
+        configured = int(os.getenv("FACE_BUILD_CHUNKSIZE", "0"))
+    except ValueError:
+        configured = 0
+    return configured if configured > 0 else max(1, count // (max(1, workers) * 4))
+
+
+def encode_images(
+    paths: List[str],
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None
+) -> Tuple[List[Optional[np.ndarray]], Dict[str, float]]:
+    """
+    Decodifica y codifica imágenes repartiéndolas en un pool de procesos.
+
+    Los resultados se devuelven en el mismo orden que `paths` (pool.map
+    conserva el orden), por lo que el modelo resultante es idéntico al de
+    una construcción secuencial.
+
+    Args:
+        paths: Rutas de las imágenes
+        workers: Procesos a usar (FACE_BUILD_WORKERS / núcleos por defecto; 1 = secuencial)
+        chunksize: Imágenes por tarea enviada a cada proceso (FACE_BUILD_CHUNKSIZE)
+        progress: Callback opcional progress(imagenes_completadas)
+
+    Returns:
+        Tupla (encodings o None por imagen, tiempos acumulados por etapa en segundos)
+    """
+    timings = {"decode": 0.0, "detect": 0.0, "encode": 0.0}
+    if not paths:
+        return [], timings
+    workers = min(workers or default_workers(), len(paths))
+    if chunksize is None:
+        chunksize = default_chunksize(len(paths), workers)
+
+    if workers <= 1:
+        results = map(encode_image_timed, paths)
+        executor = None
+    else:
+        # spawn: el build puede lanzarse desde un hilo del servidor web y
+        # hacer fork de un proceso con hilos no es seguro
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = executor.map(encode_image_timed, paths, chunksize=chunksize)
+
+    encodings: List[Optional[np.ndarray]] = []
+    try:
+        for encoding, (t_decode, t_detect, t_encode) in results:
+            encodings.append(encoding)
+            timings["decode"] += t_decode
+            timings["detect"] += t_detect
+            timings["encode"] += t_encode
+            if progress:
+                progress(len(encodings))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return encodings, timings
+
+
+class PhotoCache:
+    """Manifiesto de fotos ya codificadas y sus encodings."""
+
+    def __init__(self, model_dir: str):
+        self.cache_dir = os.path.join(model_dir, CACHE_DIR)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.encodings = np.empty((0, FaceIndex.DIMENSIONS), dtype=np.float32)
+        self._encodings_file: Optional[str] = None
+
+    @classmethod
+    def load(cls, model_dir: str) -> "PhotoCache":
+        cache = cls(model_dir)
+        try:
+            with open(os.path.join(cache.cache_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                return cls(model_dir)
+            encodings_file = manifest["encodings_file"]
+            encodings = np.load(os.path.join(cache.cache_dir, encodings_file), allow_pickle=False)
+        except (OSError, ValueError, KeyError):
+            return cls(model_dir)
+        cache.entries = manifest.get("entries", {})
+        cache.encodings = encodings.reshape(-1, FaceIndex.DIMENSIONS)
+        cache._encodings_file = encodings_file
+        return cache
+
+    def encoding_for(self, entry: Dict[str, Any]) -> Optional[np.ndarray]:
+        row = entry.get("row", -1)
+        if row is None or row < 0 or row >= self.encodings.shape[0]:
+            return None
+        return self.encodings[row]
+
+    def save(self, entries: Dict[str, Dict[str, Any]], encodings: np.ndarray) -> None:
+        """Escribe el manifiesto nuevo reemplazándolo atómicamente."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        encodings_file = f"encodings-{uuid.uuid4().hex[:12]}.npy"
+        np.save(os.path.join(self.cache_dir, encodings_file), encodings.astype(np.float32), allow_pickle=False)
+        manifest_tmp = os.path.join(self.cache_dir, f"{MANIFEST_FILE}.tmp-{os.getpid()}")
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "encodings_file": encodings_file, "entries": entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_tmp, os.path.join(self.cache_dir, MANIFEST_FILE))
+        for item in os.listdir(self.cache_dir):
+            if item.startswith("encodings-") and item != encodings_file:
+                try:
+                    os.remove(os.path.join(self.cache_dir, item))
+                except OSError:
+                    pass
+        self.entries, self.encodings, self._encodings_file = entries, encodings, encodings_file
+
+
+def gallery_changed(fotos_dir: str, model_dir: str) -> bool:
+    """
+    Indica si la galería difiere del manifiesto (fotos nuevas, cambiadas o eliminadas).
+
+    Solo compara tamaño y mtime; no lee el contenido de las fotos.
+    """
+    if model_store.current_generation(model_dir) is None:
+        return True
+    cache = PhotoCache.load(model_dir)
+    fotos = list_gallery(fotos_dir)
+    if len(fotos) != len(cache.entries):
+        return True
+    for rel_path, persona in fotos:
+        entry = cache.entries.get(rel_path)
+        if entry is None or entry.get("person") != persona:
+            return True
+        try:
+            st = os.stat(os.path.join(fotos_dir, rel_path))
+        except OSError:
+            return True
+        if st.st_size != entry.get("size") or st.st_mtime_ns != entry.get("mtime_ns"):
+            return True
+    return False
+
+
+def _signature(entries: Dict[str, Dict[str, Any]]) -> Dict[str, Tuple]:
+    """Parte del manifiesto que determina el contenido del modelo."""
+    return {p: (e.get("person"), e.get("sha256"), e.get("row", -1) >= 0) for p, e in entries.items()}
+
+
+def build_model(
+    fotos_dir: str,
+    model_dir: str,
+    incremental: bool = True,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    max_templates: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Construye (o actualiza) el modelo a partir de la galería de fotos.
+
+    Solo se re-codifican las fotos nuevas o cuyo contenido cambió; si el
+    tamaño y el mtime coinciden con el manifiesto no se lee el archivo.
+    Las fotos a codificar se reparten en un pool de procesos (encode_images).
+
+    Args:
+        fotos_dir: Directorio de fotos conocidas
+        model_dir: Directorio del modelo binario
+        incremental: False fuerza re-codificar todas las fotos
+        progress: Callback opcional progress(procesadas, total)
+        workers: Procesos del pool de codificación
+        chunksize: Imágenes por tarea del pool
+        max_templates: Plantillas por persona (FACE_MODEL_TEMPLATES; 0 = una fila por foto)
+
+    Returns:
+        Dict con ok, total, encoded, reused, removed, no_face, generation,
+        empty (la generación publicada no tiene rostros), workers, timings
+        (segundos por etapa: decode, detect y encode se suman entre
+        procesos; write y total son tiempo de reloj) y, si el modelo se
+        reescribió con plantillas, gallery (photos, rows, outliers, shrink)
+        y holdout (exactitud completa vs. plantillas; se omite con
+        FACE_MODEL_HOLDOUT_QUERIES=0)
+    """
+    started = time.perf_counter()
+    max_templates = MAX_TEMPLATES if max_templates is None else max_templates
+    fotos = list_gallery(fotos_dir)
+    cache = PhotoCache.load(model_dir) if incremental else PhotoCache(model_dir)
+    by_hash = {e["sha256"]: e for e in cache.entries.values() if e.get("sha256")}
+    total = len(fotos)
+
+    report = {
+        "ok": False, "total": total, "encoded": 0, "reused": 0, "removed": 0, "no_face": 0,
+        "generation": None, "workers": 0,
+        "timings": {"decode": 0.0, "detect": 0.0, "encode": 0.0, "write": 0.0, "total": 0.0},
+    }
+    # Primera pasada: resolver qué fotos se reutilizan y cuáles hay que codificar
+    pending: List[Tuple[str, str, os.stat_result, Optional[str], Optional[np.ndarray], bool]] = []
+    to_encode: List[str] = []
+    done = 0
+    for rel_path, persona in fotos:
+        ruta = os.path.join(fotos_dir, rel_path)
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            continue
+        entry = cache.entries.get(rel_path)
+        if entry is not None and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            pending.append((rel_path, persona, st, entry.get("sha256"), cache.encoding_for(entry), False))
+        else:
+            try:
+                sha = content_hash(ruta)
+            except OSError:
+                continue
+            previous = by_hash.get(sha)
+            if previous is not None:
+                # Mismo contenido (foto tocada o movida): se reutiliza el encoding
+                pending.append((rel_path, persona, st, sha, cache.encoding_for(previous), False))
+            else:
+                pending.append((rel_path, persona, st, sha, None, True))
+                to_encode.append(ruta)
+                continue
+        done += 1
+        if progress:
+            progress(done, total)
+
+    # Segunda pasada: codificación en paralelo (orden determinista)
+    if to_encode:
+        report["workers"] = min(workers or default_workers(), len(to_encode))
+    reused_done = done
+    encoded, stage_timings = encode_images(
+        to_encode,
+        workers=workers,
+        chunksize=chunksize,
+        progress=(lambda n: progress(reused_done + n, total)) if progress else None
+    )
+    report["timings"].update(stage_timings)
+    encoded_iter = iter(encoded)
+
+    new_entries: Dict[str, Dict[str, Any]] = {}
+    rows: List[np.ndarray] = []
+    for rel_path, persona, st, sha, encoding, needs_encoding in pending:
+        if needs_encoding:
+            encoding = next(encoded_iter)
+            report["encoded"] += 1
+        else:
+            report["reused"] += 1
+        row = -1
+        if encoding is not None:
+            row = len(rows)
+            rows.append(np.asarray(encoding, dtype=np.float32))
+        else:
+            report["no_face"] += 1
+        new_entries[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha, "person": persona, "row": row}
+
+    report["removed"] = len(set(cache.entries) - set(new_entries))
+
+    t_write = time.perf_counter()
+    # Sin rostros (galería vacía o fotos sin caras) se publica igual una
+    # generación vacía: la anterior seguiría reconociendo a los eliminados
+    encodings = np.vstack(rows) if rows else np.empty((0, FaceIndex.DIMENSIONS), dtype=np.float32)
+    header = model_store.read_header(model_dir)
+    changed = (
+        _signature(new_entries) != _signature(cache.entries)
+        or header is None
+        or header.get("templates", 0) != max_templates
+    )
+    # El manifiesto se guarda siempre (también las fotos sin rostro, para no recodificarlas)
+    cache.save(new_entries, encodings)
+    if changed:
+        people = [e["person"] for e in new_entries.values() if e["row"] >= 0]
+        index = FaceIndex.from_names(encodings, people)
+        model_encodings, model_labels = index.encodings, index.labels
+        if max_templates > 0 and len(index):
+            model_encodings, model_labels, report["gallery"] = aggregate_gallery(index.encodings, index.labels, max_templates)
+            if HOLDOUT_QUERIES > 0:
+                report["holdout"] = evaluate_holdout(index.encodings, index.labels, max_templates)
+        # Un IVF construido a mano (build_ann_index) se mantiene aunque N < ANN_MIN_ROWS
+        keep_ann = header is not None and header.get("ann") == "ivf"
+        report["generation"] = model_store.write_model(
+            model_dir, model_encodings, model_labels, index.label_names,
+            metadata={"templates": max_templates, "photos": len(index)},
+            ann=True if keep_ann else None
+        )
+    else:
+        report["generation"] = model_store.current_generation(model_dir)
+    report["timings"]["write"] = time.perf_counter() - t_write
+    report["timings"]["total"] = time.perf_counter() - started
+    report["ok"] = True
+    report["empty"] = not rows
+    return report
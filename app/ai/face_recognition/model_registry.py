@@ -0,0 +1,107 @@
+"""
+Registro del Modelo de Rostros con Recarga en Caliente
+
+Cada worker de gunicorn mantiene un ModelRegistry que vigila el número
+de generación publicado por model_store (archivo CURRENT). Cuando cambia,
+carga la nueva generación por completo y recién entonces reemplaza la
+referencia al modelo vigente, de modo que ninguna petición ve un modelo a
+medio cargar. Los arrays se mapean en memoria, así que todos los workers
+comparten el page cache del sistema operativo.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from . import model_store
+from .face_index import FaceIndex
+
+
+class LoadedModel:
+    """Instantánea inmutable de una generación del modelo."""
+
+    __slots__ = ("index", "generation", "loaded_at", "header")
+
+    def __init__(self, index: FaceIndex, generation: Optional[int], header: Optional[Dict[str, Any]]):
+        for array in (index.encodings, index.norms, index.labels, index.label_student_ids):
+            if isinstance(array, np.ndarray) and array.flags.writeable:
+                array.flags.writeable = False
+        object.__setattr__(self, "index", index)
+        object.__setattr__(self, "generation", generation)
+        object.__setattr__(self, "loaded_at", datetime.now())
+        object.__setattr__(self, "header", header or {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LoadedModel es inmutable")
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "loaded_at": self.loaded_at.isoformat(),
+            "total_encodings": len(self.index),
+            "personas_unicas": len(self.index.label_names),
+            "fecha_creacion": self.header.get("fecha_creacion"),
+        }
+
+
+class ModelRegistry:
+    """
+    Punto único de acceso al modelo vigente dentro de un proceso.
+
+    Ejemplo:
+        >>> registry = ModelRegistry('modelo_caras')
+        >>> index = registry.current().index
+    """
+
+    # Segundos entre verificaciones del archivo CURRENT
+    CHECK_INTERVAL = 2.0
+
+    def __init__(self, model_dir: str, check_interval: Optional[float] = None):
+        self.model_dir = model_dir
+        self.check_interval = self.CHECK_INTERVAL if check_interval is None else check_interval
+        self._model = LoadedModel(FaceIndex.empty(), None, None)
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._current_mtime = None
+
+    def current(self) -> LoadedModel:
+        """Devuelve el modelo vigente, recargándolo si se publicó otra generación."""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.refresh()
+        return self._model
+
+    def refresh(self, force: bool = False) -> LoadedModel:
+        """
+        Verifica la generación publicada y la carga si es distinta.
+
+        Args:
+            force: Verificar aunque el mtime de CURRENT no haya cambiado
+        """
+        # Solo un hilo carga; los demás siguen usando el modelo vigente
+        if not self._lock.acquire(blocking=False):
+            return self._model
+        try:
+            self._last_check = time.monotonic()
+            try:
+                mtime = os.stat(os.path.join(self.model_dir, model_store.CURRENT_FILE)).st_mtime_ns
+            except OSError:
+                return self._model
+            if not force and mtime == self._current_mtime:
+                return self._model
+            generation = model_store.current_generation(self.model_dir)
+            if generation is None or generation == self._model.generation:
+                self._current_mtime = mtime
+                return self._model
+            index = model_store.load_index(self.model_dir, generation)
+            if index is None:
+                return self._model
+            # Reemplazo atómico de la referencia: la nueva instantánea ya está completa
+            self._model = LoadedModel(index, generation, model_store.read_header(self.model_dir, generation))
+            self._current_mtime = mtime
+            return self._model
+        finally:
+            self._lock.release()
@@ -0,0 +1,236 @@
+"""
+Formato Binario del Modelo de Rostros
+
+Reemplaza el pickle `modelo_caras.pkl` por un directorio versionado que
+se puede mapear en memoria (np.load(mmap_mode='r')). Así los workers de
+gunicorn comparten el page cache del sistema operativo en lugar de
+mantener cada uno su propia copia deserializada, y la carga es de
+tiempo constante sin importar el tamaño de la galería.
+
+Estructura en disco:
+    modelo_caras/
+        CURRENT                 -> número de generación vigente
+        gen-000001/
+            header.json         -> metadatos + tabla de etiquetas (nombre e ID de estudiante)
+            encodings.npy       -> float32 (N, 128)
+            norms.npy           -> float32 (N,) normas al cuadrado
+            labels.npy          -> int32 (N,) índice en label_names
+            ivf*.npy, ivf.json  -> índice aproximado opcional (ver ann_index)
+
+Cada escritura crea una generación nueva y luego reemplaza CURRENT de
+forma atómica (os.replace), por lo que un lector nunca ve un modelo a
+medio escribir.
+"""
+
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from .ann_index import ANN_MIN_ROWS, IVFIndex
+from .face_index import FaceIndex
+
+FORMAT_NAME = "cognipass-faces"
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+HEADER_FILE = "header.json"
+ENCODINGS_FILE = "encodings.npy"
+NORMS_FILE = "norms.npy"
+LABELS_FILE = "labels.npy"
+
+# Campos de la cabecera que calcula write_model (el resto son metadatos libres)
+HEADER_KEYS = (
+    "format", "version", "generation", "dimensions", "dtype", "count", "label_names",
+    "fecha_creacion", "total_encodings", "personas_unicas", "ann", "student_ids",
+)
+
+# Generaciones antiguas que se conservan (los lectores con mmap abierto
+# siguen funcionando aunque se borren, pero damos margen al recargar)
+KEEP_GENERATIONS = 2
+
+
+def generation_dir(model_dir: str, generation: int) -> str:
+    """Directorio de una generación del modelo."""
+    return os.path.join(model_dir, f"gen-{generation:06d}")
+
+
+def _fsync_file(path: str) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def current_generation(model_dir: str) -> Optional[int]:
+    """Devuelve la generación vigente del modelo o None si no existe."""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_header(model_dir: str, generation: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Lee la cabecera (metadatos) de una generación; la vigente por defecto."""
+    if generation is None:
+        generation = current_generation(model_dir)
+    if generation is None:
+        return None
+    try:
+        with open(os.path.join(generation_dir(model_dir, generation), HEADER_FILE), "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+        return None
+    return header
+
+
+def write_model(
+    model_dir: str,
+    encodings,
+    labels,
+    label_names: Sequence[str],
+    metadata: Optional[Dict[str, Any]] = None,
+    ann: Union[bool, IVFIndex, None] = None,
+    label_student_ids: Optional[Sequence[Optional[int]]] = None
+) -> int:
+    """
+    Escribe una nueva generación del modelo y la publica atómicamente.
+
+    Args:
+        model_dir: Directorio raíz del modelo
+        encodings: Matriz (N, 128)
+        labels: Índice de etiqueta por fila (N,)
+        label_names: Nombre de cada etiqueta
+        metadata: Campos adicionales para la cabecera
+        ann: Construir el índice aproximado IVF (None = solo si N >= ANN_MIN_ROWS),
+            o un IVFIndex ya construido sobre estas filas
+        label_student_ids: ID de estudiante por etiqueta (por defecto, el
+            codificado en el nombre de la carpeta; ver parse_student_id)
+
+    Returns:
+        Número de la generación escrita
+    """
+    index = FaceIndex(encodings, labels, label_names, label_student_ids=label_student_ids)
+    os.makedirs(model_dir, exist_ok=True)
+    generation = (current_generation(model_dir) or 0) + 1
+    final_dir = generation_dir(model_dir, generation)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "generation": generation,
+        "dimensions": FaceIndex.DIMENSIONS,
+        "dtype": "float32",
+        "count": len(index),
+        "label_names": index.label_names,
+        "student_ids": [int(i) if i >= 0 else None for i in index.label_student_ids],
+        "fecha_creacion": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total_encodings": len(index),
+        "personas_unicas": int(len(np.unique(index.labels))),
+    }
+    header.update(metadata or {})
+
+    arrays = {
+        ENCODINGS_FILE: index.encodings,
+        NORMS_FILE: index.norms.astype(np.float32),
+        LABELS_FILE: index.labels,
+    }
+    for name, array in arrays.items():
+        path = os.path.join(tmp_dir, name)
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        _fsync_file(path)
+    if ann is None:
+        ann = len(index) >= ANN_MIN_ROWS
+    if ann is True and len(index):
+        ann = IVFIndex.build(index.encodings)
+    if isinstance(ann, IVFIndex):
+        ann.save(tmp_dir)
+        header["ann"] = "ivf"
+    header_path = os.path.join(tmp_dir, HEADER_FILE)
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.rename(tmp_dir, final_dir)
+
+    current_tmp = os.path.join(model_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_tmp, os.path.join(model_dir, CURRENT_FILE))
+
+    _prune_generations(model_dir, generation)
+    return generation
+
+
+def _prune_generations(model_dir: str, current: int) -> None:
+    for item in os.listdir(model_dir):
+        if not item.startswith("gen-") or ".tmp-" in item:
+            continue
+        try:
+            generation = int(item[4:])
+        except ValueError:
+            continue
+        if generation <= current - KEEP_GENERATIONS:
+            shutil.rmtree(os.path.join(model_dir, item), ignore_errors=True)
+
+
+def load_index(model_dir: str, generation: Optional[int] = None, mmap: bool = True) -> Optional[FaceIndex]:
+    """
+    Carga el modelo como FaceIndex mapeando los arrays en memoria.
+
+    Returns:
+        FaceIndex o None si no hay modelo válido
+    """
+    header = read_header(model_dir, generation)
+    if header is None:
+        return None
+    gen_dir = generation_dir(model_dir, header["generation"])
+    mode = "r" if mmap else None
+    try:
+        encodings = np.load(os.path.join(gen_dir, ENCODINGS_FILE), mmap_mode=mode, allow_pickle=False)
+        norms = np.load(os.path.join(gen_dir, NORMS_FILE), mmap_mode=mode, allow_pickle=False)
+        labels = np.load(os.path.join(gen_dir, LABELS_FILE), mmap_mode=mode, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if encodings.shape != (header["count"], header["dimensions"]):
+        return None
+    ann = IVFIndex.load(gen_dir, header["count"], mmap=mmap) if header.get("ann") == "ivf" else None
+    return FaceIndex(
+        encodings, labels, header["label_names"], norms=norms, ann=ann,
+        label_student_ids=header.get("student_ids")
+    )
+
+
+def convert_pickle(pkl_path: str, model_dir: str) -> Optional[int]:
+    """
+    Convierte un modelo legado (`modelo_caras.pkl`) al formato binario.
+
+    El pickle contiene {'encodings': [...], 'nombres': [...], ...}.
+
+    Returns:
+        Generación escrita, o None si el pickle no existe o está vacío
+    """
+    if not os.path.exists(pkl_path):
+        return None
+    with open(pkl_path, "rb") as f:
+        modelo_data = pickle.load(f)
+    encodings = modelo_data.get("encodings") or []
+    nombres = modelo_data.get("nombres") or []
+    if not encodings:
+        return None
+    index = FaceIndex.from_names(encodings, nombres)
+    metadata = {"convertido_desde": os.path.basename(pkl_path)}
+    if modelo_data.get("fecha_creacion"):
+        metadata["fecha_creacion_original"] = modelo_data["fecha_creacion"]
+    return write_model(model_dir, index.encodings, index.labels, index.label_names, metadata)
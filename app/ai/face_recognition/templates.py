@@ -0,0 +1,213 @@
+"""
+Plantillas Representativas por Estudiante
+
+Reduce los encodings de cada persona (una fila por foto) a unas pocas
+plantillas: el centroide de sus fotos más k medoides que cubren la
+variación real (luz, pose, lentes). Las fotos cuyo encoding está lejos
+del resto (otro rostro detectado por error, foto movida) se descartan
+antes de calcular las plantillas.
+
+- Atípicos: distancia al centroide mayor que
+  max(OUTLIER_MIN_DISTANCE, mediana + OUTLIER_MAD · 1.4826 · MAD).
+- Medoides: k-medoids (asignación / actualización alternadas) con
+  inicialización determinista por el punto más lejano.
+- Personas con pocas fotos (<= max_templates) conservan sus fotos tal cual.
+
+evaluate_holdout compara la exactitud top-1 de la galería completa y de
+la galería de plantillas sobre fotos separadas de cada persona (como
+mucho HOLDOUT_QUERIES, buscadas de a HOLDOUT_CHUNK para acotar la
+memoria de la matriz de distancias).
+
+Ejemplo:
+    >>> encodings, labels, reporte = aggregate_gallery(encodings, labels, max_templates=5)
+"""
+
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .face_index import FaceIndex
+
+# Plantillas por persona (centroide + medoides); 0 desactiva la agregación
+MAX_TEMPLATES = int(os.getenv("FACE_MODEL_TEMPLATES", "5"))
+# Distancia al centroide por debajo de la cual una foto nunca es atípica
+OUTLIER_MIN_DISTANCE = 0.45
+# Desvíos robustos (MAD) sobre la mediana a partir de los cuales una foto es atípica
+OUTLIER_MAD = 3.0
+# Fotos mínimas para aplicar el rechazo de atípicos
+OUTLIER_MIN_PHOTOS = 4
+KMEDOIDS_ITERATIONS = 10
+# Fracción de fotos por persona separadas para la evaluación
+HOLDOUT_FRACTION = 0.2
+HOLDOUT_TOLERANCE = 0.5
+# Fotos separadas como máximo en toda la galería; FACE_MODEL_HOLDOUT_QUERIES=0 omite la evaluación
+try:
+    HOLDOUT_QUERIES = max(0, int(os.getenv("FACE_MODEL_HOLDOUT_QUERIES", "2000")))
+except ValueError:
+    HOLDOUT_QUERIES = 2000
+# Consultas por bloque de la búsqueda exacta (bloque x galería distancias en memoria)
+HOLDOUT_CHUNK = 256
+
+
+def _pairwise(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    squared = (
+        np.einsum("ij,ij->i", a, a)[:, None]
+        + np.einsum("ij,ij->i", b, b)[None, :]
+        - 2.0 * (a @ b.T)
+    )
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def reject_outliers(encodings: np.ndarray) -> np.ndarray:
+    """Máscara booleana de las fotos que se conservan."""
+    keep = np.ones(encodings.shape[0], dtype=bool)
+    if encodings.shape[0] < OUTLIER_MIN_PHOTOS:
+        return keep
+    dist = np.linalg.norm(encodings - encodings.mean(axis=0), axis=1)
+    median = np.median(dist)
+    mad = np.median(np.abs(dist - median))
+    threshold = max(OUTLIER_MIN_DISTANCE, median + OUTLIER_MAD * 1.4826 * mad)
+    keep = dist <= threshold
+    # Si casi todo queda fuera, el "centroide" no representa a nadie: no se descarta nada
+    return keep if keep.sum() >= max(2, encodings.shape[0] // 2) else np.ones_like(keep)
+
+
+def k_medoids(encodings: np.ndarray, k: int, iterations: int = KMEDOIDS_ITERATIONS) -> np.ndarray:
+    """Índices (filas) de k medoides de los encodings."""
+    n = encodings.shape[0]
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.arange(n)
+    dist = _pairwise(encodings, encodings)
+    # Inicio: el más cercano al centroide y luego sucesivamente el más lejano a los elegidos
+    medoids = [int(np.argmin(np.linalg.norm(encodings - encodings.mean(axis=0), axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(dist[:, medoids].min(axis=1))))
+    medoids = np.asarray(medoids)
+    for _ in range(iterations):
+        assignment = np.argmin(dist[:, medoids], axis=1)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(assignment == c)
+            if members.size:
+                updated[c] = members[np.argmin(dist[np.ix_(members, members)].sum(axis=1))]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    return medoids
+
+
+def person_templates(encodings: np.ndarray, max_templates: int = MAX_TEMPLATES) -> Tuple[np.ndarray, int]:
+    """
+    Plantillas de una persona.
+
+    Args:
+        encodings: Matriz (n, 128) con las fotos de la persona
+        max_templates: Plantillas máximas (centroide + max_templates - 1 medoides)
+
+    Returns:
+        Tupla (plantillas (m, 128), fotos descartadas como atípicas)
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    keep = reject_outliers(encodings)
+    inliers = encodings[keep]
+    outliers = int((~keep).sum())
+    if inliers.shape[0] <= max_templates:
+        return inliers, outliers
+    centroid = inliers.mean(axis=0, keepdims=True)
+    medoids = inliers[k_medoids(inliers, max_templates - 1)]
+    return np.vstack([centroid, medoids]).astype(np.float32), outliers
+
+
+def aggregate_gallery(encodings, labels, max_templates: int = MAX_TEMPLATES) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Reemplaza las filas de cada etiqueta por sus plantillas.
+
+    Returns:
+        Tupla (encodings, labels, reporte) donde el reporte incluye
+        photos, rows, outliers y shrink (fracción de filas eliminadas)
+    """
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, FaceIndex.DIMENSIONS)
+    labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+    out_encodings: List[np.ndarray] = []
+    out_labels: List[np.ndarray] = []
+    outliers = 0
+    for label in np.unique(labels):
+        templates, rejected = person_templates(encodings[labels == label], max_templates)
+        out_encodings.append(templates)
+        out_labels.append(np.full(templates.shape[0], label, dtype=np.int32))
+        outliers += rejected
+    if out_encodings:
+        result = np.vstack(out_encodings)
+        result_labels = np.concatenate(out_labels)
+    else:
+        result = np.empty((0, FaceIndex.DIMENSIONS), dtype=np.float32)
+        result_labels = np.empty(0, dtype=np.int32)
+    photos = int(encodings.shape[0])
+    report = {
+        "photos": photos,
+        "rows": int(result.shape[0]),
+        "outliers": outliers,
+        "shrink": round(1.0 - result.shape[0] / photos, 4) if photos else 0.0,
+    }
+    return result, result_labels, report
+
+
+def _accuracy(index: FaceIndex, queries: np.ndarray, expected: np.ndarray, tolerance: float) -> float:
+    if not len(index) or not queries.shape[0]:
+        return 0.0
+    hits = 0
+    for start in range(0, queries.shape[0], HOLDOUT_CHUNK):
+        idx, dist = index.exact_search(queries[start:start + HOLDOUT_CHUNK], k=1)
+        predicted = np.where(dist[:, 0] <= tolerance, index.labels[idx[:, 0]], -1)
+        hits += int((predicted == expected[start:start + HOLDOUT_CHUNK]).sum())
+    return hits / queries.shape[0]
+
+
+def evaluate_holdout(
+    encodings,
+    labels,
+    max_templates: int = MAX_TEMPLATES,
+    fraction: float = HOLDOUT_FRACTION,
+    tolerance: float = HOLDOUT_TOLERANCE,
+    seed: int = 0,
+    max_queries: int = HOLDOUT_QUERIES
+) -> Dict[str, Any]:
+    """
+    Exactitud top-1 de la galería completa vs. la de plantillas.
+
+    Por cada persona con al menos 2 fotos se separa `fraction` de ellas
+    (mínimo 1); si en total superan `max_queries` se evalúa una muestra
+    y el resto vuelve a la galería. Ambas galerías se construyen con las
+    fotos no separadas.
+
+    Returns:
+        Dict con queries, accuracy_full, accuracy_templates y delta
+    """
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, FaceIndex.DIMENSIONS)
+    labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+    rng = np.random.default_rng(seed)
+    held = np.zeros(labels.shape[0], dtype=bool)
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        if rows.size >= 2:
+            count = max(1, int(rows.size * fraction))
+            held[rng.choice(rows, size=count, replace=False)] = True
+    held_rows = np.flatnonzero(held)
+    if held_rows.size > max_queries:
+        held[:] = False
+        held[rng.choice(held_rows, size=max_queries, replace=False)] = True
+    queries, expected = encodings[held], labels[held]
+    full = FaceIndex(encodings[~held], labels[~held], [])
+    template_enc, template_labels, _ = aggregate_gallery(encodings[~held], labels[~held], max_templates)
+    compact = FaceIndex(template_enc, template_labels, [])
+    accuracy_full = _accuracy(full, queries, expected, tolerance)
+    accuracy_templates = _accuracy(compact, queries, expected, tolerance)
+    return {
+        "queries": int(queries.shape[0]),
+        "accuracy_full": round(accuracy_full, 4),
+        "accuracy_templates": round(accuracy_templates, 4),
+        "delta": round(accuracy_templates - accuracy_full, 4),
+    }
@@ -53,4 +53,13 @@ class Config:
     # CORS (ajustable según endpoints)
     CORS_SUPPORTS_CREDENTIALS = True
 
+    # Métricas SQL por petición (ver services/sql_metrics.py); desactivadas por defecto
+    SQL_METRICS_ENABLED = os.getenv("SQL_METRICS_ENABLED", "0") == "1"
+    # Agrega el header Server-Timing (db y app) a cada respuesta; expone
+    # tiempos internos a cualquier cliente, activarlo solo para diagnóstico
+    SQL_METRICS_SERVER_TIMING = os.getenv("SQL_METRICS_SERVER_TIMING", "0") == "1"
+    # Repeticiones de una misma sentencia en una petición a partir de las
+    # cuales se registra un posible N+1 (0 lo desactiva)
+    SQL_NPLUSONE_THRESHOLD = int(os.getenv("SQL_NPLUSONE_THRESHOLD", "20"))
+
     # Feature flags removidos: versión sin integración de reconocimiento facial
\ No newline at end of file
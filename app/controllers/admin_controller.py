@@ -4,8 +4,16 @@ from werkzeug.utils import secure_filename
 from ..extensions import db
 from ..models import User, Course, Enrollment, Student, Attendance, Alert
 import os
-from datetime import datetime, date
-from sqlalchemy.orm import joinedload
+from datetime import datetime, date, time
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from ..repositories.attendance import mark_attendance
+from ..repositories.stats import (
+    get_admin_totals_repo,
+    get_enrollment_counts_repo,
+    get_monthly_status_counts_repo,
+    get_status_counts_repo
+)
 from functools import wraps
 
 admin_bp = Blueprint("admin", __name__)
@@ -248,17 +256,30 @@ def attendance_create_action():
             flash("Formato de fecha inválido. Use YYYY-MM-DD.", "danger")
             return redirect(url_for("admin.attendance_create_view"))
         
-        attendance = Attendance(
-            student_id=student_id,
-            course_id=course_id,
-            date=attendance_date,
-            entry_time=entry_time if entry_time else None,
-            exit_time=exit_time if exit_time else None,
-            status=status
+        try:
+            entry_time = time.fromisoformat(entry_time) if entry_time else None
+            exit_time = time.fromisoformat(exit_time) if exit_time else None
+        except ValueError:
+            flash("Formato de hora inválido. Use HH:MM.", "danger")
+            return redirect(url_for("admin.attendance_create_view"))
+        
+        # Upsert del repositorio: si ya hay un registro ese día (p. ej. del
+        # streaming) se actualiza en lugar de chocar con la restricción única
+        result = mark_attendance(
+            student_id,
+            course_id,
+            status=status,
+            entry_time=entry_time,
+            exit_time=exit_time,
+            attendance_date=attendance_date
         )
-        db.session.add(attendance)
-        db.session.commit()
-        flash("Registro de asistencia creado exitosamente.", "success")
+        if not result["ok"]:
+            flash(result["message"], "danger")
+            return redirect(url_for("admin.attendance_create_view"))
+        if result["updated"]:
+            flash("Ya existía un registro para ese día; se actualizó con los datos ingresados.", "info")
+        else:
+            flash("Registro de asistencia creado exitosamente.", "success")
         return redirect(url_for("admin.attendance_view"))
     except Exception as e:
         db.session.rollback()
@@ -309,6 +330,11 @@ def attendance_edit_action(attendance_id):
         db.session.commit()
         flash("Registro de asistencia actualizado exitosamente.", "success")
         return redirect(url_for("admin.attendance_view"))
+    except IntegrityError:
+        # uq_attendance_student_course_date: otro registro del mismo estudiante, curso y día
+        db.session.rollback()
+        flash("Ya existe un registro de asistencia para ese estudiante, curso y día.", "danger")
+        return redirect(url_for("admin.attendance_edit_view", attendance_id=attendance_id))
     except Exception as e:
         db.session.rollback()
         flash(f"Error al actualizar asistencia: {str(e)}", "danger")
@@ -481,13 +507,15 @@ def get_students():
             elif scholarship_param in ['false', '0', 'no']:
                 query = query.filter(Student.is_scholarship_student == False)
         
-        students = query.all()
+        # Matrículas y cursos precargados: 2 consultas sin importar la cantidad de estudiantes
+        students = query.options(
+            selectinload(Student.enrollments).joinedload(Enrollment.course)
+        ).all()
         students_data = []
         
         for student in students:
-            # Obtener cursos en los que está matriculado
-            enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-            course_names = [Course.query.get(e.course_id).name for e in enrollments if Course.query.get(e.course_id)]
+            # Cursos en los que está matriculado
+            course_names = [e.course.name for e in student.enrollments if e.course]
             
             students_data.append({
                 "id": student.id,
@@ -539,6 +567,15 @@ def get_admin_courses():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+MONTH_LABELS = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+
+def _shift_month(month: date, offset: int) -> date:
+    """Primer día del mes desplazado offset meses."""
+    index = month.year * 12 + month.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
 @admin_api_bp.get("/admin/metrics")
 @jwt_required()
 def get_admin_metrics():
@@ -557,32 +594,24 @@ def get_admin_metrics():
         if role_value != 'admin':
             return jsonify({"error": "No autorizado"}), 403
         
-        # Contar estudiantes totales
-        total_students = Student.query.count()
-        
-        # Contar cursos del admin
-        total_courses = Course.query.filter_by(admin_id=user.id).count()
+        # Totales y conteos calculados en la base (sin cargar filas)
+        total_students, total_courses, total_enrollments = get_admin_totals_repo(user.id)
         
-        # Contar matriculaciones totales en cursos del admin
-        total_enrollments = db.session.query(Enrollment).join(Course).filter(
-            Course.admin_id == user.id
-        ).count()
-        
-        # Calcular asistencia promedio de hoy
+        # Asistencia de hoy (presentes + tardanzas) sobre los registros del día
         today = date.today()
-        today_attendance = db.session.query(Attendance).filter(
-            Attendance.date == today,
-            Attendance.status.in_(['presente', 'tardanza'])
-        ).count()
-        
-        total_today_records = db.session.query(Attendance).filter(
-            Attendance.date == today
-        ).count()
-        
-        attendance_today = round((today_attendance / total_today_records * 100), 1) if total_today_records > 0 else 0
+        total_today_records, present, late, _, _ = get_status_counts_repo(start_date=today, end_date=today)
+        attendance_today = round(((present + late) / total_today_records * 100), 1) if total_today_records > 0 else 0
+        
+        # Asistencia mensual de los cursos del admin en los últimos 6 meses
+        first_month = _shift_month(today.replace(day=1), -5)
+        by_month = {
+            month: round(((present + late) / total * 100), 1) if total else 0
+            for month, total, present, late, _, _ in get_monthly_status_counts_repo(admin_id=user.id, start_month=first_month)
+        }
+        months = [_shift_month(first_month, i) for i in range(6)]
         
-        # Obtener nombres de cursos del admin
-        course_names = [c.name for c in Course.query.filter_by(admin_id=user.id).limit(5).all()]
+        # Inscritos por curso (primeros 5 cursos del admin)
+        course_counts = get_enrollment_counts_repo(admin_id=user.id, limit=5)
         
         # Preparar datos de respuesta
         response_data = {
@@ -590,10 +619,10 @@ def get_admin_metrics():
             "total_courses": total_courses,
             "total_enrollments": total_enrollments,
             "attendance_today": attendance_today,
-            "months": ["Ene", "Feb", "Mar", "Abr", "May", "Jun"],
-            "attendance_data": [80, 82, 85, 83, 87, 90],
-            "course_names": course_names if course_names else ["Sin cursos"],
-            "course_students": [10, 15, 12, 8, 20][:max(len(course_names), 1)]
+            "months": [MONTH_LABELS[m.month - 1] for m in months],
+            "attendance_data": [by_month.get(m, 0) for m in months],
+            "course_names": [name for _, name, _ in course_counts] or ["Sin cursos"],
+            "course_students": [enrolled for _, _, enrolled in course_counts] or [0]
         }
         
         return jsonify(response_data)
@@ -681,20 +710,20 @@ def get_course_students(course_id: int):
         if not course or course.admin_id != user.id:
             return jsonify({"error": "Curso no encontrado o no autorizado"}), 404
         
-        # Obtener estudiantes matriculados
-        enrollments = Enrollment.query.filter_by(course_id=course_id).all()
-        students_data = []
-        
-        for enrollment in enrollments:
-            student = Student.query.get(enrollment.student_id)
-            if student:
-                students_data.append({
-                    "id": student.id,
-                    "first_name": student.first_name,
-                    "last_name": student.last_name,
-                    "email": student.email,
-                    "is_scholarship_student": student.is_scholarship_student
-                })
+        # Obtener estudiantes matriculados (una sola consulta)
+        students = Student.query.join(Enrollment, Enrollment.student_id == Student.id).filter(
+            Enrollment.course_id == course_id
+        ).order_by(Enrollment.id).all()
+        students_data = [
+            {
+                "id": student.id,
+                "first_name": student.first_name,
+                "last_name": student.last_name,
+                "email": student.email,
+                "is_scholarship_student": student.is_scholarship_student
+            }
+            for student in students
+        ]
         
         return jsonify({"data": students_data})
     except Exception as e:
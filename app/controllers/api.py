@@ -18,6 +18,7 @@ from ..models import Student, Alert, Attendance
 from ..models import User, Course, Enrollment
 from werkzeug.utils import secure_filename
 import base64
+import numpy as np
 
 # Importar cv2 de forma perezosa para evitar bloquear el arranque
 try:
@@ -26,8 +27,14 @@ except ImportError:
     cv2 = None
 
 try:
-    from app.services.face_recognition_service import generar_modelo
-    from app.services.face_recognition_service import reconocer_en_frame, dibujar_resultados, cargar_modelo
+    from app.services.face_recognition_service import construir_modelo, MODELO_DIR
+    from app.services.face_recognition_service import reconocer_en_frame, dibujar_resultados, registro_modelo, EstadoCamara
+    from app.services.model_build_service import ModelBuildJobs
+    from app.services.course_gallery_service import COURSE_GALLERIES
+    from app.services.student_directory_service import STUDENT_DIRECTORY
+    from app.services.camera_hub import CAMERA_HUB
+    from app.services.recognition_worker import RecognitionWorkers
+    from app.services.mjpeg import FRAME_CACHE, CONTENT_TYPE as MJPEG_CONTENT_TYPE, mjpeg_part, stream_options
 except ImportError:
     pass
 
@@ -39,21 +46,15 @@ except ImportError:
 
 api_bp = Blueprint("api", __name__)
 
-# Modelo de reconocimiento facial: carga perezosa
-KNOWN_ENCODINGS = None
-KNOWN_NAMES = None
-
+# Modelo de reconocimiento facial: registro con recarga en caliente
+# (cada worker detecta una nueva generación del modelo y la reemplaza atómicamente)
 def _load_known_model():
-    """Carga el modelo de reconocimiento facial bajo demanda.
-    No lanza excepción: en error devuelve listas vacías."""
-    global KNOWN_ENCODINGS, KNOWN_NAMES
-    if KNOWN_ENCODINGS is None or KNOWN_NAMES is None:
-        try:
-            from app.services.face_recognition_service import cargar_modelo as _cargar
-            KNOWN_ENCODINGS, KNOWN_NAMES = _cargar()
-        except Exception:
-            KNOWN_ENCODINGS, KNOWN_NAMES = [], []
-    return KNOWN_ENCODINGS, KNOWN_NAMES
+    """Devuelve el índice de rostros vigente (FaceIndex).
+    No lanza excepción: en error devuelve None."""
+    try:
+        return registro_modelo().current().index
+    except Exception:
+        return None
 
 
 # Endpoint de asistencia vía imagen (IA)
@@ -79,52 +80,44 @@ def admin_attendance_face():
         return jsonify({"error": "Curso no encontrado"}), 404
         
     # Cargar modelo de forma perezosa
-    known_encodings, known_names = _load_known_model()
-    if not known_encodings:
+    if not _load_known_model():
         return jsonify({"error": "Modelo de IA no cargado o vacío"}), 500
+
+    # Solo se compara contra los alumnos inscritos en el curso
+    index = COURSE_GALLERIES.index_for(course.id)
+    if not index:
+        return jsonify({"error": "Ningún inscrito del curso tiene fotos en el modelo"}), 404
         
     # Leer imagen
-    npimg = np.fromfile(file, np.uint8)
+    npimg = np.frombuffer(file.read(), np.uint8)
     frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
     
     if frame is None:
         return jsonify({"error": "Imagen inválida"}), 400
         
     # Reconocer
-    locs, names = reconocer_en_frame(frame, known_encodings, known_names, tolerance=0.5)
-    
+    locs, names = reconocer_en_frame(frame, index, tolerance=0.5)
+
+    # El modelo guarda el ID de estudiante de cada rostro: una sola consulta
+    # (solo por los IDs que no están en caché) para todo el frame
+    recognized = [name for name in names if name != "Desconocido"]
+    student_ids = index.student_ids_for(recognized)
+    students = STUDENT_DIRECTORY.get_many(student_ids)
+
     results = []
-    from ..services.attendance_service import mark_attendance
-    
-    for name in names:
-        if name == "Desconocido":
-            continue
-            
-        # Buscar estudiante por nombre (asumiendo formato "Nombre Apellido" o similar en carpetas)
-        # Esto es una simplificación. Idealmente el nombre de carpeta debería ser el ID o mapeable.
-        # Intentaremos buscar por concatenación de nombres
-        
-        # Estrategia: Buscar estudiante que coincida con el nombre detectado
-        # Asumimos que 'name' viene de la carpeta, ej: "Juan Perez"
-        
-        # Opción A: Buscar exacto en base de datos (concatenando first_name + last_name)
-        # Opción B: El nombre de la carpeta ES el ID del estudiante (más robusto)
-        # Vamos a intentar buscar por ID si el nombre es un número, sino por texto
-        
-        student = None
-        if name.isdigit():
-             student = Student.query.get(int(name))
-        else:
-            # Búsqueda aproximada o exacta
-            parts = name.split()
-            if len(parts) >= 1:
-                fname = parts[0]
-                lname = " ".join(parts[1:]) if len(parts) > 1 else ""
-                student = Student.query.filter(Student.first_name.ilike(f"%{fname}%")).first() # Simplificado
-        
+    from ..repositories.attendance import mark_attendance_many
+
+    # Todos los rostros del frame en una sola transacción
+    entry_time = datetime.now().time()
+    outcomes = mark_attendance_many(
+        course.id, [(sid, "presente", entry_time) for sid in student_ids if sid in students]
+    )
+    by_student = {res["student_id"]: res for res in outcomes}
+
+    for name, student_id in zip(recognized, student_ids):
+        student = students.get(student_id)
         if student:
-            res = mark_attendance(session_id=active_session.id, student_id=str(student.id), course_id=int(course_id))
-            results.append({"name": name, "student_id": student.id, "status": res})
+            results.append({"name": student["name"], "student_id": student["id"], "status": by_student.get(student["id"])})
         else:
             results.append({"name": name, "error": "Estudiante no encontrado en BD"})
             
@@ -586,15 +579,18 @@ def admin_students_list():
         want = scholarship in ("true", "1", "yes")
         q = q.filter_by(is_scholarship_student=want)
     students = q.all()
+    # Cursos del profesor (admin) de cada estudiante, en una sola consulta
+    courses_by_student = {}
+    for student_id, course_name in (
+        db.session.query(Enrollment.student_id, Course.name)
+        .join(Course, Enrollment.course_id == Course.id)
+        .filter(Course.admin_id == admin_id)
+        .order_by(Enrollment.id)
+    ):
+        courses_by_student.setdefault(student_id, []).append(course_name)
     items = []
     for s in students:
-        # Cursos del profesor (admin) a los que pertenece el estudiante
-        course_names = [
-            c.name
-            for c in Course.query.join(Enrollment, Enrollment.course_id == Course.id)
-            .filter(Enrollment.student_id == s.id, Course.admin_id == admin_id)
-            .all()
-        ]
+        course_names = courses_by_student.get(s.id, [])
         items.append({
             "id": s.id,
             "first_name": s.first_name,
@@ -805,20 +801,23 @@ def admin_course_students_list(course_id: int):
     if course.admin_id != admin_id:
         return jsonify({"error": "No autorizado"}), 403
     
-    # Obtener estudiantes inscritos en el curso
-    enrollments = Enrollment.query.filter_by(course_id=course_id).all()
-    students = []
-    
-    for enrollment in enrollments:
-        student = Student.query.get(enrollment.student_id)
-        if student:
-            students.append({
-                "id": student.id,
-                "first_name": student.first_name,
-                "last_name": student.last_name,
-                "email": student.email,
-                "is_scholarship_student": student.is_scholarship_student
-            })
+    # Obtener estudiantes inscritos en el curso (una sola consulta)
+    enrolled = (
+        Student.query.join(Enrollment, Enrollment.student_id == Student.id)
+        .filter(Enrollment.course_id == course_id)
+        .order_by(Enrollment.id)
+        .all()
+    )
+    students = [
+        {
+            "id": student.id,
+            "first_name": student.first_name,
+            "last_name": student.last_name,
+            "email": student.email,
+            "is_scholarship_student": student.is_scholarship_student
+        }
+        for student in enrolled
+    ]
     
     return jsonify(students), 200
 
@@ -1198,38 +1197,57 @@ def video_stream():
         resp = Response(status=200)
         resp.headers["Content-Type"] = "multipart/x-mixed-replace; boundary=frame"
         return resp
+    quality, width = stream_options(request.args)
+    # Sin recodificar: si la cámara ya emite MJPEG se reenvían sus JPEG tal cual
+    passthrough = not width and "quality" not in request.args
     def gen():
-        cap = cv2.VideoCapture(camera_url)
-        try:
+        # Una sola conexión por cámara compartida entre todos los espectadores
+        # y un solo JPEG por frame compartido entre los que piden la misma calidad
+        with CAMERA_HUB.open(camera_url) as feed:
+            seq = 0
             while True:
-                if not cap.isOpened():
-                    cap.release()
-                    cap = cv2.VideoCapture(camera_url)
-                    time.sleep(0.5)
+                packet = feed.wait_packet(seq)
+                if packet is None:
                     continue
-                ok, frame = cap.read()
-                if not ok:
-                    time.sleep(0.05)
+                seq = packet.seq
+                if passthrough and packet.jpeg is not None:
+                    data = packet.jpeg
+                else:
+                    frame = packet.frame()
+                    if frame is None:
+                        continue
+                    data = FRAME_CACHE.get(camera_url, "raw", seq, lambda: frame, quality, width)
+                if data is None:
                     continue
-                ok2, buf = cv2.imencode('.jpg', frame)
-                if not ok2:
-                    continue
-                data = buf.tobytes()
-                yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
-        finally:
-            try:
-                cap.release()
-            except Exception:
-                pass
-    return Response(stream_with_context(gen()), content_type="multipart/x-mixed-replace; boundary=frame")
+                yield from mjpeg_part(data)
+    return Response(stream_with_context(gen()), content_type=MJPEG_CONTENT_TYPE)
 
 FACE_PROC = None
 
-# Cargar modelo de reconocimiento facial de forma segura
+def _reload_known_model(job=None):
+    """Publica el modelo recién construido en este worker sin esperar al sondeo."""
+    registro_modelo().refresh(force=True)
+
+
+# Inferencia en un hilo por cámara, desacoplada del envío de frames
+try:
+    RECOGNITION_WORKERS = RecognitionWorkers(
+        CAMERA_HUB,
+        lambda frame, estado: reconocer_en_frame(
+            frame, _load_known_model(), tolerance=0.5, tracker=estado.tracker, detector=estado.detector
+        ),
+        make_state=EstadoCamara,
+    )
+except NameError:
+    RECOGNITION_WORKERS = None
+
+
+# Builds del modelo en segundo plano (un build activo a la vez)
 try:
-    KNOWN_ENCODINGS, KNOWN_NAMES = cargar_modelo()
-except (NameError, Exception):
-    KNOWN_ENCODINGS, KNOWN_NAMES = None, None
+    MODEL_BUILD_JOBS = ModelBuildJobs(MODELO_DIR, construir_modelo)
+    MODEL_BUILD_JOBS.on_success(_reload_known_model)
+except NameError:
+    MODEL_BUILD_JOBS = None
 
 @api_bp.post("/admin/face/run")
 def face_run():
@@ -1305,49 +1323,90 @@ def face_run():
 @api_bp.post("/admin/model/build")
 @jwt_required()
 def admin_model_build():
+    """Lanza la reconstrucción del modelo en segundo plano.
+
+    Si ya hay un build en curso devuelve ese mismo trabajo.
+    Body JSON opcional: { "incremental": true }
+    """
+    if not _require_role("admin"):
+        return jsonify({"error": "No autorizado"}), 401
+    if MODEL_BUILD_JOBS is None:
+        return jsonify({"error": "IA no disponible"}), 503
+    data = request.get_json(silent=True) or {}
+    job, created = MODEL_BUILD_JOBS.submit(incremental=bool(data.get("incremental", True)))
+    return jsonify({"job_id": job["id"], "status": job["status"], "created": created}), 202
+
+
+@api_bp.get("/admin/model/build/<job_id>")
+@jwt_required()
+def admin_model_build_status(job_id: str):
+    """Estado de un build: procesadas/total, throughput (img/s) y ETA (s)."""
     if not _require_role("admin"):
         return jsonify({"error": "No autorizado"}), 401
-    ok = generar_modelo()
-    if ok:
-        return jsonify({"ok": True}), 200
-    return jsonify({"error": "No se pudo generar modelo"}), 500
+    if MODEL_BUILD_JOBS is None:
+        return jsonify({"error": "IA no disponible"}), 503
+    job = MODEL_BUILD_JOBS.get(job_id)
+    if not job:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(job), 200
+
+
+@api_bp.get("/admin/model/version")
+@jwt_required()
+def admin_model_version():
+    """Generación del modelo cargada en este worker y cuándo se cargó."""
+    if not _require_role("admin"):
+        return jsonify({"error": "No autorizado"}), 401
+    try:
+        modelo = registro_modelo().current()
+    except NameError:
+        return jsonify({"error": "IA no disponible"}), 503
+    info = modelo.info()
+    info["pid"] = os.getpid()
+    return jsonify(info), 200
+
+
+@api_bp.get("/admin/debug/sql")
+@jwt_required()
+def admin_debug_sql():
+    """Métricas SQL por ruta de este worker (consultas, tiempo en la base, histogramas, N+1)."""
+    if not _require_role("admin"):
+        return jsonify({"error": "No autorizado"}), 401
+    from ..services.sql_metrics import SQL_METRICS
+    stats = SQL_METRICS.stats()
+    stats["pid"] = os.getpid()
+    if request.args.get("reset") in ("1", "true"):
+        SQL_METRICS.reset()
+    return jsonify(stats), 200
 
 @api_bp.get("/admin/recognize_stream")
 def recognize_stream():
     camera_url = request.args.get('url', '').strip()
     if not camera_url:
         return jsonify({"error": "url requerida"}), 400
+    quality, width = stream_options(request.args)
     def gen():
-        cap = cv2.VideoCapture(camera_url)
-        process_every = 3
-        i = 0
-        last_locs, last_names = [], []
-        try:
+        # Los frames salen al ritmo de la cámara; los recuadros vienen del
+        # último resultado terminado por el hilo de inferencia
+        with RECOGNITION_WORKERS.open(camera_url) as (feed, worker):
+            seq = 0
             while True:
-                if not cap.isOpened():
-                    cap.release()
-                    cap = cv2.VideoCapture(camera_url)
-                    time.sleep(0.5)
+                item = feed.wait_frame(seq)
+                if item is None:
                     continue
-                ok, frame = cap.read()
-                if not ok:
-                    time.sleep(0.05)
+                seq, frame = item
+                result = worker.current()
+                version = (seq, result.seq if result else 0)
+                locs, names = (result.locations, result.names) if result else ([], [])
+                # El frame es compartido (solo lectura): se dibuja sobre una copia
+                data = FRAME_CACHE.get(
+                    camera_url, "recognition", version,
+                    lambda: dibujar_resultados(frame.copy(), locs, names), quality, width
+                )
+                if data is None:
                     continue
-                i += 1
-                if i % process_every == 0:
-                    locs, names = reconocer_en_frame(frame, KNOWN_ENCODINGS or [], KNOWN_NAMES or [], tolerance=0.5)
-                    last_locs, last_names = locs, names
-                frame2 = dibujar_resultados(frame, last_locs, last_names)
-                ok2, buf = cv2.imencode('.jpg', frame2)
-                if not ok2:
-                    continue
-                yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
-        finally:
-            try:
-                cap.release()
-            except Exception:
-                pass
-    resp = Response(stream_with_context(gen()), content_type="multipart/x-mixed-replace; boundary=frame")
+                yield from mjpeg_part(data)
+    resp = Response(stream_with_context(gen()), content_type=MJPEG_CONTENT_TYPE)
     resp.headers["Cache-Control"] = "no-cache"
     return resp
 
@@ -1369,6 +1428,7 @@ def face_capture():
     source = (data.get("source") or "").strip()
     duration = int(data.get("duration") or 12)
     max_count = int(data.get("max_count") or 50)
+    student_id = data.get("student_id")
     if not name or not source:
         return jsonify({"error": "name y source requeridos"}), 400
     dest_root = r"c:\\Cloud Computing\\PROYECTO_FINAL\\TrabajoFinalCognitive\\fotos_conocidas"
@@ -1376,6 +1436,9 @@ def face_capture():
         safe = secure_filename(name)
     except Exception:
         safe = name.replace(" ", "_")
+    # La carpeta "<nombre>_<id>" asocia las fotos al estudiante en el modelo
+    if str(student_id or "").isdigit():
+        safe = f"{safe}_{int(student_id)}"
     dest_dir = os.path.join(dest_root, safe)
     try:
         os.makedirs(dest_dir, exist_ok=True)
@@ -1454,6 +1517,7 @@ def handle_save_frame():
         return jsonify({"msg": "Acceso denegado"}), 403
     data = request.get_json(silent=True) or {}
     person_name = (data.get('name') or '').strip()
+    student_id = data.get('student_id')
     image_b64 = data.get('image_base64') or ''
     if not person_name or not image_b64:
         return jsonify({"msg": "Faltan 'name' o 'image_base64'"}), 400
@@ -1468,6 +1532,8 @@ def handle_save_frame():
             safe = secure_filename(person_name)
         except Exception:
             safe = person_name.replace(" ", "_")
+        if str(student_id or "").isdigit():
+            safe = f"{safe}_{int(student_id)}"
         dest_dir = os.path.join(dest_root, safe)
         os.makedirs(dest_dir, exist_ok=True)
         existing = [f for f in os.listdir(dest_dir) if f.lower().endswith('.jpg')]
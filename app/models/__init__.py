@@ -2,6 +2,6 @@
 from .users.user import User
 from .students.student import Student
 from .courses.course import Course, Enrollment
-from .attendance.attendance import Attendance, Alert
+from .attendance.attendance import Attendance, AttendanceMonthlyStats, Alert
 
-__all__ = ['User', 'Student', 'Course', 'Enrollment', 'Attendance', 'Alert']
\ No newline at end of file
+__all__ = ['User', 'Student', 'Course', 'Enrollment', 'Attendance', 'AttendanceMonthlyStats', 'Alert']
\ No newline at end of file
@@ -1,4 +1,4 @@
 """Modelos de Asistencia"""
-from .attendance import Attendance, Alert
+from .attendance import Attendance, AttendanceMonthlyStats, Alert
 
-__all__ = ['Attendance', 'Alert']
+__all__ = ['Attendance', 'AttendanceMonthlyStats', 'Alert']
@@ -30,10 +30,44 @@ class Attendance(db.Model):
     )
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # Un registro por estudiante, curso y día (destino del upsert de asistencia)
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', 'date', name='uq_attendance_student_course_date'),
+    )
+
     def __repr__(self):
         return f'<Attendance {self.student_id} - {self.course_id} - {self.date} - {self.status}>'
 
 
+class AttendanceMonthlyStats(db.Model):
+    """
+    Conteos de asistencia por estado para un estudiante en un curso y mes.
+
+    Es un agregado de la tabla attendance que mantiene un trigger de la
+    base de datos (ver migración 9c4d2a7e5b13) en cada INSERT, UPDATE o
+    DELETE, incluidas las sentencias Core y los upserts. No se escribe
+    desde la aplicación; tools/check_attendance_stats.py compara y
+    repara contra los registros originales.
+    """
+    __tablename__ = 'attendance_monthly_stats'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    # Primer día del mes
+    month = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    early_exit = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_attendance_monthly_stats_course_month', 'course_id', 'month'),
+    )
+
+    def __repr__(self):
+        return f'<AttendanceMonthlyStats {self.student_id} - {self.course_id} - {self.month}>'
+
+
 class Alert(db.Model):
     """
     Modelo de Alerta.
@@ -50,5 +84,11 @@ class Alert(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     is_read = db.Column(db.Boolean, nullable=False, default=False)
 
+    __table_args__ = (
+        # Una sola alerta sin leer por estudiante y curso (ver absence_alerts)
+        db.Index('uq_alerts_open_student_course', 'student_id', 'course_id',
+                 unique=True, postgresql_where=db.text('NOT is_read'), sqlite_where=db.text('NOT is_read')),
+    )
+
     def __repr__(self):
         return f'<Alert {self.id} for Student {self.student_id}>'
@@ -1,4 +1,10 @@
 """Repositorio de Asistencia"""
-from .attendance_repository import mark_attendance, get_attendance_by_student, get_absence_count
+from .attendance_repository import (
+    mark_attendance, mark_attendance_many, get_attendance_by_student, get_absence_count,
+    get_attendance_summary, diff_attendance_summary, repair_attendance_summary
+)
 
-__all__ = ['mark_attendance', 'get_attendance_by_student', 'get_absence_count']
+__all__ = [
+    'mark_attendance', 'mark_attendance_many', 'get_attendance_by_student', 'get_absence_count',
+    'get_attendance_summary', 'diff_attendance_summary', 'repair_attendance_summary'
+]
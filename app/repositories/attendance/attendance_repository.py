@@ -4,11 +4,58 @@ Repositorio de Asistencia
 Este módulo contiene las funciones para acceder y modificar
 los registros de asistencia en la base de datos.
 """
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta, date
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+from datetime import datetime, time, timedelta, date
+
+from sqlalchemy import Date, cast, func, insert, literal_column, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.extensions import db
-from app.models import Attendance, Student, Course
+from app.models import Attendance, AttendanceMonthlyStats, Student, Course
+from app.services.change_tracking import record_change
+
+ATTENDANCE_STATUSES = ('presente', 'tardanza', 'falta', 'salida_repentina')
+
+
+def _validate_students(course_id: int, student_ids: List[int]) -> Tuple[bool, set]:
+    """
+    Valida estudiantes y curso en una sola consulta.
+
+    Returns:
+        Tupla (el curso existe, IDs de estudiantes existentes). Si ningún
+        estudiante existe, la existencia del curso no se consulta (True).
+    """
+    course_exists = db.session.query(Course.id).filter(Course.id == course_id).exists()
+    rows = db.session.query(Student.id, course_exists).filter(Student.id.in_(student_ids)).all()
+    return (bool(rows[0][1]) if rows else True), {student_id for student_id, _ in rows}
+
+
+def _upsert_attendance(rows: List[Dict[str, Any]], update_set) -> Dict[int, Tuple[int, bool]]:
+    """
+    INSERT ... ON CONFLICT (student_id, course_id, date) DO UPDATE en una sola sentencia.
+
+    Args:
+        rows: Valores de cada registro (un estudiante por fila)
+        update_set: update_set(excluded) -> columnas a actualizar si ya existía
+
+    Returns:
+        Dict student_id -> (id del registro, fue insertado)
+    """
+    stmt = pg_insert(Attendance).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_attendance_student_course_date',
+        set_=update_set(stmt.excluded)
+    ).returning(
+        Attendance.student_id,
+        Attendance.id,
+        # xmax = 0 solo en filas recién insertadas (no en las actualizadas)
+        literal_column("(xmax = 0)").label("inserted")
+    )
+    outcome = {student_id: (att_id, bool(inserted)) for student_id, att_id, inserted in db.session.execute(stmt)}
+    # El ORM no ve esta sentencia: se anuncia para los procesos que siguen la asistencia
+    for row in rows:
+        record_change(db.session, Attendance, row)
+    return outcome
 
 
 def mark_attendance(
@@ -21,6 +68,10 @@ def mark_attendance(
 ) -> Dict[str, Any]:
     """
     Registra la asistencia de un estudiante en un curso.
+
+    Si ya existe un registro del estudiante en el curso ese día se
+    actualiza en la misma sentencia (upsert), por lo que dos marcas
+    concurrentes no pueden crear duplicados.
     
     Args:
         student_id: ID del estudiante
@@ -38,61 +89,131 @@ def mark_attendance(
             return {"ok": False, "message": "student_id y course_id requeridos"}
 
         # Validar que existan el estudiante y el curso
-        student = Student.query.get(student_id)
-        if not student:
+        course_found, students_found = _validate_students(course_id, [student_id])
+        if int(student_id) not in students_found:
             return {"ok": False, "message": f"Estudiante {student_id} no encontrado"}
-
-        course = Course.query.get(course_id)
-        if not course:
+        if not course_found:
             return {"ok": False, "message": f"Curso {course_id} no encontrado"}
 
         # Usar la fecha proporcionada o la fecha actual
         if attendance_date is None:
             attendance_date = date.today()
 
-        # Verificar si ya existe un registro para este estudiante y fecha
-        existing = Attendance.query.filter_by(
-            student_id=student_id,
-            course_id=course_id,
-            date=attendance_date
-        ).first()
-
-        if existing:
-            # Actualizar el registro existente
-            existing.status = status
-            existing.entry_time = entry_time
-            existing.exit_time = exit_time
-            db.session.commit()
-            return {
-                "ok": True,
-                "message": "Asistencia actualizada",
-                "id": existing.id,
-                "updated": True
-            }
-        else:
-            # Crear nuevo registro
-            attendance = Attendance(
-                student_id=student_id,
-                course_id=course_id,
-                date=attendance_date,
-                status=status,
-                entry_time=entry_time,
-                exit_time=exit_time
-            )
-            db.session.add(attendance)
-            db.session.commit()
-            return {
-                "ok": True,
-                "message": "Asistencia registrada",
-                "id": attendance.id,
-                "updated": False
+        outcome = _upsert_attendance(
+            [{
+                "student_id": int(student_id),
+                "course_id": course_id,
+                "date": attendance_date,
+                "status": status,
+                "entry_time": entry_time,
+                "exit_time": exit_time
+            }],
+            lambda excluded: {
+                "status": excluded.status,
+                "entry_time": excluded.entry_time,
+                "exit_time": excluded.exit_time
             }
+        )
+        db.session.commit()
+        attendance_id, inserted = outcome[int(student_id)]
+        return {
+            "ok": True,
+            "message": "Asistencia registrada" if inserted else "Asistencia actualizada",
+            "id": attendance_id,
+            "updated": not inserted
+        }
 
     except Exception as e:
         db.session.rollback()
         return {"ok": False, "message": f"Error al registrar asistencia: {str(e)}"}
 
 
+def mark_attendance_many(
+    course_id: int,
+    entries: Sequence[Tuple[int, str, Optional[time]]],
+    attendance_date: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Registra la asistencia de varios estudiantes de un curso en una sola transacción.
+
+    Pensado para los rostros reconocidos en un frame: valida estudiantes y
+    curso con una consulta y escribe todos los registros con un único
+    upsert y un commit (en lugar de ~4 consultas y un commit por
+    estudiante). Si un estudiante aparece varias veces se usa la primera
+    entrada. Al actualizar un registro existente se conserva su hora de
+    entrada original.
+
+    Args:
+        course_id: ID del curso
+        entries: Lista de (student_id, status, entry_time)
+        attendance_date: Fecha de la asistencia (por defecto hoy)
+
+    Returns:
+        Un dict por estudiante (en el orden de entrada) con 'student_id',
+        'ok', 'message', y 'id'/'updated' si fue exitoso
+
+    Ejemplo:
+        >>> mark_attendance_many(3, [(10, 'presente', datetime.now().time()), (11, 'tardanza', None)])
+    """
+    if attendance_date is None:
+        attendance_date = date.today()
+
+    # Un mismo INSERT ... ON CONFLICT no puede tocar dos veces la misma fila
+    unique: Dict[int, Tuple[str, Optional[time]]] = {}
+    for student_id, status, entry_time in entries:
+        if student_id is not None:
+            unique.setdefault(int(student_id), (status, entry_time))
+    if not unique:
+        return []
+
+    results: Dict[int, Dict[str, Any]] = {}
+    try:
+        course_found, students_found = _validate_students(course_id, list(unique))
+        if not course_found:
+            return [
+                {"student_id": student_id, "ok": False, "message": f"Curso {course_id} no encontrado"}
+                for student_id in unique
+            ]
+
+        rows = []
+        for student_id, (status, entry_time) in unique.items():
+            if student_id not in students_found:
+                results[student_id] = {"student_id": student_id, "ok": False, "message": f"Estudiante {student_id} no encontrado"}
+            elif status not in ATTENDANCE_STATUSES:
+                results[student_id] = {"student_id": student_id, "ok": False, "message": f"Estado inválido: {status}"}
+            else:
+                rows.append({
+                    "student_id": student_id,
+                    "course_id": course_id,
+                    "date": attendance_date,
+                    "status": status,
+                    "entry_time": entry_time
+                })
+
+        if rows:
+            outcome = _upsert_attendance(rows, lambda excluded: {
+                "status": excluded.status,
+                "entry_time": func.coalesce(Attendance.entry_time, excluded.entry_time)
+            })
+            db.session.commit()
+            for student_id, (attendance_id, inserted) in outcome.items():
+                results[student_id] = {
+                    "student_id": student_id,
+                    "ok": True,
+                    "message": "Asistencia registrada" if inserted else "Asistencia actualizada",
+                    "id": attendance_id,
+                    "updated": not inserted
+                }
+    except Exception as e:
+        db.session.rollback()
+        return [
+            {"student_id": student_id, "ok": False, "message": f"Error al registrar asistencia: {str(e)}"}
+            for student_id in unique
+        ]
+
+    return [results[student_id] for student_id in unique]
+
+
 def get_attendance_by_student(
     student_id: int,
     course_id: Optional[int] = None,
@@ -171,3 +292,137 @@ def get_absence_count(
         return absences
     except Exception:
         return 0
+
+
+# Columna de attendance_monthly_stats por estado de asistencia
+_STATS_COLUMNS = {
+    'presente': 'present',
+    'tardanza': 'late',
+    'falta': 'absent',
+    'salida_repentina': 'early_exit',
+}
+
+
+def _month(column):
+    return cast(func.date_trunc('month', column), Date)
+
+
+def get_attendance_summary(
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Conteos de asistencia por estado desde el agregado mensual.
+
+    Lee attendance_monthly_stats (una fila por estudiante, curso y mes,
+    mantenida por trigger), sin recorrer los registros de asistencia.
+
+    Args:
+        student_id: ID del estudiante (opcional)
+        course_id: ID del curso (opcional)
+
+    Returns:
+        Dict con 'present', 'late', 'absent', 'early_exit' y 'total'
+    """
+    stats = AttendanceMonthlyStats
+    query = db.session.query(
+        *(func.coalesce(func.sum(getattr(stats, column)), 0) for column in _STATS_COLUMNS.values())
+    )
+    if student_id is not None:
+        query = query.filter(stats.student_id == student_id)
+    if course_id is not None:
+        query = query.filter(stats.course_id == course_id)
+    summary = dict(zip(_STATS_COLUMNS.values(), (int(value) for value in query.one())))
+    summary["total"] = sum(summary.values())
+    return summary
+
+
+def _raw_summary(month):
+    return select(
+        Attendance.student_id,
+        Attendance.course_id,
+        month,
+        *(func.count().filter(Attendance.status == status).label(column)
+          for status, column in _STATS_COLUMNS.items())
+    ).group_by(Attendance.student_id, Attendance.course_id, month)
+
+
+def diff_attendance_summary() -> List[Dict[str, Any]]:
+    """
+    Compara el agregado mensual con los registros de asistencia.
+
+    Ambas lecturas se hacen en una transacción REPEATABLE READ (la misma
+    instantánea), que se cierra al terminar: una marca confirmada entre
+    las dos consultas no aparece como diferencia. Debe llamarse sin una
+    transacción abierta en la sesión.
+
+    Returns:
+        Lista de diferencias con 'student_id', 'course_id', 'month',
+        'expected' y 'stored' (dicts de conteos; vacíos si la fila falta)
+    """
+    db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    try:
+        raw = db.session.execute(_raw_summary(_month(Attendance.date).label("month"))).all()
+        stored = db.session.query(
+            AttendanceMonthlyStats.student_id,
+            AttendanceMonthlyStats.course_id,
+            AttendanceMonthlyStats.month,
+            *(getattr(AttendanceMonthlyStats, column) for column in _STATS_COLUMNS.values())
+        ).all()
+    finally:
+        db.session.rollback()
+
+    def by_key(rows):
+        return {
+            tuple(row[:3]): {column: int(value) for column, value in zip(_STATS_COLUMNS.values(), row[3:]) if value}
+            for row in rows
+        }
+
+    expected, current = by_key(raw), by_key(stored)
+    return [
+        {
+            "student_id": key[0],
+            "course_id": key[1],
+            "month": key[2],
+            "expected": expected.get(key, {}),
+            "stored": current.get(key, {}),
+        }
+        for key in sorted(expected.keys() | current.keys())
+        if expected.get(key, {}) != current.get(key, {})
+    ]
+
+
+def repair_attendance_summary(differences: Sequence[Dict[str, Any]]) -> int:
+    """
+    Recalcula desde attendance las filas del agregado indicadas.
+
+    Toma LOCK TABLE attendance IN SHARE MODE (las marcas esperan hasta el
+    commit) y reescribe las filas con DELETE + INSERT ... SELECT, así los
+    conteos salen de los registros actuales y no de la instantánea del
+    diff, que pudo quedar vieja.
+
+    Args:
+        differences: Resultado de diff_attendance_summary
+
+    Returns:
+        Cantidad de filas recalculadas
+    """
+    if not differences:
+        return 0
+    stats = AttendanceMonthlyStats
+    keys = [(item["student_id"], item["course_id"], item["month"]) for item in differences]
+    month = _month(Attendance.date).label("month")
+    try:
+        db.session.execute(text("LOCK TABLE attendance IN SHARE MODE"))
+        db.session.query(stats).filter(
+            tuple_(stats.student_id, stats.course_id, stats.month).in_(keys)
+        ).delete(synchronize_session=False)
+        recomputed = _raw_summary(month).where(tuple_(Attendance.student_id, Attendance.course_id, month).in_(keys))
+        db.session.execute(insert(stats).from_select(
+            ["student_id", "course_id", "month", *_STATS_COLUMNS.values()], recomputed
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(keys)
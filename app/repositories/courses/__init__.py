@@ -7,7 +7,8 @@ from .courses_repository import (
     delete_course_repo,
     enroll_student_repo,
     unenroll_student_repo,
-    get_course_students_repo
+    get_course_students_repo,
+    get_course_student_ids_repo
 )
 
 __all__ = [
@@ -18,5 +19,6 @@ __all__ = [
     'delete_course_repo',
     'enroll_student_repo',
     'unenroll_student_repo',
-    'get_course_students_repo'
+    'get_course_students_repo',
+    'get_course_student_ids_repo'
 ]
@@ -124,3 +124,11 @@ def get_course_students_repo(course_id: int, limit: int = 100, offset: int = 0)
         }
         for s in students
     ], total
+
+
+def get_course_student_ids_repo(course_id: int) -> List[int]:
+    """Obtiene los IDs de los estudiantes inscritos en un curso (una sola consulta)"""
+    rows = db.session.query(Enrollment.student_id).filter(
+        Enrollment.course_id == course_id
+    ).all()
+    return [row[0] for row in rows]
@@ -0,0 +1,20 @@
+"""Repositorio de Estadísticas"""
+from .stats_repository import (
+    STATUS_FIELDS,
+    get_status_counts_repo,
+    get_status_counts_by_course_repo,
+    get_status_counts_by_period_repo,
+    get_monthly_status_counts_repo,
+    get_enrollment_counts_repo,
+    get_admin_totals_repo
+)
+
+__all__ = [
+    'STATUS_FIELDS',
+    'get_status_counts_repo',
+    'get_status_counts_by_course_repo',
+    'get_status_counts_by_period_repo',
+    'get_monthly_status_counts_repo',
+    'get_enrollment_counts_repo',
+    'get_admin_totals_repo'
+]
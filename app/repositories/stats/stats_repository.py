@@ -0,0 +1,200 @@
+"""
+Repositorio de Estadísticas
+
+Consultas de agregación de asistencia que resuelve la base de datos
+(COUNT(*) FILTER, GROUP BY por curso o por período) y devuelven tuplas
+simples, sin hidratar modelos del ORM.
+
+Cada fila de conteos sigue el orden de STATUS_FIELDS:
+(total, present, late, absent, early_exit).
+
+Ejemplo:
+    >>> total, present, late, absent, early_exit = get_status_counts_repo(course_id=3)
+    >>> for month, *counts in get_status_counts_by_period_repo('month', admin_id=1): ...
+"""
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func, select
+
+from app.extensions import db
+from app.models import Attendance, AttendanceMonthlyStats, Course, Enrollment, Student
+
+# Orden de los conteos en cada fila
+STATUS_FIELDS = ('total', 'present', 'late', 'absent', 'early_exit')
+# Estado de asistencia de cada conteo (salvo total)
+_STATUS_VALUES = ('presente', 'tardanza', 'falta', 'salida_repentina')
+# Agrupaciones admitidas por get_status_counts_by_period_repo
+PERIODS = ('day', 'week', 'month')
+
+
+def _count_columns():
+    return (func.count(),) + tuple(
+        func.count().filter(Attendance.status == status) for status in _STATUS_VALUES
+    )
+
+
+def _filter_attendance(
+    query,
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    if student_id is not None:
+        query = query.filter(Attendance.student_id == student_id)
+    if course_id is not None:
+        query = query.filter(Attendance.course_id == course_id)
+    if admin_id is not None:
+        query = query.filter(Attendance.course_id.in_(select(Course.id).where(Course.admin_id == admin_id)))
+    if start_date is not None:
+        query = query.filter(Attendance.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Attendance.date <= end_date)
+    return query
+
+
+def get_status_counts_repo(
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[int, ...]:
+    """
+    Conteos de asistencia por estado en una sola fila.
+
+    Args:
+        student_id: Filtra por estudiante (opcional)
+        course_id: Filtra por curso (opcional)
+        admin_id: Filtra por los cursos de un administrador (opcional)
+        start_date: Fecha inicial inclusive (opcional)
+        end_date: Fecha final inclusive (opcional)
+
+    Returns:
+        Tupla (total, present, late, absent, early_exit)
+    """
+    query = _filter_attendance(
+        db.session.query(*_count_columns()), student_id, course_id, admin_id, start_date, end_date
+    )
+    return tuple(query.one())
+
+
+def get_status_counts_by_course_repo(
+    admin_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[Tuple[int, ...]]:
+    """
+    Conteos de asistencia por estado agrupados por curso.
+
+    Returns:
+        Lista de tuplas (course_id, total, present, late, absent, early_exit)
+    """
+    query = _filter_attendance(
+        db.session.query(Attendance.course_id, *_count_columns()),
+        student_id=student_id, admin_id=admin_id, start_date=start_date, end_date=end_date
+    )
+    return [tuple(row) for row in query.group_by(Attendance.course_id).order_by(Attendance.course_id)]
+
+
+def get_status_counts_by_period_repo(
+    period: str = 'month',
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[Tuple]:
+    """
+    Conteos de asistencia por estado agrupados por día, semana o mes.
+
+    Args:
+        period: 'day', 'week' o 'month'
+        (demás filtros como en get_status_counts_repo)
+
+    Returns:
+        Lista de tuplas (inicio del período, total, present, late, absent,
+        early_exit) ordenada por fecha; los períodos sin registros no aparecen
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Período inválido: {period}")
+    bucket = Attendance.date if period == 'day' else cast(func.date_trunc(period, Attendance.date), Date)
+    bucket = bucket.label('bucket')
+    query = _filter_attendance(
+        db.session.query(bucket, *_count_columns()), student_id, course_id, admin_id, start_date, end_date
+    )
+    return [tuple(row) for row in query.group_by(bucket).order_by(bucket)]
+
+
+def get_monthly_status_counts_repo(
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+    start_month: Optional[date] = None
+) -> List[Tuple]:
+    """
+    Igual que get_status_counts_by_period_repo('month') pero desde el
+    agregado attendance_monthly_stats (una fila por estudiante, curso y
+    mes en lugar de una por registro).
+
+    Args:
+        start_month: Primer mes a incluir (cualquier día del mes)
+
+    Returns:
+        Lista de tuplas (mes, total, present, late, absent, early_exit)
+    """
+    stats = AttendanceMonthlyStats
+    query = db.session.query(
+        stats.month,
+        func.sum(stats.present + stats.late + stats.absent + stats.early_exit),
+        *(func.sum(getattr(stats, field)) for field in STATUS_FIELDS[1:])
+    )
+    if student_id is not None:
+        query = query.filter(stats.student_id == student_id)
+    if course_id is not None:
+        query = query.filter(stats.course_id == course_id)
+    if admin_id is not None:
+        query = query.filter(stats.course_id.in_(select(Course.id).where(Course.admin_id == admin_id)))
+    if start_month is not None:
+        query = query.filter(stats.month >= start_month.replace(day=1))
+    return [
+        (month,) + tuple(int(value or 0) for value in values)
+        for month, *values in query.group_by(stats.month).order_by(stats.month)
+    ]
+
+
+def get_enrollment_counts_repo(admin_id: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple]:
+    """
+    Inscritos por curso (incluye cursos sin inscritos).
+
+    Returns:
+        Lista de tuplas (course_id, nombre, inscritos) ordenada por ID de curso
+    """
+    query = db.session.query(Course.id, Course.name, func.count(Enrollment.id)).outerjoin(
+        Enrollment, Enrollment.course_id == Course.id
+    )
+    if admin_id is not None:
+        query = query.filter(Course.admin_id == admin_id)
+    query = query.group_by(Course.id, Course.name).order_by(Course.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [tuple(row) for row in query]
+
+
+def get_admin_totals_repo(admin_id: int) -> Tuple[int, int, int]:
+    """
+    Totales del panel de un administrador en una consulta.
+
+    Returns:
+        Tupla (estudiantes totales, cursos del admin, inscripciones en sus cursos)
+    """
+    admin_courses = select(Course.id).where(Course.admin_id == admin_id)
+    row = db.session.query(
+        select(func.count()).select_from(Student).scalar_subquery(),
+        select(func.count()).select_from(Course).where(Course.admin_id == admin_id).scalar_subquery(),
+        select(func.count()).select_from(Enrollment).where(Enrollment.course_id.in_(admin_courses)).scalar_subquery()
+    ).one()
+    return tuple(row)
@@ -5,7 +5,9 @@ from .students_repository import (
     create_student_repo,
     update_student_repo,
     delete_student_repo,
-    get_student_courses_repo
+    get_student_courses_repo,
+    get_student_names_repo,
+    get_student_summaries_repo
 )
 
 __all__ = [
@@ -14,5 +16,7 @@ __all__ = [
     'create_student_repo',
     'update_student_repo',
     'delete_student_repo',
-    'get_student_courses_repo'
+    'get_student_courses_repo',
+    'get_student_names_repo',
+    'get_student_summaries_repo'
 ]
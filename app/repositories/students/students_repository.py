@@ -84,3 +84,18 @@ def get_student_courses_repo(student_id: int) -> List[Dict[str, Any]]:
         }
         for c in courses
     ]
+
+
+def get_student_names_repo() -> List[Tuple[int, str, str]]:
+    """Obtiene (id, first_name, last_name) de todos los estudiantes en una sola consulta"""
+    return [tuple(row) for row in db.session.query(Student.id, Student.first_name, Student.last_name).all()]
+
+
+def get_student_summaries_repo(student_ids: List[int]) -> List[Tuple[int, str, str, str, bool]]:
+    """Obtiene (id, first_name, last_name, email, is_scholarship_student) de varios estudiantes en una sola consulta"""
+    if not student_ids:
+        return []
+    rows = db.session.query(
+        Student.id, Student.first_name, Student.last_name, Student.email, Student.is_scholarship_student
+    ).filter(Student.id.in_(list(student_ids))).all()
+    return [tuple(row) for row in rows]
@@ -0,0 +1,338 @@
+"""
+Motor Incremental de Alertas por Inasistencia
+
+Antes, cada 'falta' ejecutaba en la misma petición un COUNT(*) sobre la
+asistencia del estudiante y una búsqueda de alertas; cerrar una sesión
+con 40 faltas sumaba más de 80 consultas al camino de escritura. Ahora:
+
+- Cada cambio confirmado en attendance (ORM o upsert del repositorio,
+  ver change_tracking) se encola como (student_id, course_id, date,
+  status) sin consultar la base.
+- Un hilo procesa la cola por lotes: recuenta desde attendance, con una
+  sola consulta agrupada por lote, las faltas de cada (estudiante, curso)
+  con una falta nueva (las demás marcas no pueden cruzar un umbral)
+  dentro de la ventana deslizante de ABSENCE_WINDOW_DAYS, aplica
+  las reglas de ABSENCE_RULES y crea las alertas nuevas con un único
+  commit por lote. No se guardan contadores en memoria: con varios
+  workers cada uno vería solo sus propios cambios.
+- El índice único parcial uq_alerts_open_student_course (una alerta sin
+  leer por estudiante y curso) más INSERT ... ON CONFLICT DO NOTHING
+  evita duplicados cuando dos workers evalúan la misma clave a la vez.
+- Una alerta leída no se repite por las mismas faltas: una clave solo
+  vuelve a alertar si tiene una falta posterior al día de su última
+  alerta (leída o no).
+
+`backfill()` (ver app/tools/backfill_absence_alerts.py) recuenta todas
+las claves desde la tabla attendance y emite las alertas faltantes.
+
+Ejemplo:
+    >>> ABSENCE_ALERTS.init_app(app)      # en create_app
+    >>> ABSENCE_ALERTS.flush()            # procesa la cola ahora (tests, herramientas)
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.extensions import db
+from app.models import Alert, Attendance
+from app.services.change_tracking import on_commit
+
+# Días de la ventana deslizante de faltas
+ABSENCE_WINDOW_DAYS = 30
+# Estados que cuentan como falta
+ABSENT_STATUSES = ("falta", "salida_repentina")
+# Segundos máximos que un cambio espera en la cola antes de procesarse
+FLUSH_INTERVAL = float(os.getenv("ABSENCE_ALERTS_FLUSH_INTERVAL", "1.0"))
+# Cambios máximos por lote
+BATCH_SIZE = 500
+
+Key = Tuple[int, int]  # (student_id, course_id)
+
+
+class AbsenceRule(NamedTuple):
+    """Regla de alerta: se aplica la primera que cumple el estudiante."""
+    min_absences: int
+    scholarship_only: bool
+    message: str
+
+
+# Única definición de los umbrales de alerta (en orden de prioridad)
+ABSENCE_RULES: Tuple[AbsenceRule, ...] = (
+    AbsenceRule(4, True, "Alerta: El estudiante tiene {count} faltas en los últimos {days} días"),
+    AbsenceRule(3, False, "El estudiante ha acumulado {count} faltas en el curso en los últimos {days} días"),
+)
+
+
+def matching_rule(count: int, is_scholarship: bool, rules: Iterable[AbsenceRule] = ABSENCE_RULES) -> Optional[AbsenceRule]:
+    """Primera regla que cumple un estudiante con `count` faltas en la ventana."""
+    for rule in rules:
+        if count >= rule.min_absences and (is_scholarship or not rule.scholarship_only):
+            return rule
+    return None
+
+
+def _describe_attendance(row, deleted: bool):
+    return (row.student_id, row.course_id, row.date, None if deleted else row.status)
+
+
+class AbsenceAlertEngine:
+    """Recuento de faltas por (estudiante, curso) y emisión de alertas por lotes."""
+
+    def __init__(
+        self,
+        window_days: int = ABSENCE_WINDOW_DAYS,
+        rules: Tuple[AbsenceRule, ...] = ABSENCE_RULES,
+        flush_interval: float = FLUSH_INTERVAL,
+        batch_size: int = BATCH_SIZE
+    ):
+        self.window_days = window_days
+        self.rules = rules
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.app = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._listening = False
+        self.stats_data = {"events": 0, "batches": 0, "counts": 0, "alerts": 0, "last_batch_ms": 0.0}
+
+    def init_app(self, app) -> None:
+        """Asocia la app (el hilo usa su contexto) y escucha los cambios de attendance."""
+        self.app = app
+        if not self._listening:
+            on_commit(Attendance, self.record, describe=_describe_attendance)
+            atexit.register(self.flush)
+            self._listening = True
+
+    # --- Entrada -------------------------------------------------------
+
+    def record(self, changes: Optional[List[Tuple[int, int, date, Optional[str]]]]) -> None:
+        """
+        Encola cambios confirmados de asistencia (no consulta la base).
+
+        Args:
+            changes: (student_id, course_id, date, status o None si se eliminó),
+                o None si hubo un cambio masivo (sin claves que evaluar)
+        """
+        if self.app is None:
+            try:
+                self.app = current_app._get_current_object()
+            except RuntimeError:
+                return
+        if changes is None:
+            self._queue.put(None)
+        else:
+            for change in changes:
+                self._queue.put(change)
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="absence-alerts", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process_in_app(batch)
+
+    def flush(self) -> int:
+        """Procesa ahora todo lo encolado; devuelve las alertas creadas."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return self._process_in_app(batch) if batch else 0
+
+    def _process_in_app(self, batch) -> int:
+        if self.app is None:
+            return 0
+        try:
+            with self.app.app_context():
+                return self.process(batch)
+        except Exception as e:
+            print(f"Error procesando alertas de inasistencia: {str(e)}")
+            return 0
+
+    # --- Procesamiento ---------------------------------------------------
+
+    def _cutoff(self, today: Optional[date] = None) -> date:
+        return (today or date.today()) - timedelta(days=self.window_days)
+
+    def _count(self, keys: Optional[Iterable[Key]], cutoff: date) -> Dict[Key, Tuple[int, Optional[date]]]:
+        """
+        Faltas en la ventana y día de la última, en una consulta agrupada.
+
+        Args:
+            keys: Claves a contar (None = todas las que tienen faltas)
+        """
+        counts: Dict[Key, Tuple[int, Optional[date]]] = {}
+        query = db.session.query(
+            Attendance.student_id, Attendance.course_id, func.count(), func.max(Attendance.date)
+        ).filter(
+            Attendance.date >= cutoff,
+            Attendance.status.in_(ABSENT_STATUSES)
+        )
+        if keys is not None:
+            counts = {key: (0, None) for key in keys}
+            if not counts:
+                return counts
+            query = query.filter(tuple_(Attendance.student_id, Attendance.course_id).in_(list(counts)))
+        for student_id, course_id, count, last_absence in query.group_by(Attendance.student_id, Attendance.course_id):
+            counts[(student_id, course_id)] = (count, last_absence)
+        self.stats_data["counts"] += 1
+        return counts
+
+    def process(self, batch: List[Optional[Tuple[int, int, date, Optional[str]]]]) -> int:
+        """
+        Recuenta las claves con faltas nuevas en un lote y emite las alertas.
+
+        Solo las faltas pueden llevar una clave a un umbral: un lote de
+        presentes o tardanzas no consulta la base. La base ya incluye los cambios confirmados del lote (y los de los
+        demás workers), así que no se aplican deltas en memoria.
+
+        Requiere contexto de aplicación. Devuelve las alertas creadas.
+        """
+        started = time.perf_counter()
+        with self._process_lock:
+            changes = [change for change in batch if change is not None]
+            touched = {
+                (student_id, course_id)
+                for student_id, course_id, _, status in changes
+                if status in ABSENT_STATUSES
+            }
+            created = self._emit(self._count(touched, self._cutoff())) if touched else 0
+
+            self.stats_data["events"] += len(changes)
+            self.stats_data["batches"] += 1
+            self.stats_data["last_batch_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return created
+
+    def _emit(self, counts: Dict[Key, Tuple[int, Optional[date]]]) -> int:
+        """
+        Crea en un solo commit las alertas de las claves que cumplen una regla.
+
+        Se omiten las claves con una alerta sin leer y las que ya tienen una
+        alerta (leída o no) del día de su última falta o posterior: leer una
+        alerta no la vuelve a disparar hasta que haya una falta nueva. Si
+        otro worker crea la alerta entre la consulta y el INSERT, ON CONFLICT
+        sobre uq_alerts_open_student_course descarta la fila.
+
+        Args:
+            counts: Clave -> (faltas en la ventana, día de la última falta)
+        """
+        lowest = min(rule.min_absences for rule in self.rules)
+        candidates = [key for key, (count, _) in counts.items() if count >= lowest]
+        if not candidates:
+            return 0
+        from app.services.student_directory_service import STUDENT_DIRECTORY
+
+        students = STUDENT_DIRECTORY.get_many(student_id for student_id, _ in candidates)
+        # Por clave: (alertas sin leer, creación de la última alerta)
+        alerted = {
+            (student_id, course_id): (unread, last_alert)
+            for student_id, course_id, unread, last_alert in db.session.query(
+                Alert.student_id,
+                Alert.course_id,
+                func.count().filter(Alert.is_read.is_(False)),
+                func.max(Alert.created_at)
+            ).filter(
+                tuple_(Alert.student_id, Alert.course_id).in_(candidates)
+            ).group_by(Alert.student_id, Alert.course_id)
+        }
+        rows = []
+        for student_id, course_id in candidates:
+            student = students.get(student_id)
+            if student is None:
+                continue
+            count, last_absence = counts[(student_id, course_id)]
+            unread, last_alert = alerted.get((student_id, course_id), (0, None))
+            if unread or (last_alert is not None and last_absence is not None
+                          and last_alert.date() >= last_absence):
+                continue
+            rule = matching_rule(count, student["is_scholarship_student"], self.rules)
+            if rule is not None:
+                rows.append({
+                    "student_id": student_id,
+                    "course_id": course_id,
+                    "message": rule.message.format(count=count, days=self.window_days),
+                    "is_read": False,
+                })
+        if not rows:
+            return 0
+        stmt = pg_insert(Alert).values(rows).on_conflict_do_nothing(
+            index_elements=[Alert.student_id, Alert.course_id],
+            index_where=~Alert.is_read
+        ).returning(Alert.id)
+        created = len(db.session.execute(stmt).all())
+        db.session.commit()
+        self.stats_data["alerts"] += created
+        return created
+
+    def evaluate(self, keys: Iterable[Key]) -> int:
+        """
+        Evalúa de inmediato las reglas para algunas claves (sin pasar por la cola).
+
+        Requiere contexto de aplicación. Devuelve las alertas creadas.
+        """
+        keys = {(int(student_id), int(course_id)) for student_id, course_id in keys}
+        with self._process_lock:
+            return self._emit(self._count(keys, self._cutoff()))
+
+    def backfill(self, today: Optional[date] = None, emit: bool = True) -> Dict[str, Any]:
+        """
+        Recuenta todas las claves con faltas desde attendance (una consulta).
+
+        Requiere contexto de aplicación.
+
+        Args:
+            today: Fin de la ventana (por defecto hoy)
+            emit: Crear las alertas faltantes
+
+        Returns:
+            Dict con counters, over_threshold y alerts (creadas)
+        """
+        with self._process_lock:
+            counts = self._count(None, self._cutoff(today))
+            lowest = min(rule.min_absences for rule in self.rules)
+            report = {
+                "counters": len(counts),
+                "over_threshold": sum(1 for count, _ in counts.values() if count >= lowest),
+                "alerts": 0,
+            }
+            if emit:
+                report["alerts"] = self._emit(counts)
+            return report
+
+    def absences(self, student_id: int, course_id: int) -> int:
+        """Faltas en la ventana del estudiante en el curso (consulta la base)."""
+        return self._count([(student_id, course_id)], self._cutoff())[(student_id, course_id)][0]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.stats_data, queued=self._queue.qsize())
+
+
+ABSENCE_ALERTS = AbsenceAlertEngine()
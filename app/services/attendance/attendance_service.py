@@ -11,9 +11,9 @@ from datetime import datetime, date, timedelta
 from app.repositories.attendance.attendance_repository import (
     mark_attendance,
     get_attendance_by_student,
-    get_absence_count
+    get_attendance_summary
 )
-from app.models import Student, Alert, Attendance
+from app.services.absence_alerts import ABSENCE_ALERTS
 
 
 class AttendanceService:
@@ -38,8 +38,8 @@ class AttendanceService:
         """
         Registra la asistencia de un estudiante.
         
-        Si el estudiante es becario y tiene más de 3 faltas,
-        se genera una alerta automáticamente.
+        Las alertas por inasistencia (reglas en absence_alerts.ABSENCE_RULES)
+        se evalúan en segundo plano a partir del cambio confirmado.
         
         Args:
             student_id: ID del estudiante
@@ -52,23 +52,13 @@ class AttendanceService:
             Dict con resultado de la operación
         """
         # Registrar asistencia usando el repositorio
-        result = mark_attendance(
+        return mark_attendance(
             student_id=student_id,
             course_id=course_id,
             status=status,
             entry_time=entry_time,
             exit_time=exit_time
         )
-        
-        if not result['ok']:
-            return result
-        
-        # Verificar si necesita alerta (solo si el estudiante es becario)
-        student = Student.query.get(student_id)
-        if student and student.is_scholarship_student:
-            AttendanceService.check_absence_alerts(student_id, course_id)
-        
-        return result
     
     @staticmethod
     def get_student_attendance(
@@ -122,8 +112,8 @@ class AttendanceService:
     @staticmethod
     def check_absence_alerts(student_id: int, course_id: int) -> bool:
         """
-        Verifica si el estudiante becario tiene más de 3 faltas
-        y genera una alerta si es necesario.
+        Evalúa de inmediato las reglas de alerta por inasistencia
+        (ABSENCE_RULES) y genera una alerta si corresponde.
         
         Args:
             student_id: ID del estudiante
@@ -132,29 +122,7 @@ class AttendanceService:
         Returns:
             True si se generó una alerta, False en caso contrario
         """
-        from app.extensions import db
-        
-        absence_count = get_absence_count(student_id, course_id, days=30)
-        
-        if absence_count > 3:
-            # Verificar si ya existe una alerta activa
-            existing_alert = Alert.query.filter_by(
-                student_id=student_id,
-                course_id=course_id,
-                is_read=False
-            ).first()
-            
-            if not existing_alert:
-                alert = Alert(
-                    student_id=student_id,
-                    course_id=course_id,
-                    message=f"Alerta: El estudiante tiene {absence_count} faltas en los últimos 30 días"
-                )
-                db.session.add(alert)
-                db.session.commit()
-                return True
-        
-        return False
+        return ABSENCE_ALERTS.evaluate([(student_id, course_id)]) > 0
     
     @staticmethod
     def get_attendance_stats(course_id: int) -> Dict[str, Any]:
@@ -168,15 +136,15 @@ class AttendanceService:
             Dict con estadísticas agregadas del curso
         """
         try:
-            attendances = Attendance.query.filter_by(course_id=course_id).all()
+            summary = get_attendance_summary(course_id=course_id)
             
-            if not attendances:
+            if not summary["total"]:
                 return {"ok": False, "message": "No hay registros de asistencia"}
             
-            total = len(attendances)
-            present = sum(1 for a in attendances if a.status == 'presente')
-            tardy = sum(1 for a in attendances if a.status == 'tardanza')
-            absent = sum(1 for a in attendances if a.status in ['falta', 'salida_repentina'])
+            total = summary["total"]
+            present = summary["present"]
+            tardy = summary["late"]
+            absent = summary["absent"] + summary["early_exit"]
             
             return {
                 "ok": True,
@@ -3,14 +3,16 @@ Servicio de Asistencia
 
 Orquesta la lógica de negocio para operaciones con asistencia.
 Utiliza el repositorio para acceder a datos.
-Implementa alertas automáticas por inasistencia.
+Las alertas automáticas por inasistencia las emite el motor incremental
+(ver absence_alerts) a partir de los cambios confirmados.
 """
 from typing import Dict, Any, Optional, List
 from datetime import date, datetime
 from ..repositories.attendance.attendance_repository import (
     mark_attendance as repo_mark_attendance,
     get_attendance_by_student as repo_get_attendance_by_student,
-    get_absence_count
+    get_absence_count,
+    get_attendance_summary
 )
 from ..models import Attendance, Alert, Student, Course
 
@@ -18,15 +20,12 @@ from ..models import Attendance, Alert, Student, Course
 class AttendanceService:
     """Servicio para gestionar asistencia"""
     
-    # Umbral de faltas para generar alerta
-    ABSENCE_THRESHOLD = 3
-    
     def mark_attendance(self, student_id: int, course_id: int, status: str = 'presente',
                        entry_time: Optional[str] = None, exit_time: Optional[str] = None,
                        attendance_date: Optional[str] = None) -> Dict[str, Any]:
-        """Marca la asistencia de un estudiante y genera alertas si es necesario"""
+        """Marca la asistencia de un estudiante (las alertas se evalúan en segundo plano)"""
         try:
-            result = repo_mark_attendance(
+            return repo_mark_attendance(
                 student_id=student_id,
                 course_id=course_id,
                 status=status,
@@ -34,12 +33,6 @@ class AttendanceService:
                 exit_time=exit_time,
                 attendance_date=attendance_date
             )
-            
-            if result.get('ok') and status == 'falta':
-                # Verificar si debe generarse alerta
-                self._check_and_create_alert(student_id, course_id)
-            
-            return result
         except Exception as e:
             return {
                 "ok": False,
@@ -130,14 +123,10 @@ class AttendanceService:
                     "message": f"Estudiante {student_id} no encontrado"
                 }
             
-            query = Attendance.query.filter_by(student_id=student_id)
-            
-            if course_id:
-                query = query.filter_by(course_id=course_id)
-            
-            records = query.all()
+            # Conteos desde el agregado mensual (sin cargar los registros)
+            summary = get_attendance_summary(student_id=student_id, course_id=course_id)
             
-            if not records:
+            if not summary["total"]:
                 return {
                     "ok": True,
                     "data": {
@@ -150,11 +139,11 @@ class AttendanceService:
                     }
                 }
             
-            total = len(records)
-            present = len([r for r in records if r.status == 'presente'])
-            late = len([r for r in records if r.status == 'tardanza'])
-            absent = len([r for r in records if r.status == 'falta'])
-            early_exit = len([r for r in records if r.status == 'salida_repentina'])
+            total = summary["total"]
+            present = summary["present"]
+            late = summary["late"]
+            absent = summary["absent"]
+            early_exit = summary["early_exit"]
             
             attendance_rate = (present / total * 100) if total > 0 else 0
             
@@ -259,36 +248,6 @@ class AttendanceService:
                 "message": f"Error al eliminar asistencia: {str(e)}"
             }
     
-    def _check_and_create_alert(self, student_id: int, course_id: int) -> None:
-        """Verifica si debe crearse una alerta por inasistencia"""
-        try:
-            from ..extensions import db
-            
-            # Contar faltas del estudiante en el curso
-            absence_count = Attendance.query.filter(
-                Attendance.student_id == student_id,
-                Attendance.course_id == course_id,
-                Attendance.status == 'falta'
-            ).count()
-            
-            if absence_count >= self.ABSENCE_THRESHOLD:
-                # Verificar si ya existe una alerta activa
-                existing_alert = Alert.query.filter(
-                    Alert.student_id == student_id,
-                    Alert.course_id == course_id
-                ).first()
-                
-                if not existing_alert:
-                    alert = Alert(
-                        student_id=student_id,
-                        course_id=course_id,
-                        message=f"El estudiante ha acumulado {absence_count} faltas en el curso"
-                    )
-                    db.session.add(alert)
-                    db.session.commit()
-        except Exception as e:
-            print(f"Error al crear alerta de inasistencia: {str(e)}")
-    
     @staticmethod
     def _attendance_to_dict(attendance: Attendance) -> Dict[str, Any]:
         """Convierte un objeto Attendance a diccionario"""
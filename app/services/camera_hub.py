@@ -0,0 +1,245 @@
+"""
+Hub de Cámaras Compartidas
+
+Mantiene un solo hilo lector por URL de cámara que publica los frames en
+un buffer circular pequeño. Todos los suscriptores HTTP (pestañas del
+navegador viendo la misma ESP32-CAM) leen del último frame disponible en
+lugar de abrir cada uno su propia conexión con cv2.VideoCapture, y un
+cliente lento simplemente salta frames sin frenar la decodificación.
+
+La cámara se abre con el primer suscriptor y se cierra cuando se va el
+último (conteo de referencias).
+
+Las cámaras HTTP que ya emiten MJPEG (ESP32-CAM: http://...:81/stream) se
+leen en modo pass-through: se guardan los JPEG tal como llegan y solo se
+decodifican (una vez por frame) cuando alguien necesita los píxeles, por
+ejemplo el reconocimiento o un overlay. El resto de fuentes se leen con
+cv2.VideoCapture.
+
+Ejemplo:
+    >>> with CAMERA_HUB.open(camera_url) as feed:
+    ...     seq = 0
+    ...     while True:
+    ...         item = feed.wait_frame(seq)
+    ...         if item is None:
+    ...             continue
+    ...         seq, frame = item
+"""
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .mjpeg import iter_mjpeg, parse_boundary
+
+# Frames recientes que se conservan por cámara
+BUFFER_SIZE = 3
+# Lecturas fallidas seguidas antes de reabrir la conexión
+MAX_READ_FAILURES = 40
+# Leer cámaras MJPEG por HTTP sin decodificar (CAMERA_PASSTHROUGH=0 lo desactiva)
+PASSTHROUGH = os.getenv("CAMERA_PASSTHROUGH", "1") != "0"
+# Timeout de conexión/lectura del stream HTTP de origen (segundos)
+HTTP_TIMEOUT = 5.0
+
+
+class FramePacket:
+    """
+    Frame publicado por una cámara.
+
+    - jpeg: bytes originales de la cámara (solo en modo pass-through)
+    - frame(): imagen BGR de solo lectura, decodificada la primera vez que
+      se pide y compartida por todos los consumidores
+    """
+
+    __slots__ = ("seq", "jpeg", "_frame", "_lock")
+
+    def __init__(self, seq: int, jpeg: Optional[bytes] = None, frame: Optional[np.ndarray] = None):
+        self.seq = seq
+        self.jpeg = jpeg
+        self._frame = frame
+        self._lock = threading.Lock()
+
+    def frame(self) -> Optional[np.ndarray]:
+        """Imagen BGR del frame (None si el JPEG está corrupto)."""
+        if self._frame is None and self.jpeg is not None:
+            with self._lock:
+                if self._frame is None:
+                    frame = cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), cv2.IMREAD_COLOR)
+                    if frame is None:
+                        return None
+                    frame.flags.writeable = False
+                    self._frame = frame
+        return self._frame
+
+
+class CameraFeed:
+    """Lector de una cámara con buffer circular de los últimos frames."""
+
+    def __init__(self, url: str, buffer_size: int = BUFFER_SIZE):
+        self.url = url
+        self.seq = 0
+        self.passthrough = False
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._refs = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"camera-{url}")
+
+    def wait_packet(self, after_seq: int, timeout: float = 2.0) -> Optional[FramePacket]:
+        """
+        Espera un frame más nuevo que after_seq sin decodificarlo.
+
+        Returns:
+            El FramePacket más reciente, o None si se agotó el tiempo
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after_seq or self._stop.is_set(), timeout):
+                return None
+            return self._frames[-1] if self._frames and self.seq > after_seq else None
+
+    def wait_frame(self, after_seq: int, timeout: float = 2.0) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Espera un frame más nuevo que after_seq y lo devuelve decodificado.
+
+        Los frames son de solo lectura y compartidos entre suscriptores:
+        quien necesite dibujar sobre ellos debe copiarlos.
+
+        Returns:
+            (secuencia, frame) del frame más reciente, o None si se agotó
+            el tiempo de espera
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            packet = self.wait_packet(after_seq, max(0.0, deadline - time.monotonic()))
+            if packet is None:
+                return None
+            frame = packet.frame()
+            if frame is not None:
+                return packet.seq, frame
+            # JPEG corrupto: se salta y se espera el siguiente
+            after_seq = packet.seq
+
+    def _publish(self, jpeg: Optional[bytes] = None, frame: Optional[np.ndarray] = None) -> None:
+        if frame is not None:
+            frame.flags.writeable = False
+        with self._cond:
+            self.seq += 1
+            self._frames.append(FramePacket(self.seq, jpeg, frame))
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        if PASSTHROUGH and self.url.lower().startswith(("http://", "https://")):
+            if self._run_mjpeg():
+                return
+        self._run_capture()
+
+    def _run_mjpeg(self) -> bool:
+        """
+        Lee la cámara como MJPEG por HTTP.
+
+        Returns:
+            False si la fuente no es multipart (se usa VideoCapture en su lugar)
+        """
+        while not self._stop.is_set():
+            try:
+                with urllib.request.urlopen(self.url, timeout=HTTP_TIMEOUT) as resp:
+                    boundary = parse_boundary(resp.headers.get("Content-Type", ""))
+                    if boundary is None:
+                        return False
+                    self.passthrough = True
+                    for jpeg in iter_mjpeg(resp, boundary):
+                        if self._stop.is_set():
+                            break
+                        self._publish(jpeg=jpeg)
+            except Exception as e:
+                print(f"Error leyendo cámara {self.url}: {str(e)}")
+            self._stop.wait(0.5)
+        return True
+
+    def _run_capture(self) -> None:
+        cap = cv2.VideoCapture(self.url)
+        failures = 0
+        try:
+            while not self._stop.is_set():
+                if not cap.isOpened() or failures >= MAX_READ_FAILURES:
+                    cap.release()
+                    time.sleep(0.5)
+                    cap = cv2.VideoCapture(self.url)
+                    failures = 0
+                    continue
+                ok, frame = cap.read()
+                if not ok:
+                    failures += 1
+                    time.sleep(0.05)
+                    continue
+                failures = 0
+                self._publish(frame=frame)
+        finally:
+            try:
+                cap.release()
+            except Exception:
+                pass
+
+    def _start(self) -> None:
+        self._thread.start()
+
+    def _close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+
+class CameraHub:
+    """Registro de cámaras abiertas con conteo de suscriptores por URL."""
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._feeds: Dict[str, CameraFeed] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, url: str) -> CameraFeed:
+        """Obtiene el lector de la cámara, abriéndolo si es el primer suscriptor."""
+        with self._lock:
+            feed = self._feeds.get(url)
+            if feed is None:
+                feed = CameraFeed(url, self.buffer_size)
+                self._feeds[url] = feed
+                feed._start()
+            feed._refs += 1
+            return feed
+
+    def unsubscribe(self, feed: CameraFeed) -> None:
+        """Libera una suscripción; cierra la cámara si era la última."""
+        with self._lock:
+            feed._refs -= 1
+            if feed._refs > 0:
+                return
+            if self._feeds.get(feed.url) is feed:
+                del self._feeds[feed.url]
+        feed._close()
+
+    @contextmanager
+    def open(self, url: str):
+        """Suscripción con liberación automática (también al desconectarse el cliente)."""
+        feed = self.subscribe(url)
+        try:
+            yield feed
+        finally:
+            self.unsubscribe(feed)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Suscriptores, frames leídos y modo de lectura por cámara abierta."""
+        with self._lock:
+            return {
+                url: {"subscribers": f._refs, "frames": f.seq, "passthrough": f.passthrough}
+                for url, f in self._feeds.items()
+            }
+
+
+CAMERA_HUB = CameraHub()
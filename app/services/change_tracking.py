@@ -0,0 +1,137 @@
+"""
+Avisos de Cambios Confirmados
+
+Las cachés en memoria (galerías por curso, resúmenes de estudiantes) y
+los procesos incrementales (alertas de inasistencia) necesitan enterarse
+cuando se confirman cambios en ciertas tablas:
+
+- Altas, bajas y modificaciones por ORM: eventos del mapper.
+- DELETE/UPDATE masivos (Query.delete/update): do_orm_execute.
+- Sentencias Core que el ORM no ve (p. ej. un INSERT ... ON CONFLICT):
+  quien las ejecuta las anuncia con record_change.
+
+Los cambios se acumulan en la sesión y el callback se invoca recién
+después del commit (antes, otras sesiones seguirían leyendo los datos
+viejos y podrían volver a cachearlos); un rollback los descarta. El
+callback recibe la lista de elementos afectados (por defecto la clave
+primaria de cada fila; ver `describe`), o None si no se conocen
+(operación masiva).
+
+Los avisos son locales al proceso: las cachés deben tener además un
+vencimiento para los cambios hechos desde otros workers.
+
+Ejemplo:
+    >>> on_commit(Student, lambda ids: cache.evict(ids))
+"""
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+_INFO_KEY = "committed_changes"
+
+
+class _Registration:
+    __slots__ = ("callback", "describe")
+
+    def __init__(self, callback, describe):
+        self.callback = callback
+        self.describe = describe
+
+
+_registrations: Dict[type, List[_Registration]] = {}
+
+
+def _primary_key(model: type) -> Callable[[Any, bool], Any]:
+    columns = [column.key for column in inspect(model).primary_key]
+
+    def describe(target, deleted: bool):
+        key = tuple(getattr(target, column, None) for column in columns)
+        return key[0] if len(key) == 1 else key
+
+    return describe
+
+
+def _pending(session) -> Dict[_Registration, Optional[list]]:
+    return session.info.setdefault(_INFO_KEY, {})
+
+
+def _add(session, model: type, target, deleted: bool) -> None:
+    pending = _pending(session)
+    for registration in _registrations.get(model, ()):
+        items = pending.setdefault(registration, [])
+        if items is not None:
+            items.append(registration.describe(target, deleted))
+
+
+def _record_row(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        _add(session, mapper.class_, target, deleted=False)
+
+
+def _record_deleted_row(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        _add(session, mapper.class_, target, deleted=True)
+
+
+def on_commit(
+    model: type,
+    callback: Callable[[Optional[list]], None],
+    describe: Optional[Callable[[Any, bool], Any]] = None
+) -> None:
+    """
+    Registra un callback para los cambios confirmados de un modelo.
+
+    Args:
+        model: Clase del modelo (p. ej. Enrollment)
+        callback: callback(elementos) con la lista de elementos afectados o None (masivo)
+        describe: describe(fila, eliminada) -> elemento que recibe el callback
+            (por defecto, la clave primaria de la fila)
+    """
+    if model not in _registrations:
+        _registrations[model] = []
+        event.listen(model, "after_insert", _record_row)
+        event.listen(model, "after_update", _record_row)
+        event.listen(model, "after_delete", _record_deleted_row)
+    _registrations[model].append(_Registration(callback, describe or _primary_key(model)))
+
+
+def record_change(session, model: type, values: Dict[str, Any], deleted: bool = False) -> None:
+    """
+    Anuncia una fila escrita con una sentencia Core (invisible para el ORM).
+
+    Args:
+        session: Sesión en la que se ejecutó la sentencia
+        model: Clase del modelo de la tabla
+        values: Columnas de la fila (las que usen los `describe` registrados)
+        deleted: La fila fue eliminada
+    """
+    if model in _registrations:
+        _add(session, model, SimpleNamespace(**values), deleted)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk(state) -> None:
+    if not (state.is_delete or state.is_update) or state.bind_mapper is None:
+        return
+    pending = _pending(state.session)
+    for registration in _registrations.get(state.bind_mapper.class_, ()):
+        pending[registration] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session) -> None:
+    pending = session.info.pop(_INFO_KEY, None)
+    for registration, items in (pending or {}).items():
+        try:
+            registration.callback(items)
+        except Exception as e:
+            print(f"Error notificando cambios confirmados: {str(e)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session) -> None:
+    session.info.pop(_INFO_KEY, None)
@@ -0,0 +1,181 @@
+"""
+Galerías de Reconocimiento por Curso
+
+Al tomar asistencia de un curso solo tiene sentido comparar contra los
+alumnos inscritos en él. En lugar de buscar en toda la galería del modelo
+(todos los alumnos) y descartar después, se deriva del índice global un
+sub-índice con las filas de los inscritos: la búsqueda es más rápida y un
+alumno de otro curso ya no puede ser la "mejor coincidencia".
+
+- Etiqueta -> estudiante: el modelo guarda el ID de estudiante de cada
+  etiqueta. Solo las carpetas sin ID (modelos viejos o nombres sin
+  "_<id>") se resuelven por "nombre apellido", sin distinguir mayúsculas
+  ni acentos, con una sola consulta por generación del modelo.
+- Sub-índices: se cachean por curso y se invalidan al cambiar la
+  generación del modelo o las inscripciones. Los cambios confirmados en
+  Enrollment incrementan una versión (ver change_tracking); en otros
+  workers de gunicorn la entrada expira tras GALLERY_TTL.
+
+Ejemplo:
+    >>> index = COURSE_GALLERIES.index_for(course_id)
+    >>> ubicaciones, nombres = reconocer_en_frame(frame, index, tolerance=0.5)
+"""
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.models import Enrollment
+from app.repositories.courses import get_course_student_ids_repo
+from app.repositories.students import get_student_names_repo
+from app.services.change_tracking import on_commit
+
+# Segundos que un sub-índice se considera vigente sin ver un cambio local
+# (cubre inscripciones modificadas desde otro worker o proceso)
+GALLERY_TTL = float(os.getenv("COURSE_GALLERY_TTL", "60"))
+# Cursos con sub-índice en memoria (LRU)
+MAX_COURSES = 64
+
+_version_lock = threading.Lock()
+_enrollment_version = 0
+
+
+def enrollment_version() -> int:
+    """Versión local de las inscripciones (cambia tras cada commit que las modifica)."""
+    return _enrollment_version
+
+
+def _bump_enrollment_version(ids=None) -> None:
+    global _enrollment_version
+    with _version_lock:
+        _enrollment_version += 1
+
+
+on_commit(Enrollment, _bump_enrollment_version)
+
+
+def _normalize_name(name: str) -> str:
+    text = unicodedata.normalize("NFKD", str(name).replace("_", " "))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def resolve_label_students(index) -> np.ndarray:
+    """
+    Resuelve el estudiante de cada etiqueta del modelo.
+
+    Usa el ID guardado en el modelo; las etiquetas sin ID se buscan por
+    nombre completo (una consulta, solo si hace falta).
+
+    Args:
+        index: FaceIndex del modelo vigente
+
+    Returns:
+        Array int64 con el ID de estudiante por etiqueta (-1 si no se resuelve)
+    """
+    resolved = np.array(index.label_student_ids, dtype=np.int64)
+    missing = np.flatnonzero(resolved < 0)
+    if missing.size:
+        by_name: Dict[str, int] = {}
+        for student_id, first_name, last_name in get_student_names_repo():
+            by_name.setdefault(_normalize_name(f"{first_name or ''} {last_name or ''}"), student_id)
+        for i in missing:
+            resolved[i] = by_name.get(_normalize_name(index.label_names[i]), -1)
+    return resolved
+
+
+class CourseGalleries:
+    """
+    Caché de sub-índices por curso derivados del modelo vigente.
+
+    Args:
+        current_model: Devuelve el LoadedModel vigente (p. ej. registro_modelo().current)
+        ttl: Segundos de vigencia de un sub-índice sin cambios locales
+    """
+
+    def __init__(self, current_model: Callable[[], Any], ttl: float = GALLERY_TTL, max_courses: int = MAX_COURSES):
+        self.current_model = current_model
+        self.ttl = ttl
+        self.max_courses = max_courses
+        self._lock = threading.Lock()
+        # course_id -> (generation, enrollment_version, built_at, index)
+        self._entries: "OrderedDict[int, Tuple[Optional[int], int, float, Any]]" = OrderedDict()
+        # (generation, ID de estudiante por etiqueta)
+        self._label_students: Tuple[Optional[int], Optional[np.ndarray]] = (None, None)
+        self.hits = 0
+        self.builds = 0
+
+    def label_students(self, model=None) -> np.ndarray:
+        """ID de estudiante por etiqueta de la generación vigente (-1 si no se resuelve)."""
+        model = model or self.current_model()
+        generation, resolved = self._label_students
+        if resolved is None or generation != model.generation or resolved.shape[0] != len(model.index.label_names):
+            resolved = resolve_label_students(model.index)
+            self._label_students = (model.generation, resolved)
+        return resolved
+
+    def index_for(self, course_id: int):
+        """
+        Sub-índice (FaceIndex) con los rostros de los inscritos en el curso.
+
+        Args:
+            course_id: ID del curso
+
+        Returns:
+            FaceIndex posiblemente vacío si no hay inscritos con fotos
+        """
+        course_id = int(course_id)
+        model = self.current_model()
+        version = enrollment_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(course_id)
+            if entry and entry[0] == model.generation and entry[1] == version and now - entry[2] < self.ttl:
+                self._entries.move_to_end(course_id)
+                self.hits += 1
+                return entry[3]
+
+        enrolled = np.asarray(get_course_student_ids_repo(course_id), dtype=np.int64)
+        label_students = self.label_students(model)
+        label_mask = np.isin(label_students, enrolled)
+        # El sub-índice lleva los IDs ya resueltos (también los obtenidos por nombre)
+        index = model.index.subset(np.flatnonzero(label_mask[model.index.labels]), label_student_ids=label_students)
+
+        with self._lock:
+            self._entries[course_id] = (model.generation, version, now, index)
+            self._entries.move_to_end(course_id)
+            while len(self._entries) > self.max_courses:
+                self._entries.popitem(last=False)
+            self.builds += 1
+        return index
+
+    def invalidate(self, course_id: Optional[int] = None) -> None:
+        """Descarta el sub-índice de un curso (o todos)."""
+        with self._lock:
+            if course_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(course_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "courses": len(self._entries),
+                "hits": self.hits,
+                "builds": self.builds,
+                "enrollment_version": enrollment_version(),
+                "rows": {course_id: len(entry[3]) for course_id, entry in self._entries.items()},
+            }
+
+
+def _current_model():
+    from app.services.face_recognition_service import registro_modelo
+
+    return registro_modelo().current()
+
+
+COURSE_GALLERIES = CourseGalleries(_current_model)
@@ -1,127 +1,173 @@
 import os
+import json
+import threading
 import cv2
 import numpy as np
-from datetime import datetime
-import face_recognition
+import dlib
+from face_recognition import api as face_api
+from app.ai.face_recognition.face_index import FaceIndex
+from app.ai.face_recognition import model_builder, model_store
+from app.ai.face_recognition.model_registry import ModelRegistry
+from app.ai.face_recognition.detectors import create_detector, scale_from_env
+from app.ai.face_recognition.adaptive_detection import AdaptiveDetector
+from app.ai.face_recognition.face_tracker import FaceTracker
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 FOTOS_DIR = os.path.join(PROJECT_ROOT, "fotos_conocidas")
+MODELO_DIR = os.path.join(PROJECT_ROOT, "modelo_caras")
+# Modelo legado (pickle); se convierte automáticamente al formato binario
 MODELO_PATH = os.path.join(PROJECT_ROOT, "modelo_caras.pkl")
+# Detector por defecto del streaming y ajustes por cámara:
+# CAMERA_DETECTORS='{"http://192.168.18.122:81/stream": {"backend": "dnn", "scale": 0.5,
+#                    "door": [0.0, 0.0, 0.25, 1.0], "face_size": 80, "full_scan_interval": 1.0}}'
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "haar")
+FACE_DETECTOR_SCALE = scale_from_env(1.0)
+# Detección adaptativa (ROIs + barridos completos periódicos); FACE_ADAPTIVE=0 la desactiva
+FACE_ADAPTIVE = os.getenv("FACE_ADAPTIVE", "1") != "0"
 
-def generar_modelo():
-    import pickle
+def construir_modelo(incremental=True, workers=None, chunksize=None, progress=None):
     if not os.path.isdir(FOTOS_DIR):
-        return False
-    nombres = []
-    encodings = []
-    extensiones = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
-    for item in os.listdir(FOTOS_DIR):
-        ruta_item = os.path.join(FOTOS_DIR, item)
-        if os.path.isdir(ruta_item):
-            persona = item
-            for archivo in os.listdir(ruta_item):
-                ruta = os.path.join(ruta_item, archivo)
-                _, ext = os.path.splitext(archivo)
-                if not os.path.isfile(ruta) or ext.lower() not in extensiones:
-                    continue
-                try:
-                    imagen = face_recognition.load_image_file(ruta)
-                    ubicaciones = face_recognition.face_locations(imagen, model="hog")
-                    if not ubicaciones:
-                        continue
-                    encoding = face_recognition.face_encodings(imagen, known_face_locations=ubicaciones)[0]
-                    encodings.append(encoding)
-                    nombres.append(persona)
-                except Exception:
-                    continue
-        else:
-            nombre, ext = os.path.splitext(item)
-            if ext.lower() not in extensiones:
-                continue
-            ruta = ruta_item
-            try:
-                imagen = face_recognition.load_image_file(ruta)
-                ubicaciones = face_recognition.face_locations(imagen, model="hog")
-                if not ubicaciones:
-                    continue
-                encoding = face_recognition.face_encodings(imagen, known_face_locations=ubicaciones)[0]
-                encodings.append(encoding)
-                nombres.append(nombre)
-            except Exception:
-                continue
-    if not encodings:
-        return False
-    modelo_data = {
-        'encodings': encodings,
-        'nombres': nombres,
-        'fecha_creacion': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'total_encodings': len(encodings),
-        'personas_unicas': len(set(nombres))
-    }
+        return {"ok": False, "error": "No existe la carpeta de fotos conocidas"}
+    reporte = model_builder.build_model(
+        FOTOS_DIR, MODELO_DIR, incremental=incremental, progress=progress, workers=workers, chunksize=chunksize
+    )
+    t = reporte["timings"]
+    print(
+        f"Modelo: {reporte['encoded']} codificadas, {reporte['reused']} reutilizadas, "
+        f"{reporte['removed']} eliminadas ({reporte['workers']} procesos) | "
+        f"decode {t['decode']:.2f}s detect {t['detect']:.2f}s encode {t['encode']:.2f}s "
+        f"write {t['write']:.2f}s total {t['total']:.2f}s"
+    )
+    if reporte.get("empty"):
+        print("Modelo: ninguna foto con rostro; se publicó una generación vacía")
+    if "gallery" in reporte:
+        g, h = reporte["gallery"], reporte.get("holdout")
+        evaluacion = (
+            f" | exactitud held-out ({h['queries']} fotos): completa {h['accuracy_full']:.1%} "
+            f"plantillas {h['accuracy_templates']:.1%} (delta {h['delta']:+.1%})"
+        ) if h else ""
+        print(
+            f"Galería: {g['photos']} fotos -> {g['rows']} plantillas (-{g['shrink']:.0%}, "
+            f"{g['outliers']} atípicas){evaluacion}"
+        )
+    return reporte
+
+def generar_modelo(incremental=True, workers=None, chunksize=None):
     try:
-        with open(MODELO_PATH, 'wb') as f:
-            pickle.dump(modelo_data, f)
-        return True
+        return construir_modelo(incremental=incremental, workers=workers, chunksize=chunksize)["ok"]
     except Exception:
         return False
 
-def cargar_modelo():
-    import pickle
-    if not os.path.exists(MODELO_PATH):
-        return None, None
+_REGISTRO = None
+_REGISTRO_LOCK = threading.Lock()
+
+def _convertir_modelo_legado():
+    if model_store.current_generation(MODELO_DIR) is None and os.path.exists(MODELO_PATH):
+        try:
+            model_store.convert_pickle(MODELO_PATH, MODELO_DIR)
+        except Exception:
+            pass
+
+def registro_modelo():
+    global _REGISTRO
+    if _REGISTRO is None:
+        with _REGISTRO_LOCK:
+            if _REGISTRO is None:
+                _convertir_modelo_legado()
+                registro = ModelRegistry(MODELO_DIR)
+                registro.refresh(force=True)
+                _REGISTRO = registro
+    return _REGISTRO
+
+def cargar_indice():
     try:
-        with open(MODELO_PATH, 'rb') as f:
-            modelo_data = pickle.load(f)
-        return modelo_data['encodings'], modelo_data['nombres']
+        return registro_modelo().current().index
     except Exception:
+        return FaceIndex.empty()
+
+def cargar_modelo():
+    indice = cargar_indice()
+    if not len(indice):
         return None, None
+    return indice.encodings, indice.names
 
 def verificar_modelo_actualizado():
-    if not os.path.exists(MODELO_PATH):
-        return False
-    modelo_time = os.path.getmtime(MODELO_PATH)
-    if os.path.isdir(FOTOS_DIR):
-        for root, dirs, files in os.walk(FOTOS_DIR):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if os.path.getmtime(file_path) > modelo_time:
-                    return False
-    return True
+    return not model_builder.gallery_changed(FOTOS_DIR, MODELO_DIR)
 
 def detectar_rostros_directo(frame_bgr):
     if not hasattr(detectar_rostros_directo, 'detector'):
-        detectar_rostros_directo.detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    faces = detectar_rostros_directo.detector.detectMultiScale(
-        gray,
-        scaleFactor=1.15,
-        minNeighbors=7,
-        minSize=(80, 80),
-        flags=cv2.CASCADE_SCALE_IMAGE
-    )
-    face_locations = []
-    for (x, y, w, h) in faces:
-        aspect_ratio = w / float(h)
-        if aspect_ratio < 0.7 or aspect_ratio > 1.4:
-            continue
-        if w < 80 or h < 80:
-            continue
-        margen = int(w * 0.1)
-        top = max(0, y - margen)
-        right = min(frame_bgr.shape[1], x + w + margen)
-        bottom = min(frame_bgr.shape[0], y + h + margen)
-        left = max(0, x - margen)
-        face_locations.append((top, right, bottom, left))
-    return face_locations
-
-def reconocer_en_frame(frame_bgr, known_encodings, known_names, tolerance=0.55):
-    face_locations = detectar_rostros_directo(frame_bgr)
+        detectar_rostros_directo.detector = create_detector("haar")
+    return detectar_rostros_directo.detector.detect(frame_bgr)
+
+# Claves de CAMERA_DETECTORS que configuran la detección adaptativa (no el backend)
+OPCIONES_ADAPTATIVAS = ("adaptive", "door", "face_size", "full_scan_interval")
+
+def configuracion_detector(camera_url):
+    config = {"backend": FACE_DETECTOR, "scale": FACE_DETECTOR_SCALE, "adaptive": FACE_ADAPTIVE}
+    try:
+        por_camara = json.loads(os.getenv("CAMERA_DETECTORS") or "{}")
+    except ValueError:
+        por_camara = {}
+    config.update(por_camara.get(camera_url) or {})
+    return config
+
+def detector_para_camara(camera_url, tracker=None):
+    config = configuracion_detector(camera_url)
+    adaptativo = {k: config.pop(k) for k in OPCIONES_ADAPTATIVAS if k in config}
+    try:
+        detector = create_detector(config.pop("backend"), **config)
+    except Exception as e:
+        print(f"Detector inválido para {camera_url}: {str(e)}; se usa haar")
+        detector = create_detector("haar")
+    if not adaptativo.pop("adaptive", False):
+        return detector
+    return AdaptiveDetector(detector, tracker, **adaptativo)
+
+class EstadoCamara:
+    """Estado del reconocimiento de una cámara: su detector y su tracker."""
+
+    def __init__(self, camera_url):
+        self.tracker = FaceTracker()
+        self.detector = detector_para_camara(camera_url, self.tracker)
+
+    def stats(self):
+        estado = {"detector": self.detector.name, "scale": self.detector.scale}
+        if hasattr(self.detector, "stats"):
+            estado.update(self.detector.stats())
+        estado.update(self.tracker.stats())
+        return estado
+
+def codificar_rostros(rgb, ubicaciones):
+    """Encodings de todos los rostros de una imagen con una sola pasada de la red.
+
+    Los landmarks (predictor de 5 puntos) se calculan por rostro y los
+    descriptores en un único compute_face_descriptor sobre el lote, en
+    lugar de una llamada a la red por rostro como face_recognition.face_encodings.
+    Devuelve una lista alineada con `ubicaciones`."""
+    if not ubicaciones:
+        return []
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    formas = dlib.full_object_detections()
+    for (top, right, bottom, left) in ubicaciones:
+        formas.append(face_api.pose_predictor_5_point(rgb, dlib.rectangle(left, top, right, bottom)))
+    descriptores = face_api.face_encoder.compute_face_descriptor(rgb, formas, 1)
+    return [np.array(d) for d in descriptores]
+
+def reconocer_en_frame(frame_bgr, indice, tolerance=0.55, tracker=None, detector=None):
+    """Con `tracker` (FaceTracker por cámara) los rostros ya identificados con
+    confianza reutilizan su nombre y solo se re-codifican periódicamente.
+    `detector` reemplaza al Haar por defecto (ver detector_para_camara)."""
+    if detector is not None:
+        face_locations = detector.detect(frame_bgr)
+    else:
+        face_locations = detectar_rostros_directo(frame_bgr)
     if not face_locations:
+        if tracker is not None:
+            tracker.update([])
         return [], []
     small_frame = cv2.resize(frame_bgr, (0, 0), fx=0.5, fy=0.5)
     rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-    nombres_detectados = []
-    face_locations_final = []
+    candidatos = []
     for (top, right, bottom, left) in face_locations:
         top_s = top // 2
         right_s = right // 2
@@ -139,27 +185,40 @@ def reconocer_en_frame(frame_bgr, known_encodings, known_names, tolerance=0.55):
         std_dev = np.std(rostro_region)
         if std_dev < 15:
             continue
-        face_location_small = [(top_s, right_s, bottom_s, left_s)]
-        encs = face_recognition.face_encodings(
-            rgb_small,
-            face_location_small,
-            num_jitters=1,
-            model="small"
-        )
-        if not encs:
+        candidatos.append(((top, right, bottom, left), (top_s, right_s, bottom_s, left_s)))
+    tracks = tracker.update([c[0] for c in candidatos]) if tracker is not None else [None] * len(candidatos)
+    resultados = []
+    por_codificar = []
+    for (location, location_small), track in zip(candidatos, tracks):
+        if track is not None and not tracker.needs_encoding(track):
+            resultados.append([location, track.name])
+            continue
+        por_codificar.append((len(resultados), location_small, track))
+        resultados.append([location, None])
+    # Todos los rostros pendientes del frame en una sola llamada al encoder
+    encodings = codificar_rostros(rgb_small, [c[1] for c in por_codificar])
+    face_encodings = []
+    pendientes = []
+    for (pos, _, track), encoding in zip(por_codificar, encodings):
+        if encoding is None:
             continue
-        face_encoding = encs[0]
-        nombre = "Desconocido"
-        if known_encodings:
-            dists = face_recognition.face_distance(known_encodings, face_encoding)
-            if len(dists) > 0:
-                best_idx = int(np.argmin(dists))
-                best_dist = dists[best_idx]
-                if best_dist <= tolerance:
-                    nombre = known_names[best_idx]
-        nombres_detectados.append(nombre)
-        face_locations_final.append((top, right, bottom, left))
-    return face_locations_final, nombres_detectados
+        face_encodings.append(encoding)
+        pendientes.append((pos, track))
+    if face_encodings:
+        # Una sola búsqueda matricial para todos los rostros codificados del frame
+        if indice is None or len(indice) == 0:
+            coincidencias = [(FaceIndex.UNKNOWN, None)] * len(face_encodings)
+        else:
+            coincidencias = [m[0] for m in indice.match(face_encodings, tolerance=tolerance, k=1)]
+        for (pos, track), (nombre, distancia) in zip(pendientes, coincidencias):
+            resultados[pos][1] = nombre
+            if track is not None:
+                tracker.assign(track, nombre, distancia)
+    # Los rostros que no se pudieron codificar se descartan
+    resultados = [r for r in resultados if r[1] is not None]
+    if not resultados:
+        return [], []
+    return [r[0] for r in resultados], [r[1] for r in resultados]
 
 def dibujar_resultados(frame_bgr, face_locations, face_names):
     for (top, right, bottom, left), name in zip(face_locations, face_names):
@@ -0,0 +1,219 @@
+"""
+Utilidades MJPEG para los streams de cámara
+
+- EncodedFrameCache: codifica cada frame a JPEG una sola vez por
+  combinación (cámara, overlay, calidad, ancho) y comparte el mismo buffer
+  entre todos los suscriptores, en lugar de un cv2.imencode por espectador.
+- stream_options: calidad y ancho de salida por stream (query params con
+  valores por defecto desde el entorno) para limitar el ancho de banda.
+- mjpeg_part: partes multipart emitidas por separado (cabecera, datos,
+  cierre) para no copiar el buffer compartido al concatenar.
+- iter_mjpeg: lector de un stream multipart/x-mixed-replace de origen
+  (p. ej. ESP32-CAM) que entrega los JPEG tal cual, sin decodificarlos.
+"""
+import os
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Hashable, Iterator, Mapping, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BOUNDARY = "frame"
+CONTENT_TYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+DEFAULT_QUALITY = int(os.getenv("STREAM_JPEG_QUALITY", "80"))
+# 0 = resolución original de la cámara
+DEFAULT_WIDTH = int(os.getenv("STREAM_MAX_WIDTH", "0"))
+MIN_QUALITY, MAX_QUALITY = 10, 95
+MIN_WIDTH, MAX_WIDTH = 160, 1920
+# Entradas sin uso durante este tiempo se descartan (segundos)
+IDLE_TTL = 30.0
+# Bytes leídos por llamada al stream de origen
+READ_CHUNK = 16384
+# Una parte sin cierre que supere este tamaño se descarta (stream corrupto)
+MAX_PART_SIZE = 8 * 1024 * 1024
+
+
+def stream_options(args: Mapping[str, str]) -> Tuple[int, int]:
+    """
+    Lee calidad JPEG y ancho máximo de los parámetros del stream.
+
+    Ejemplo:
+        /api/admin/video_stream?url=...&quality=60&width=480
+
+    Returns:
+        Tupla (quality, width); width 0 significa sin redimensionar
+    """
+    try:
+        quality = int(args.get("quality") or DEFAULT_QUALITY)
+    except (TypeError, ValueError):
+        quality = DEFAULT_QUALITY
+    try:
+        width = int(args.get("width") or DEFAULT_WIDTH)
+    except (TypeError, ValueError):
+        width = DEFAULT_WIDTH
+    quality = min(max(quality, MIN_QUALITY), MAX_QUALITY)
+    width = min(max(width, MIN_WIDTH), MAX_WIDTH) if width > 0 else 0
+    return quality, width
+
+
+def encode_jpeg(frame: np.ndarray, quality: int, width: int = 0) -> Optional[bytes]:
+    """Codifica un frame BGR a JPEG, reduciéndolo si supera el ancho pedido."""
+    if width and frame.shape[1] > width:
+        height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buf.tobytes() if ok else None
+
+
+def mjpeg_part(data: bytes) -> Iterator[bytes]:
+    """Parte multipart de un JPEG sin concatenar (el buffer se comparte)."""
+    yield (
+        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n"
+    ).encode("ascii")
+    yield data
+    yield b"\r\n"
+
+
+def parse_boundary(content_type: str) -> Optional[bytes]:
+    """
+    Extrae el boundary de un Content-Type multipart.
+
+    Ejemplo:
+        >>> parse_boundary("multipart/x-mixed-replace;boundary=123456789000000000000987654321")
+        b'123456789000000000000987654321'
+    """
+    if not content_type or not content_type.lower().startswith("multipart/"):
+        return None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            value = value.strip().strip('"')
+            # Algunas cámaras incluyen los guiones del delimitador en el parámetro
+            if value.startswith("--"):
+                value = value[2:]
+            return value.encode("latin-1")
+    return None
+
+
+def iter_mjpeg(stream: BinaryIO, boundary: bytes) -> Iterator[bytes]:
+    """
+    Recorre las partes de un stream MJPEG y entrega cada JPEG sin decodificar.
+
+    Usa Content-Length cuando la parte lo trae (ESP32-CAM) y si no busca el
+    siguiente delimitador. Termina cuando el stream de origen se cierra.
+    """
+    read = getattr(stream, "read1", stream.read)
+    delimiter = b"--" + boundary
+    buf = bytearray()
+    while True:
+        start = buf.find(delimiter)
+        header_end = buf.find(b"\r\n\r\n", start) if start >= 0 else -1
+        if header_end >= 0:
+            body_start = header_end + 4
+            length = None
+            for line in bytes(buf[start + len(delimiter):header_end]).split(b"\r\n"):
+                key, _, value = line.partition(b":")
+                if key.strip().lower() == b"content-length":
+                    try:
+                        length = int(value.strip())
+                    except ValueError:
+                        pass
+            if length is not None:
+                if len(buf) >= body_start + length:
+                    yield bytes(buf[body_start:body_start + length])
+                    del buf[:body_start + length]
+                    continue
+            else:
+                end = buf.find(delimiter, body_start)
+                if end >= 0:
+                    payload = bytes(buf[body_start:end]).rstrip(b"\r\n")
+                    del buf[:end]
+                    if payload:
+                        yield payload
+                    continue
+        elif start < 0 and len(buf) > len(delimiter):
+            # Sin delimitador a la vista: solo puede empezar en la cola del buffer
+            del buf[:len(buf) - len(delimiter)]
+        elif start > 0:
+            del buf[:start]
+        if len(buf) > MAX_PART_SIZE:
+            buf.clear()
+        data = read(READ_CHUNK)
+        if not data:
+            return
+        buf += data
+
+
+class _Entry:
+    __slots__ = ("lock", "version", "data", "last_used")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.data = None
+        self.last_used = time.monotonic()
+
+
+class EncodedFrameCache:
+    """Último JPEG codificado por (cámara, overlay, calidad, ancho)."""
+
+    def __init__(self, idle_ttl: float = IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self.encoded = 0
+        self.hits = 0
+        self._entries: Dict[tuple, _Entry] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def get(
+        self,
+        camera: str,
+        overlay: str,
+        version: Hashable,
+        render: Callable[[], np.ndarray],
+        quality: int,
+        width: int = 0
+    ) -> Optional[bytes]:
+        """
+        Devuelve el JPEG de `version`, codificándolo solo si nadie lo hizo aún.
+
+        Args:
+            camera: URL de la cámara
+            overlay: Tipo de dibujo sobre el frame (p. ej. "raw", "recognition")
+            version: Identifica el contenido (secuencia del frame y del overlay)
+            render: Produce el frame BGR a codificar; solo se llama si hace falta
+            quality: Calidad JPEG
+            width: Ancho máximo (0 = original)
+
+        Returns:
+            Buffer JPEG compartido (no modificar) o None si falló la codificación
+        """
+        key = (camera, overlay, quality, width)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.last_used = now
+            if now - self._last_prune > self.idle_ttl:
+                self._prune(now)
+        with entry.lock:
+            if entry.version == version:
+                self.hits += 1
+                return entry.data
+            data = encode_jpeg(render(), quality, width)
+            if data is None:
+                return entry.data
+            entry.version, entry.data = version, data
+            self.encoded += 1
+            return data
+
+    def _prune(self, now: float) -> None:
+        self._last_prune = now
+        for key in [k for k, e in self._entries.items() if now - e.last_used > self.idle_ttl]:
+            del self._entries[key]
+
+
+FRAME_CACHE = EncodedFrameCache()
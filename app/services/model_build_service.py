@@ -0,0 +1,220 @@
+"""
+Servicio de Construcción del Modelo en Segundo Plano
+
+Ejecuta la reconstrucción del modelo de rostros como un trabajo en
+segundo plano con identificador, en lugar de bloquear el hilo de la
+petición HTTP (y el worker de gunicorn) hasta que termine.
+
+- Solo hay un build activo a la vez: pedir otro mientras uno está en
+  curso devuelve el mismo trabajo (también entre workers de gunicorn,
+  mediante un lock de archivo).
+- El estado (procesadas/total, throughput, ETA) se guarda en
+  modelo_caras/jobs/<job_id>.json para que cualquier worker pueda
+  responder la consulta de estado.
+- Al terminar con éxito se invocan los callbacks registrados (p. ej.
+  para recargar el índice en memoria sin reiniciar).
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo deduplicación dentro del proceso
+    fcntl = None
+
+JOBS_DIR = "jobs"
+ACTIVE_FILE = "ACTIVE"
+LOCK_FILE = ".build.lock"
+# Frecuencia máxima de escritura del estado a disco (segundos)
+PROGRESS_WRITE_INTERVAL = 0.5
+# Trabajos terminados que se conservan para consulta
+MAX_JOB_HISTORY = 20
+
+
+class ModelBuildJobs:
+    """Cola de un solo build a la vez para el modelo de rostros."""
+
+    def __init__(self, model_dir: str, build_fn: Callable[..., Dict[str, Any]]):
+        """
+        Args:
+            model_dir: Directorio del modelo (se usa para estado y locks)
+            build_fn: Función build_fn(progress=callback, **opciones) -> reporte
+        """
+        self.model_dir = model_dir
+        self.jobs_dir = os.path.join(model_dir, JOBS_DIR)
+        self.build_fn = build_fn
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def on_success(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Registra un callback que recibe el trabajo terminado con éxito."""
+        self._listeners.append(callback)
+
+    def submit(self, **options) -> Tuple[Dict[str, Any], bool]:
+        """
+        Encola un build, o devuelve el que ya está en curso.
+
+        Returns:
+            Tupla (estado_del_trabajo, creado) donde creado es False si se
+            reutilizó un build activo
+        """
+        with self._lock, self._file_lock():
+            active = self._active_job()
+            if active is not None:
+                return active, False
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "pid": os.getpid(),
+                "options": options,
+                "processed": 0,
+                "total": None,
+                "throughput": None,
+                "eta_seconds": None,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "report": None,
+                "error": None,
+            }
+            self._write(job)
+            self._write_active(job["id"])
+            self._prune_history()
+        threading.Thread(target=self._run, args=(job,), daemon=True, name=f"model-build-{job['id'][:8]}").start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de un trabajo por id (None si no existe)."""
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_dir, f"{job_id}.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+        started = time.monotonic()
+        last_write = [0.0]
+        self._write(job)
+
+        def progress(processed: int, total: int) -> None:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            job["processed"], job["total"] = processed, total
+            job["throughput"] = round(processed / elapsed, 2)
+            job["eta_seconds"] = round((total - processed) / job["throughput"], 1) if job["throughput"] else None
+            now = time.monotonic()
+            if now - last_write[0] >= PROGRESS_WRITE_INTERVAL or processed == total:
+                last_write[0] = now
+                self._write(job)
+
+        try:
+            report = self.build_fn(progress=progress, **job["options"])
+            job["report"] = report
+            job["status"] = "succeeded" if report.get("ok") else "failed"
+            if not report.get("ok"):
+                job["error"] = "No se pudo generar modelo"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["eta_seconds"] = 0 if job["status"] == "succeeded" else None
+        job["finished_at"] = datetime.now().isoformat()
+        self._write(job)
+        with self._lock, self._file_lock():
+            self._clear_active(job["id"])
+
+        if job["status"] == "succeeded":
+            for callback in self._listeners:
+                try:
+                    callback(job)
+                except Exception as e:
+                    print(f"Error en callback de build del modelo: {str(e)}")
+
+    def _active_job(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.jobs_dir, ACTIVE_FILE), "r", encoding="utf-8") as f:
+                job = self.get(f.read().strip())
+        except OSError:
+            return None
+        if job is None or job.get("status") not in ("queued", "running"):
+            return None
+        if not _pid_alive(job.get("pid")):
+            # El proceso que ejecutaba el build murió (reinicio del worker)
+            job["status"] = "failed"
+            job["error"] = "El proceso del build terminó inesperadamente"
+            self._write(job)
+            return None
+        return job
+
+    def _write(self, job: Dict[str, Any]) -> None:
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = os.path.join(self.jobs_dir, f"{job['id']}.json")
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def _write_active(self, job_id: str) -> None:
+        tmp = os.path.join(self.jobs_dir, f"{ACTIVE_FILE}.tmp-{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(job_id)
+        os.replace(tmp, os.path.join(self.jobs_dir, ACTIVE_FILE))
+
+    def _clear_active(self, job_id: str) -> None:
+        path = os.path.join(self.jobs_dir, ACTIVE_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                current = f.read().strip()
+            if current == job_id:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def _prune_history(self) -> None:
+        files = [f for f in os.listdir(self.jobs_dir) if f.endswith(".json")]
+        if len(files) <= MAX_JOB_HISTORY:
+            return
+        files.sort(key=lambda f: os.path.getmtime(os.path.join(self.jobs_dir, f)))
+        for name in files[:-MAX_JOB_HISTORY]:
+            try:
+                os.remove(os.path.join(self.jobs_dir, name))
+            except OSError:
+                pass
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        with open(os.path.join(self.jobs_dir, LOCK_FILE), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid() or os.name == "nt":
+        # En Windows os.kill(pid, 0) termina el proceso en vez de consultarlo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
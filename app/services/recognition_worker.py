@@ -0,0 +1,176 @@
+"""
+Reconocimiento Asíncrono por Cámara
+
+Separa la inferencia del envío de frames en recognize_stream: el stream
+se sirve a la velocidad de la cámara y un hilo de inferencia por cámara
+toma siempre el frame más reciente (descartando los que quedaron viejos
+mientras procesaba). Los suscriptores dibujan el último resultado
+terminado.
+
+Cada hilo puede tener un estado propio de la cámara (p. ej. un FaceTracker)
+que se pasa a la función de reconocimiento en cada frame.
+
+La frecuencia de inferencia se adapta a la latencia medida en lugar de
+procesar uno de cada N frames: tras cada inferencia el hilo espera lo
+necesario para no ocupar más de MAX_DUTY del tiempo.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .camera_hub import CameraFeed, CameraHub
+
+# Fracción máxima del tiempo que un hilo de inferencia pasa procesando
+MAX_DUTY = float(os.getenv("RECOGNITION_MAX_DUTY", "0.6"))
+# Intervalo mínimo entre inferencias (segundos)
+MIN_INTERVAL = float(os.getenv("RECOGNITION_MIN_INTERVAL", "0.1"))
+# Un resultado más viejo que esto ya no se dibuja (segundos)
+RESULT_TTL = 2.0
+# Peso de la última medición en el promedio móvil de latencia
+LATENCY_ALPHA = 0.3
+
+# recognize(frame, estado_de_la_camara) -> (ubicaciones, nombres)
+RecognizeFn = Callable[[Any, Any], Tuple[List[tuple], List[str]]]
+
+
+class RecognitionResult:
+    """Resultado terminado de una inferencia sobre un frame."""
+
+    __slots__ = ("seq", "locations", "names", "latency", "finished_at")
+
+    def __init__(self, seq: int, locations: List[tuple], names: List[str], latency: float):
+        self.seq = seq
+        self.locations = locations
+        self.names = names
+        self.latency = latency
+        self.finished_at = time.monotonic()
+
+
+class RecognitionWorker:
+    """Hilo de inferencia sobre el último frame de una cámara."""
+
+    def __init__(self, feed: CameraFeed, recognize: RecognizeFn, state: Any = None):
+        self.feed = feed
+        self.recognize = recognize
+        self.state = state
+        self.result: Optional[RecognitionResult] = None
+        self.latency: Optional[float] = None
+        self.interval = MIN_INTERVAL
+        self.processed = 0
+        self.dropped = 0
+        self._refs = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"recognition-{feed.url}")
+
+    def current(self) -> Optional[RecognitionResult]:
+        """Último resultado vigente (None si no hay o ya caducó)."""
+        result = self.result
+        if result is None or time.monotonic() - result.finished_at > RESULT_TTL:
+            return None
+        return result
+
+    def overlay(self) -> Tuple[List[tuple], List[str]]:
+        """Ubicaciones y nombres del último resultado vigente."""
+        result = self.current()
+        if result is None:
+            return [], []
+        return result.locations, result.names
+
+    def _run(self) -> None:
+        seq = 0
+        while not self._stop.is_set():
+            item = self.feed.wait_frame(seq)
+            if item is None:
+                continue
+            if seq:
+                self.dropped += item[0] - seq - 1
+            seq, frame = item
+            started = time.monotonic()
+            try:
+                locations, names = self.recognize(frame, self.state)
+            except Exception as e:
+                print(f"Error en reconocimiento ({self.feed.url}): {str(e)}")
+                locations, names = [], []
+            latency = time.monotonic() - started
+            self.result = RecognitionResult(seq, locations, names, latency)
+            self.processed += 1
+            self.latency = latency if self.latency is None else (
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+            )
+            # Espera proporcional a la latencia: con inferencias lentas baja la frecuencia
+            self.interval = max(MIN_INTERVAL, self.latency / MAX_DUTY)
+            self._stop.wait(max(0.0, self.interval - latency))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "interval_ms": round(self.interval * 1000, 1),
+        }
+        if hasattr(self.state, "stats"):
+            stats.update(self.state.stats())
+        return stats
+
+
+class RecognitionWorkers:
+    """Un RecognitionWorker por cámara, compartido entre suscriptores."""
+
+    def __init__(self, hub: CameraHub, recognize: RecognizeFn, make_state: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            hub: Hub de cámaras
+            recognize: Función recognize(frame, estado) -> (ubicaciones, nombres)
+            make_state: make_state(url) crea el estado propio de cada cámara
+                (None = sin estado)
+        """
+        self.hub = hub
+        self.recognize = recognize
+        self.make_state = make_state
+        self._workers: Dict[str, RecognitionWorker] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, url: str):
+        """
+        Suscribe a la cámara y a su hilo de inferencia.
+
+        Ejemplo:
+            >>> with RECOGNITION_WORKERS.open(url) as (feed, worker):
+            ...     locs, names = worker.overlay()
+        """
+        feed = self.hub.subscribe(url)
+        worker = self._acquire(url)
+        try:
+            yield feed, worker
+        finally:
+            self._release(worker)
+            self.hub.unsubscribe(feed)
+
+    def _acquire(self, url: str) -> RecognitionWorker:
+        with self._lock:
+            worker = self._workers.get(url)
+            if worker is None:
+                # El hilo de inferencia mantiene su propia suscripción a la cámara
+                state = self.make_state(url) if self.make_state else None
+                worker = RecognitionWorker(self.hub.subscribe(url), self.recognize, state)
+                self._workers[url] = worker
+                worker._thread.start()
+            worker._refs += 1
+            return worker
+
+    def _release(self, worker: RecognitionWorker) -> None:
+        with self._lock:
+            worker._refs -= 1
+            if worker._refs > 0:
+                return
+            if self._workers.get(worker.feed.url) is worker:
+                del self._workers[worker.feed.url]
+        worker._stop.set()
+        self.hub.unsubscribe(worker.feed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {url: w.stats() for url, w in self._workers.items()}
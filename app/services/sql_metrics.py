@@ -0,0 +1,217 @@
+"""
+Métricas SQL por Petición
+
+Mide, con los eventos del engine de SQLAlchemy, cuántas sentencias
+ejecuta cada petición HTTP y cuánto tiempo pasa en la base:
+
+- Por petición: cantidad de consultas, tiempo total en la base, la
+  sentencia más lenta y las sentencias repetidas (mismo SQL con distintos
+  parámetros, la firma de un N+1).
+- Se acumulan por ruta con histogramas de consultas y de tiempo, que
+  devuelve GET /api/admin/debug/sql, y opcionalmente se exponen en el
+  header Server-Timing (visible en las DevTools del navegador).
+- Si una sentencia se repite SQL_NPLUSONE_THRESHOLD veces o más en una
+  petición, se imprime una línea con la ruta y la sentencia.
+
+Solo se miden las sentencias ejecutadas dentro de una petición; los hilos
+de fondo (p. ej. absence_alerts) no cuentan, y las respuestas en streaming
+(MJPEG, SSE) se omiten porque el cuerpo se genera después de after_request.
+Configuración en Config: SQL_METRICS_ENABLED y SQL_METRICS_SERVER_TIMING
+(ambas desactivadas por defecto) y SQL_NPLUSONE_THRESHOLD.
+
+Ejemplo:
+    >>> SQL_METRICS.init_app(app)      # en create_app
+    >>> SQL_METRICS.stats()["routes"]["GET /api/admin/students"]["queries"]
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app.extensions import db
+
+# Límites superiores de los buckets de los histogramas por ruta
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+DB_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+# Sentencias repetidas que se informan por petición
+MAX_DUPLICATES = 5
+# Caracteres de SQL que se guardan por sentencia
+MAX_STATEMENT = 300
+
+
+class RequestQueries:
+    """Sentencias ejecutadas durante una petición."""
+
+    __slots__ = ("started", "count", "db_seconds", "slowest", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_seconds = 0.0
+        self.slowest: Tuple[float, Optional[str]] = (0.0, None)
+        self.statements: Counter = Counter()
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, statement)
+
+    def duplicates(self, limit: int = MAX_DUPLICATES):
+        """(sentencia, veces) de las sentencias ejecutadas más de una vez."""
+        return [(sql, n) for sql, n in self.statements.most_common(limit) if n > 1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "slowest_ms": round(self.slowest[0] * 1000, 2),
+            "slowest": _short(self.slowest[1]),
+            "duplicates": [{"sql": _short(sql), "count": n} for sql, n in self.duplicates()],
+        }
+
+
+def _short(statement: Optional[str]) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= MAX_STATEMENT else statement[:MAX_STATEMENT] + "..."
+
+
+def _bucket(value: float, limits) -> str:
+    for limit in limits:
+        if value <= limit:
+            return f"<={limit}"
+    return f">{limits[-1]}"
+
+
+def _histogram(limits) -> Dict[str, int]:
+    return dict.fromkeys([f"<={limit}" for limit in limits] + [f">{limits[-1]}"], 0)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and "sql_queries" in g:
+        context.sql_metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "sql_metrics_start", None)
+    if started is None or not has_request_context():
+        return
+    queries = g.get("sql_queries")
+    if queries is not None:
+        queries.add(statement, time.perf_counter() - started)
+
+
+class SqlMetrics:
+    """Acumula las métricas SQL de las peticiones por ruta."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._engines = set()
+        self.enabled = False
+        self.server_timing = False
+        self.nplusone_threshold = 0
+
+    def init_app(self, app) -> None:
+        """Escucha el engine de la app y registra los hooks de petición."""
+        if not app.config.get("SQL_METRICS_ENABLED", False):
+            return
+        self.enabled = True
+        self.server_timing = app.config.get("SQL_METRICS_SERVER_TIMING", False)
+        self.nplusone_threshold = int(app.config.get("SQL_NPLUSONE_THRESHOLD", 0) or 0)
+        with app.app_context():
+            engine = db.engine
+        if engine not in self._engines:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            self._engines.add(engine)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # --- Hooks de petición ---------------------------------------------
+
+    @staticmethod
+    def _start() -> None:
+        g.sql_queries = RequestQueries()
+
+    def _finish(self, response):
+        queries = g.pop("sql_queries", None)
+        if queries is None or response.is_streamed:
+            return response
+        total_ms = (time.perf_counter() - queries.started) * 1000
+        db_ms = queries.db_seconds * 1000
+        if self.server_timing:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={db_ms:.1f};desc="{queries.count} queries", app;dur={total_ms:.1f}'
+            )
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else '<sin ruta>'}"
+        self._record(route, queries, db_ms, total_ms)
+
+        duplicates = queries.duplicates(1)
+        if self.nplusone_threshold and duplicates and duplicates[0][1] >= self.nplusone_threshold:
+            statement, times = duplicates[0]
+            print(f"SQL N+1 en {route} ({request.path}): {times} ejecuciones de la misma sentencia "
+                  f"({queries.count} consultas, {db_ms:.1f} ms): {_short(statement)}")
+        return response
+
+    def _record(self, route: str, queries: RequestQueries, db_ms: float, total_ms: float) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_ms": 0.0,
+                    "max_db_ms": 0.0,
+                    "app_ms": 0.0,
+                    "queries_histogram": _histogram(QUERY_BUCKETS),
+                    "db_ms_histogram": _histogram(DB_MS_BUCKETS),
+                    "worst": None,
+                }
+            stats["requests"] += 1
+            stats["queries"] += queries.count
+            stats["db_ms"] += db_ms
+            stats["app_ms"] += total_ms
+            stats["max_db_ms"] = max(stats["max_db_ms"], db_ms)
+            stats["queries_histogram"][_bucket(queries.count, QUERY_BUCKETS)] += 1
+            stats["db_ms_histogram"][_bucket(db_ms, DB_MS_BUCKETS)] += 1
+            # Detalle de la petición con más consultas de la ruta
+            if stats["worst"] is None or queries.count > stats["max_queries"]:
+                stats["worst"] = dict(queries.summary(), path=request.path)
+            stats["max_queries"] = max(stats["max_queries"], queries.count)
+
+    # --- Consulta ------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas por ruta, de la que más consultas acumula a la que menos."""
+        with self._lock:
+            routes = {}
+            for route, stats in sorted(self._routes.items(), key=lambda item: -item[1]["queries"]):
+                requests = stats["requests"]
+                routes[route] = dict(
+                    stats,
+                    db_ms=round(stats["db_ms"], 2),
+                    max_db_ms=round(stats["max_db_ms"], 2),
+                    app_ms=round(stats["app_ms"], 2),
+                    avg_queries=round(stats["queries"] / requests, 2),
+                    avg_db_ms=round(stats["db_ms"] / requests, 2),
+                    # Listas [bucket, peticiones] para conservar el orden en el JSON
+                    queries_histogram=[list(item) for item in stats["queries_histogram"].items()],
+                    db_ms_histogram=[list(item) for item in stats["db_ms_histogram"].items()],
+                )
+        return {"enabled": self.enabled, "nplusone_threshold": self.nplusone_threshold, "routes": routes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+SQL_METRICS = SqlMetrics()
@@ -0,0 +1,117 @@
+"""
+Directorio de Estudiantes en Memoria
+
+Caché id -> resumen del estudiante que usan los endpoints de
+reconocimiento: resolver todos los rostros reconocidos de un frame
+cuesta como máximo una consulta (solo por los IDs que no están en
+caché), en lugar de una o más por rostro.
+
+- Los cambios confirmados en Student (ver change_tracking) descartan las
+  entradas afectadas; los IDs inexistentes también se cachean, así un
+  rostro de un alumno borrado no consulta la base en cada frame.
+- Las entradas vencen tras STUDENT_CACHE_TTL para reflejar cambios hechos
+  desde otros workers de gunicorn.
+
+Ejemplo:
+    >>> alumnos = STUDENT_DIRECTORY.get_many(index.student_ids_for(nombres))
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from app.models import Student
+from app.repositories.students import get_student_summaries_repo
+from app.services.change_tracking import on_commit
+
+# Segundos de vigencia de un resumen en caché
+STUDENT_CACHE_TTL = float(os.getenv("STUDENT_CACHE_TTL", "300"))
+# Resúmenes en memoria (LRU)
+MAX_STUDENTS = 20000
+
+
+def _summary(row) -> Dict[str, Any]:
+    student_id, first_name, last_name, email, is_scholarship_student = row
+    return {
+        "id": student_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "name": f"{first_name or ''} {last_name or ''}".strip(),
+        "email": email,
+        "is_scholarship_student": bool(is_scholarship_student),
+    }
+
+
+class StudentDirectory:
+    """Caché de resúmenes de estudiantes por ID."""
+
+    def __init__(self, ttl: float = STUDENT_CACHE_TTL, max_entries: int = MAX_STUDENTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # student_id -> (cargado_en, resumen o None si no existe)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def get_many(self, student_ids: Iterable[Optional[int]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Resúmenes de varios estudiantes con a lo sumo una consulta.
+
+        Args:
+            student_ids: IDs a resolver (se ignoran los None)
+
+        Returns:
+            Dict id -> resumen, solo con los estudiantes que existen
+        """
+        wanted = {int(i) for i in student_ids if i is not None}
+        now = time.monotonic()
+        found: Dict[int, Dict[str, Any]] = {}
+        missing = []
+        with self._lock:
+            for student_id in wanted:
+                entry = self._entries.get(student_id)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self._entries.move_to_end(student_id)
+                    self.hits += 1
+                    if entry[1] is not None:
+                        found[student_id] = entry[1]
+                else:
+                    missing.append(student_id)
+            self.misses += len(missing)
+        if not missing:
+            return found
+
+        loaded = {row[0]: _summary(row) for row in get_student_summaries_repo(missing)}
+        with self._lock:
+            self.queries += 1
+            for student_id in missing:
+                self._entries[student_id] = (now, loaded.get(student_id))
+                self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def get(self, student_id: int) -> Optional[Dict[str, Any]]:
+        """Resumen de un estudiante (None si no existe)."""
+        return self.get_many([student_id]).get(int(student_id))
+
+    def evict(self, student_ids: Optional[Iterable[int]] = None) -> None:
+        """Descarta los IDs indicados (todos si es None)."""
+        with self._lock:
+            if student_ids is None:
+                self._entries.clear()
+            else:
+                for student_id in student_ids:
+                    self._entries.pop(student_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "queries": self.queries}
+
+
+STUDENT_DIRECTORY = StudentDirectory()
+on_commit(Student, STUDENT_DIRECTORY.evict)
@@ -0,0 +1,32 @@
+import argparse
+import time
+from datetime import datetime
+
+from app import create_app
+from app.services.absence_alerts import ABSENCE_ALERTS, ABSENCE_RULES
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recalcula los contadores de faltas desde attendance y emite las alertas faltantes"
+    )
+    parser.add_argument("--date", help="Fin de la ventana (YYYY-MM-DD, por defecto hoy)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar, sin crear alertas")
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        report = ABSENCE_ALERTS.backfill(today=today, emit=not args.dry_run)
+        elapsed = time.perf_counter() - start
+
+    print(f"Ventana de {ABSENCE_ALERTS.window_days} días; reglas: "
+          + ", ".join(f">={r.min_absences}{' (becarios)' if r.scholarship_only else ''}" for r in ABSENCE_RULES))
+    print(f"{report['counters']} contadores (estudiante, curso), {report['over_threshold']} sobre el umbral, "
+          f"{report['alerts']} alertas creadas{' (dry-run)' if args.dry_run else ''} en {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+
+import cv2
+
+from app.ai.face_recognition.detectors import BACKENDS, create_detector
+from app.ai.face_recognition.model_builder import list_gallery
+from app.services.face_recognition_service import FOTOS_DIR
+
+
+def _load_images(image_dir, limit):
+    """Imágenes BGR del conjunto; cada foto de la galería contiene un rostro."""
+    images = []
+    for rel_path, _ in list_gallery(image_dir)[:limit or None]:
+        image = cv2.imread(os.path.join(image_dir, rel_path))
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara backends de detección: rostros/s y recall")
+    parser.add_argument("--images", default=FOTOS_DIR, help="Carpeta de imágenes (estructura de fotos_conocidas)")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Backends a medir (haar,hog,dnn)")
+    parser.add_argument("--scales", default="1.0,0.5", help="Factores de reducción a medir")
+    parser.add_argument("--dnn-model", help="Modelo DNN (.onnx YuNet o .caffemodel res10); por defecto FACE_DNN_MODEL")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de imágenes (0 = todas)")
+    args = parser.parse_args()
+
+    images = _load_images(args.images, args.limit)
+    if not images:
+        print(f"No hay imágenes en {args.images}")
+        return 1
+    print(f"{len(images)} imágenes de {args.images} (se espera al menos un rostro por imagen)\n")
+    print(f"{'backend':>8} {'escala':>7} {'img/s':>8} {'rostros/s':>10} {'recall':>7}")
+
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        for scale in [float(s) for s in args.scales.split(",") if s.strip()]:
+            options = {"model_path": args.dnn_model} if backend == "dnn" and args.dnn_model else {}
+            try:
+                detector = create_detector(backend, scale=scale, **options)
+            except Exception as e:
+                print(f"{backend:>8} {scale:>7.2f}  no disponible: {str(e)}")
+                continue
+            detector.detect(images[0])  # calentamiento
+            faces = hits = 0
+            start = time.perf_counter()
+            for image in images:
+                found = len(detector.detect(image))
+                faces += found
+                hits += 1 if found else 0
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            print(f"{backend:>8} {scale:>7.2f} {len(images) / elapsed:>8.1f} "
+                  f"{faces / elapsed:>10.1f} {hits / len(images):>7.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
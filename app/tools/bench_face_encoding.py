@@ -0,0 +1,84 @@
+import argparse
+import os
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from app.ai.face_recognition.model_builder import list_gallery
+from app.services.face_recognition_service import FOTOS_DIR, codificar_rostros
+
+# Tamaño de cada rostro en el mosaico (similar a un rostro en el frame reducido a 0.5)
+TILE = 96
+
+
+def _face_tile(image_path):
+    """Recorte del primer rostro de la imagen, o ruido si no hay imagen/rostro."""
+    if image_path:
+        image = face_recognition.load_image_file(image_path)
+        locations = face_recognition.face_locations(image, model="hog")
+        if locations:
+            top, right, bottom, left = locations[0]
+            return cv2.resize(image[top:bottom, left:right], (TILE, TILE))
+        print(f"Sin rostro detectable en {image_path}; se usa ruido")
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (TILE, TILE, 3), dtype=np.uint8)
+
+
+def _mosaic(tile, count):
+    """Imagen RGB con `count` copias del rostro y sus ubicaciones."""
+    cols = int(np.ceil(np.sqrt(count)))
+    rows = int(np.ceil(count / cols))
+    image = np.zeros((rows * TILE, cols * TILE, 3), dtype=np.uint8)
+    locations = []
+    for i in range(count):
+        r, c = divmod(i, cols)
+        image[r * TILE:(r + 1) * TILE, c * TILE:(c + 1) * TILE] = tile
+        locations.append((r * TILE, (c + 1) * TILE, (r + 1) * TILE, c * TILE))
+    return image, locations
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia por frame: encoding rostro por rostro vs. en lote")
+    parser.add_argument("--image", help="Foto con un rostro (por defecto, la primera de fotos_conocidas)")
+    parser.add_argument("--counts", default="1,5,20,40", help="Cantidades de rostros por frame")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se reporta la mejor)")
+    args = parser.parse_args()
+
+    image_path = args.image
+    if not image_path and os.path.isdir(FOTOS_DIR):
+        gallery = list_gallery(FOTOS_DIR)
+        if gallery:
+            image_path = os.path.join(FOTOS_DIR, gallery[0][0])
+    tile = _face_tile(image_path)
+
+    print(f"{'rostros':>8} {'por rostro (ms)':>16} {'lote (ms)':>10} {'aceleración':>12}")
+    for count in [int(c) for c in args.counts.split(",") if c.strip()]:
+        image, locations = _mosaic(tile, count)
+
+        def per_face():
+            for location in locations:
+                face_recognition.face_encodings(image, [location], num_jitters=1, model="small")
+
+        def batched():
+            codificar_rostros(image, locations)
+
+        codificar_rostros(image, locations[:1])  # calentamiento
+        t_single = _best_of(per_face, args.repeat)
+        t_batch = _best_of(batched, args.repeat)
+        print(f"{count:>8} {t_single * 1000:>16.1f} {t_batch * 1000:>10.1f} {t_single / t_batch:>11.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
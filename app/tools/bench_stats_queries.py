@@ -0,0 +1,146 @@
+import argparse
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.extensions import db
+from app.models import Attendance, Course
+from app.repositories.stats import (
+    get_status_counts_by_course_repo,
+    get_status_counts_by_period_repo,
+    get_status_counts_repo
+)
+
+# Cursos de la tabla generada (cada estudiante está en uno)
+COURSES = 20
+
+
+def _generate(rows, students):
+    """Carga la tabla de asistencia sintética con generate_series (un registro por estudiante y día)."""
+    days = -(-rows // students)
+    start = date.today() - timedelta(days=days)
+    db.session.execute(text(
+        "INSERT INTO users (id, email, password_text, role, created_at) "
+        "VALUES (1, 'bench@example.com', '-', 'admin', now())"
+    ))
+    db.session.execute(text(
+        "INSERT INTO courses (id, name, admin_id, created_at) "
+        "SELECT c, 'Curso ' || c, 1, now() FROM generate_series(1, :courses) AS c"
+    ), {"courses": COURSES})
+    db.session.execute(text(
+        "INSERT INTO students (id, first_name, last_name, email, is_scholarship_student, created_at) "
+        "SELECT s, 'Alumno', s::text, 'alumno' || s || '@example.com', s % 3 = 0, now() "
+        "FROM generate_series(1, :students) AS s"
+    ), {"students": students})
+    db.session.execute(text(
+        "INSERT INTO attendance (student_id, course_id, date, status, created_at) "
+        "SELECT s, s % :courses + 1, :start + d, "
+        "       (ARRAY['presente','presente','presente','presente','presente','presente',"
+        "              'tardanza','tardanza','falta','salida_repentina'])[1 + (random() * 9)::int]"
+        "       ::attendance_status_enum, now() "
+        "FROM generate_series(1, :students) AS s, generate_series(0, :days - 1) AS d "
+        "LIMIT :rows"
+    ), {"courses": COURSES, "students": students, "start": start, "days": days, "rows": rows})
+    db.session.commit()
+    db.session.execute(text("ANALYZE attendance"))
+    db.session.commit()
+
+
+def _python_counts(records):
+    total = len(records)
+    present = len([r for r in records if r.status == 'presente'])
+    late = len([r for r in records if r.status == 'tardanza'])
+    absent = len([r for r in records if r.status == 'falta'])
+    early_exit = len([r for r in records if r.status == 'salida_repentina'])
+    return (total, present, late, absent, early_exit)
+
+
+def _orm_course(course_id):
+    records = Attendance.query.filter_by(course_id=course_id).all()
+    db.session.expunge_all()
+    return _python_counts(records)
+
+
+def _orm_student(student_id):
+    records = Attendance.query.filter_by(student_id=student_id).all()
+    db.session.expunge_all()
+    return _python_counts(records)
+
+
+def _orm_by_course():
+    by_course = {}
+    for record in Attendance.query.all():
+        by_course.setdefault(record.course_id, []).append(record)
+    db.session.expunge_all()
+    return sorted((course_id,) + _python_counts(records) for course_id, records in by_course.items())
+
+
+def _orm_by_month(course_id):
+    by_month = {}
+    for record in Attendance.query.filter_by(course_id=course_id).all():
+        by_month.setdefault(record.date.replace(day=1), []).append(record)
+    db.session.expunge_all()
+    return sorted((month,) + _python_counts(records) for month, records in by_month.items())
+
+
+def _timed(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estadísticas de asistencia: ORM + Python frente a agregación en SQL"
+    )
+    parser.add_argument("database_url", help="URL de una base Postgres VACÍA de pruebas (se crean las tablas)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Registros de asistencia a generar")
+    parser.add_argument("--students", type=int, default=5000, help="Estudiantes (un registro por día cada uno)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se reporta la mejor)")
+    parser.add_argument("--skip-full-scan", action="store_true",
+                        help="No medir el agrupado por curso vía ORM (carga todos los registros)")
+    args = parser.parse_args()
+
+    if not make_url(args.database_url).drivername.startswith("postgresql"):
+        parser.error("se requiere Postgres (COUNT FILTER, date_trunc, generate_series)")
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = args.database_url
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Attendance.id).first() is None:
+            start = time.perf_counter()
+            _generate(args.rows, args.students)
+            print(f"{args.rows} registros generados en {time.perf_counter() - start:.1f}s")
+        rows = db.session.query(Attendance).count()
+        course_id = db.session.query(Course.id).order_by(Course.id).scalar()
+        student_id = db.session.query(Attendance.student_id).limit(1).scalar()
+        print(f"attendance: {rows} registros")
+
+        cases = [
+            ("estudiante", lambda: _orm_student(student_id), lambda: get_status_counts_repo(student_id=student_id)),
+            ("curso", lambda: _orm_course(course_id), lambda: get_status_counts_repo(course_id=course_id)),
+            ("curso por mes", lambda: _orm_by_month(course_id),
+             lambda: get_status_counts_by_period_repo('month', course_id=course_id)),
+        ]
+        if not args.skip_full_scan:
+            cases.append(("por curso", _orm_by_course, get_status_counts_by_course_repo))
+
+        print(f"{'consulta':>14} {'ORM (ms)':>10} {'SQL (ms)':>10} {'x':>7} {'iguales':>8}")
+        for name, orm, sql in cases:
+            t_orm, orm_result = _timed(orm, args.repeat)
+            t_sql, sql_result = _timed(sql, args.repeat)
+            print(f"{name:>14} {t_orm * 1000:>10.1f} {t_sql * 1000:>10.1f} {t_orm / t_sql:>7.1f} "
+                  f"{str(orm_result == sql_result):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
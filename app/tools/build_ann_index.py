@@ -0,0 +1,35 @@
+import argparse
+import time
+
+from app.ai.face_recognition import model_store
+from app.ai.face_recognition.ann_index import DEFAULT_NPROBE, IVFIndex
+from app.services.face_recognition_service import MODELO_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el índice aproximado (IVF) del modelo vigente")
+    parser.add_argument("modelo", nargs="?", default=MODELO_DIR, help="Directorio del modelo binario")
+    parser.add_argument("--nlist", type=int, default=None, help="Listas de k-means (por defecto ~4·sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="Listas visitadas por consulta")
+    args = parser.parse_args()
+
+    header = model_store.read_header(args.modelo)
+    index = model_store.load_index(args.modelo)
+    if header is None or index is None or not len(index):
+        print(f"No hay un modelo válido en {args.modelo}")
+        return 1
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(index.encodings, nlist=args.nlist, nprobe=args.nprobe)
+    elapsed = time.perf_counter() - start
+    # Se publica como generación nueva para que los workers lo recarguen en caliente
+    metadata = {k: v for k, v in header.items() if k not in model_store.HEADER_KEYS}
+    generation = model_store.write_model(args.modelo, index.encodings, index.labels, index.label_names,
+                                         metadata, ann=ivf, label_student_ids=index.label_student_ids)
+    print(f"IVF construido en {elapsed:.1f}s: {ivf.nlist} listas, nprobe={ivf.nprobe}, "
+          f"{len(index)} encodings -> generación {generation}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+import argparse
+
+from app import create_app
+from app.repositories.attendance import diff_attendance_summary, repair_attendance_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara attendance_monthly_stats con los registros de attendance"
+    )
+    parser.add_argument("--fix", action="store_true", help="Reescribe las filas con diferencias")
+    parser.add_argument("--limit", type=int, default=20, help="Diferencias a mostrar")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        differences = diff_attendance_summary()
+        for item in differences[:args.limit]:
+            print(f"estudiante {item['student_id']} curso {item['course_id']} {item['month']:%Y-%m}: "
+                  f"esperado {item['expected']} guardado {item['stored']}")
+        if len(differences) > args.limit:
+            print(f"... y {len(differences) - args.limit} más")
+        if not differences:
+            print("El agregado coincide con los registros de asistencia")
+            return 0
+        if args.fix:
+            print(f"{repair_attendance_summary(differences)} filas corregidas")
+            return 0
+    print(f"{len(differences)} filas con diferencias (usar --fix para corregirlas)")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
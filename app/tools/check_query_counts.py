@@ -0,0 +1,98 @@
+import argparse
+import os
+import tempfile
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Course, Enrollment, Student, User
+
+# Endpoints de listados (nombre de la vista, ruta con {course_id})
+ENDPOINTS = (
+    ("api.admin_students_list", "/api/admin/students"),
+    ("admin_api.get_students", "/api/admin/students"),
+    ("api.admin_course_students_list", "/api/admin/courses/{course_id}/students"),
+    ("admin_api.get_course_students", "/api/admin/courses/{course_id}/students"),
+)
+# Cursos del admin; cada estudiante se inscribe en dos
+COURSES = 4
+
+
+def _seed(students):
+    admin = User(email="admin@example.com", password_text="-", role="admin")
+    db.session.add(admin)
+    db.session.flush()
+    courses = [Course(name=f"Curso {i}", admin_id=admin.id) for i in range(COURSES)]
+    db.session.add_all(courses)
+    db.session.flush()
+    for i in range(students):
+        student = Student(first_name="Alumno", last_name=str(i), email=f"alumno{i}@example.com",
+                          is_scholarship_student=i % 3 == 0)
+        db.session.add(student)
+        db.session.flush()
+        for course in (courses[i % COURSES], courses[(i + 1) % COURSES]):
+            db.session.add(Enrollment(student_id=student.id, course_id=course.id))
+    db.session.commit()
+    return admin.id, courses[0].id
+
+
+def _count_queries(app, students):
+    """Consultas SQL por endpoint con la cantidad de estudiantes indicada."""
+    counts = {}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin_id, course_id = _seed(students)
+        token = create_access_token(identity=str(admin_id), additional_claims={"role": "admin"})
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            for view, path in ENDPOINTS:
+                db.session.remove()
+                statements.clear()
+                # Se llama la vista directamente: algunas rutas están registradas en dos blueprints
+                with app.test_request_context(path.format(course_id=course_id),
+                                              headers={"Authorization": f"Bearer {token}"}):
+                    response = app.make_response(app.view_functions[view](course_id=course_id)
+                                                 if "{course_id}" in path else app.view_functions[view]())
+                if response.status_code != 200:
+                    raise RuntimeError(f"{view}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+                counts[view] = len(statements)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verifica que los listados de estudiantes hagan las mismas consultas sin importar la cantidad de filas"
+    )
+    parser.add_argument("--sizes", default="10,200", help="Cantidades de estudiantes a comparar")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+
+    class QueryCountConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = create_app(QueryCountConfig)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = {size: _count_queries(app, size) for size in sizes}
+
+    print(f"{'endpoint':>32} " + " ".join(f"{f'n={size}':>7}" for size in sizes))
+    failed = False
+    for view, _ in ENDPOINTS:
+        counts = [results[size][view] for size in sizes]
+        fixed = len(set(counts)) == 1
+        failed |= not fixed
+        print(f"{view:>32} " + " ".join(f"{count:>7}" for count in counts) + ("" if fixed else "  <- N+1"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
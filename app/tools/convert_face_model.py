@@ -0,0 +1,24 @@
+import argparse
+
+from app.ai.face_recognition import model_store
+from app.services.face_recognition_service import MODELO_DIR, MODELO_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte modelo_caras.pkl al formato binario mapeable en memoria")
+    parser.add_argument("pkl", nargs="?", default=MODELO_PATH, help="Ruta del pickle legado")
+    parser.add_argument("destino", nargs="?", default=MODELO_DIR, help="Directorio del modelo binario")
+    args = parser.parse_args()
+
+    generation = model_store.convert_pickle(args.pkl, args.destino)
+    if generation is None:
+        print(f"No se encontró un modelo válido en {args.pkl}")
+        return 1
+    header = model_store.read_header(args.destino, generation)
+    print(f"Modelo convertido: generación {generation}, "
+          f"{header['total_encodings']} encodings, {header['personas_unicas']} personas -> {args.destino}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+"""unique attendance per student, course and date
+
+Revision ID: 3b8e1f6c2d4a
+Revises: ec94cbd87b5f
+Create Date: 2026-10-17 09:12:41.508231
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e1f6c2d4a'
+down_revision = 'ec94cbd87b5f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Elimina duplicados previos (carreras entre marcas concurrentes),
+    # conservando el registro más reciente de cada estudiante/curso/día.
+    op.execute(
+        """
+        DELETE FROM attendance a
+        USING attendance b
+        WHERE a.student_id = b.student_id
+          AND a.course_id = b.course_id
+          AND a.date = b.date
+          AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint(
+        'uq_attendance_student_course_date', 'attendance', ['student_id', 'course_id', 'date']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_attendance_student_course_date', 'attendance', type_='unique')
@@ -0,0 +1,116 @@
+"""attendance monthly stats aggregate kept by trigger
+
+Revision ID: 9c4d2a7e5b13
+Revises: 3b8e1f6c2d4a
+Create Date: 2026-10-17 11:40:18.730512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2a7e5b13'
+down_revision = '3b8e1f6c2d4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'attendance_monthly_stats',
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('course_id', sa.Integer(), sa.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('present', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('late', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('absent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('early_exit', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('student_id', 'course_id', 'month'),
+    )
+    op.create_index(
+        'ix_attendance_monthly_stats_course_month', 'attendance_monthly_stats', ['course_id', 'month']
+    )
+
+    # Suma delta al contador del estado en el mes de la fecha (crea la fila si falta)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION attendance_monthly_stats_apply(
+            p_student_id integer, p_course_id integer, p_date date, p_status text, p_delta integer
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO attendance_monthly_stats AS s
+                (student_id, course_id, month, present, late, absent, early_exit)
+            VALUES (
+                p_student_id, p_course_id, date_trunc('month', p_date)::date,
+                CASE WHEN p_status = 'presente' THEN p_delta ELSE 0 END,
+                CASE WHEN p_status = 'tardanza' THEN p_delta ELSE 0 END,
+                CASE WHEN p_status = 'falta' THEN p_delta ELSE 0 END,
+                CASE WHEN p_status = 'salida_repentina' THEN p_delta ELSE 0 END
+            )
+            ON CONFLICT (student_id, course_id, month) DO UPDATE SET
+                present = s.present + EXCLUDED.present,
+                late = s.late + EXCLUDED.late,
+                absent = s.absent + EXCLUDED.absent,
+                early_exit = s.early_exit + EXCLUDED.early_exit;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION attendance_monthly_stats_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM attendance_monthly_stats_apply(OLD.student_id, OLD.course_id, OLD.date, OLD.status::text, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM attendance_monthly_stats_apply(NEW.student_id, NEW.course_id, NEW.date, NEW.status::text, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER attendance_monthly_stats_insert_delete
+        AFTER INSERT OR DELETE ON attendance
+        FOR EACH ROW EXECUTE FUNCTION attendance_monthly_stats_sync()
+        """
+    )
+    # Las actualizaciones que solo tocan horas (p. ej. el upsert de la
+    # asistencia facial que repite el estado) no cambian los conteos.
+    op.execute(
+        """
+        CREATE TRIGGER attendance_monthly_stats_update
+        AFTER UPDATE OF student_id, course_id, date, status ON attendance
+        FOR EACH ROW
+        WHEN ((OLD.student_id, OLD.course_id, OLD.date, OLD.status)
+              IS DISTINCT FROM (NEW.student_id, NEW.course_id, NEW.date, NEW.status))
+        EXECUTE FUNCTION attendance_monthly_stats_sync()
+        """
+    )
+
+    # Carga inicial desde los registros existentes
+    op.execute(
+        """
+        INSERT INTO attendance_monthly_stats (student_id, course_id, month, present, late, absent, early_exit)
+        SELECT student_id, course_id, date_trunc('month', date)::date,
+               COUNT(*) FILTER (WHERE status = 'presente'),
+               COUNT(*) FILTER (WHERE status = 'tardanza'),
+               COUNT(*) FILTER (WHERE status = 'falta'),
+               COUNT(*) FILTER (WHERE status = 'salida_repentina')
+        FROM attendance
+        GROUP BY student_id, course_id, date_trunc('month', date)::date
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS attendance_monthly_stats_update ON attendance")
+    op.execute("DROP TRIGGER IF EXISTS attendance_monthly_stats_insert_delete ON attendance")
+    op.execute("DROP FUNCTION IF EXISTS attendance_monthly_stats_sync()")
+    op.execute("DROP FUNCTION IF EXISTS attendance_monthly_stats_apply(integer, integer, date, text, integer)")
+    op.drop_index('ix_attendance_monthly_stats_course_month', table_name='attendance_monthly_stats')
+    op.drop_table('attendance_monthly_stats')
@@ -0,0 +1,41 @@
+"""one unread alert per student and course
+
+Revision ID: e7a3c91f4b28
+Revises: 9c4d2a7e5b13
+Create Date: 2026-10-17 16:05:27.318440
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c91f4b28'
+down_revision = '9c4d2a7e5b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Alertas sin leer duplicadas (workers que evaluaron la misma clave a la
+    # vez): se conserva la más antigua y las demás se marcan como leídas.
+    op.execute(
+        """
+        UPDATE alerts a
+        SET is_read = true
+        FROM alerts b
+        WHERE a.student_id = b.student_id
+          AND a.course_id = b.course_id
+          AND NOT a.is_read
+          AND NOT b.is_read
+          AND a.id > b.id
+        """
+    )
+    op.create_index(
+        'uq_alerts_open_student_course', 'alerts', ['student_id', 'course_id'],
+        unique=True, postgresql_where=sa.text('NOT is_read')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_alerts_open_student_course', table_name='alerts')